@@ -1,11 +1,10 @@
+import gc
 import os
 import ssl
 import time
-import alarm
 import wifi
 import socketpool
 import adafruit_requests
-import analogio
 import board
 import digitalio
 import displayio
@@ -13,6 +12,21 @@ import terminalio
 from adafruit_display_text import label
 from adafruit_display_shapes.line import Line
 from adafruit_display_shapes.rect import Rect
+from battery import read_battery
+from dates import days_in_month, format_readable
+from deadline import Deadline
+from net import connect_wifi
+from power import deep_sleep
+import panel
+import schedule
+import snapshot
+import timekeeping
+import wakeprof
+import ynab
+
+# time.monotonic() restarts at every wake, so this is the boot + import cost
+print(f"Startup: {time.monotonic():.2f}s, mem_free {gc.mem_free()}")
+wakeprof.mark("import")
 
 # --- Display setup ---
 # Take over the display immediately to prevent terminal output on screen
@@ -42,35 +56,7 @@ BAR_RIGHT = 4  # Right margin for progress bars
 BAR_WIDTH = display.width - BAR_LEFT - BAR_RIGHT  # Full width minus margins
 
 # --- Battery monitoring ---
-LIPO_CURVE = [
-    (4.20, 100), (4.15, 95), (4.10, 90), (4.05, 85),
-    (4.00, 80),  (3.90, 70), (3.80, 60), (3.70, 50),
-    (3.60, 40),  (3.50, 30), (3.40, 20), (3.30, 10),
-    (3.20, 5),   (3.00, 0),
-]
-
-
-def voltage_to_percent(voltage):
-    if voltage >= LIPO_CURVE[0][0]:
-        return 100
-    if voltage <= LIPO_CURVE[-1][0]:
-        return 0
-    for i in range(len(LIPO_CURVE) - 1):
-        v_high, p_high = LIPO_CURVE[i]
-        v_low, p_low = LIPO_CURVE[i + 1]
-        if voltage >= v_low:
-            return p_low + (p_high - p_low) * (voltage - v_low) / (v_high - v_low)
-    return 0
-
-
-try:
-    vbat_voltage_pin = analogio.AnalogIn(board.VOLTAGE_MONITOR)
-    battery_voltage = (vbat_voltage_pin.value / 65535.0) * 3.3 * 2
-    vbat_voltage_pin.deinit()
-    battery_percent = voltage_to_percent(battery_voltage)
-except Exception:
-    battery_voltage = 0.0
-    battery_percent = 0
+battery_voltage, battery_percent = read_battery()
 
 
 # --- Helpers ---
@@ -87,62 +73,38 @@ def format_dollars(cents_or_dollars, is_milliunits=False):
     return "$" + s
 
 
-def days_in_month(year, month):
-    """Return number of days in the given month."""
-    dim = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    if month == 2 and (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
-        return 29
-    return dim[month]
+# Wake every 4 hours or on any button press for manual refresh; hourly in
+# the last days of the month, when the pace matters most. common/schedule.py
+# stretches these while nothing changes.
+SLEEP_MINS = 240
+MONTH_END_SLEEP_MINS = 60
+MONTH_END_DAYS = 3
 
 
-# --- Connect to WiFi & fetch time ---
-ssid = os.getenv("CIRCUITPY_WIFI_SSID")
-password = os.getenv("CIRCUITPY_WIFI_PASSWORD")
-aio_username = os.getenv("ADAFRUIT_AIO_USERNAME")
-aio_key = os.getenv("ADAFRUIT_AIO_KEY")
-timezone = os.getenv("TIMEZONE")
-
-# Machine-readable time for pace calculation
-TIME_URL = (
-    f"https://io.adafruit.com/api/v2/{aio_username}/integrations/time/strftime"
-    f"?x-aio-key={aio_key}&tz={timezone}"
-    "&fmt=%25Y-%25m-%25d"
-)
-# Human-readable time for status bar
-TIME_URL_READABLE = (
-    f"https://io.adafruit.com/api/v2/{aio_username}/integrations/time/strftime"
-    f"?x-aio-key={aio_key}&tz={timezone}"
-    "&fmt=%25b+%25e,+%25l:%25M+%25p"
-)
+def sleep_base(now):
+    """The base interval for common/schedule.py on the local date now."""
+    if days_in_month(now[0], now[1]) - now[2] < MONTH_END_DAYS:
+        return MONTH_END_SLEEP_MINS
+    return SLEEP_MINS
 
-print("Connecting to", ssid)
-wifi.radio.connect(ssid, password)
-print(f"Connected to {ssid}!")
 
-pool = socketpool.SocketPool(wifi.radio)
-requests = adafruit_requests.Session(pool, ssl.create_default_context())
-
-response = requests.get(TIME_URL)
-current_date = response.text.strip()  # "YYYY-MM-DD"
-response.close()
-print("Current date:", current_date)
-
-response = requests.get(TIME_URL_READABLE)
-current_time = response.text.strip()  # "Feb 15,  3:30 PM"
-response.close()
-print("Current time:", current_time)
+# --- Connect to WiFi ---
+ssid = os.getenv("CIRCUITPY_WIFI_SSID")
+password = os.getenv("CIRCUITPY_WIFI_PASSWORD")
 
-# Parse date components for pace calculation
-date_parts = current_date.split("-")
-cur_year = int(date_parts[0])
-cur_month = int(date_parts[1])
-cur_day = int(date_parts[2])
-total_days = days_in_month(cur_year, cur_month)
-month_pct = cur_day / total_days  # 0.0 to 1.0
+# Every network phase below draws its timeouts from one per-wake budget
+deadline = Deadline()
+online = deadline.run("wifi", lambda timeout: connect_wifi(ssid, password, timeout)) is not None
+if online:
+    pool = socketpool.SocketPool(wifi.radio)
+    requests = adafruit_requests.Session(pool, ssl.create_default_context())
 
 # --- Fetch YNAB budget data ---
 YNAB_API_TOKEN = os.getenv("YNAB_API_TOKEN")
 YNAB_BUDGET_ID = os.getenv("YNAB_BUDGET_ID")
+# "delta" (default): keep every category and fetch only changes.
+# "targeted": YNAB's month totals plus just the display categories, by id.
+YNAB_SYNC = os.getenv("YNAB_SYNC") or "delta"
 
 EXCLUDED_GROUPS = ["Internal Master Category", "Credit Card Payments", "Reimbursable/Refund", "Brokerage - Transfer"]
 
@@ -159,72 +121,121 @@ total_spent = 0
 display_categories = []
 api_error = False
 
-try:
-    ynab_url = f"https://api.ynab.com/v1/budgets/{YNAB_BUDGET_ID}/months/current"
-    headers = {"Authorization": f"Bearer {YNAB_API_TOKEN}"}
-    print(f"Fetching YNAB data...")
-    response = requests.get(ynab_url, headers=headers)
-
-    if response.status_code != 200:
-        print(f"YNAB API error: HTTP {response.status_code}")
-        api_error = True
-        response.close()
-    else:
-        data = response.json()
+headers = {"Authorization": f"Bearer {YNAB_API_TOKEN}"}
+
+# Category table from earlier wakes: with it we only ask for what changed
+ynab_state = ynab.load_state(DISPLAY_CATEGORY_NAMES) if YNAB_SYNC != "targeted" else None
+
+
+def fetch_categories(timeout):
+    """Returns (status_code, summary); summary is ynab.summarize()'s tuple or None."""
+    url = ynab.categories_url(YNAB_BUDGET_ID, ynab_state)
+    response = requests.get(url, headers=headers, timeout=timeout)
+    wakeprof.mark("headers")
+    try:
+        timekeeping.sync_from_response(response)
+        if response.status_code != 200:
+            return response.status_code, None
+        # Parsed as it streams in; the full document is never in memory
+        state = ynab.apply_response(
+            response.iter_content(chunk_size=ynab.CHUNK_SIZE),
+            ynab_state,
+            EXCLUDED_GROUPS,
+            DISPLAY_CATEGORY_NAMES,
+        )
+    finally:
         response.close()
+    wakeprof.mark("body")
+    ynab.save_state(state)
+    return 200, ynab.summarize(state, DISPLAY_CATEGORY_NAMES)
 
-        month_data = data.get("data", {}).get("month", {})
-        categories = month_data.get("categories", [])
-
-        # Process categories
-        for cat in categories:
-            # Skip hidden, deleted, excluded groups
-            if cat.get("hidden", False) or cat.get("deleted", False):
-                continue
-            if cat.get("category_group_name", "") in EXCLUDED_GROUPS:
-                continue
 
-            budgeted = cat.get("budgeted", 0)  # milliunits
-            activity = cat.get("activity", 0)  # milliunits (negative = spending)
-            balance = cat.get("balance", 0)  # milliunits
+def fetch_targeted(timeout):
+    return ynab.fetch_targeted(
+        requests, YNAB_BUDGET_ID, headers, DISPLAY_CATEGORY_NAMES, deadline
+    )
 
-            # Skip categories with no budget
-            if budgeted == 0:
-                continue
 
-            spent = abs(activity)
+result = None
+if online:
+    if YNAB_SYNC == "targeted":
+        print("Fetching YNAB data (targeted)...")
+        result = deadline.run("ynab", fetch_targeted)
+    else:
+        print("Fetching YNAB data (" + ("delta" if ynab_state else "full") + ")...")
+        result = deadline.run("ynab", fetch_categories)
 
-            # Add to totals (include zero-activity categories for pace)
-            total_budgeted += budgeted
-            total_spent += spent
+try:
+    status, summary = result or (None, None)
+    if status is None:
+        print("YNAB unreachable")
+        api_error = True
+    elif status != 200:
+        print(f"YNAB API error: HTTP {status}")
+        api_error = True
+    else:
+        total_budgeted, total_spent, display_categories = summary
+        print(f"Budget: spent ${total_spent / 1000:.0f} of ${total_budgeted / 1000:.0f}")
+        print(f"Categories to display: {len(display_categories)}")
 
-            # Only include in display list if it's one of our target categories
-            if cat.get("name", "") not in DISPLAY_CATEGORY_NAMES:
-                continue
+except Exception as e:
+    print(f"API error: {e}")
+    api_error = True
 
-            pct_spent = spent / budgeted if budgeted > 0 else 1.0
+# --- Offline fallback ---
+# Draw the last good numbers, marked stale, rather than an error. Once that
+# is on the panel there is nothing new to show until a fetch works again.
+stale_as_of = None
+changed = False
+if api_error:
+    cached, as_of, shown = snapshot.load()
+    if cached is None and result is None:
+        # Never fetched anything and the network is down: leave the panel be
+        deadline.report()
+        deep_sleep(schedule.next_minutes(sleep_base(timekeeping.local_time()), False, (battery_voltage, battery_percent)))
+    if cached is not None:
+        if shown:
+            deadline.report()
+            deep_sleep(schedule.next_minutes(sleep_base(timekeeping.local_time()), False, (battery_voltage, battery_percent)))
+        total_budgeted, total_spent, rows = cached
+        display_categories = []
+        for name, budgeted, spent, balance in rows:
             display_categories.append({
-                "name": cat.get("name", "Unknown"),
+                "name": name,
                 "budgeted": budgeted,
                 "spent": spent,
                 "balance": balance,
-                "pct_spent": pct_spent,
+                "pct_spent": spent / budgeted if budgeted > 0 else 1.0,
             })
+        stale_as_of = as_of
+        stale_reason = "offline" if result is None else "API error"
+        api_error = False
+        snapshot.mark_shown()
+
+# --- Local time ---
+# The RTC was resynced from the YNAB response's Date header if its drift
+# budget was spent; now() only goes to NTP if that request failed, and not
+# at all once the network budget is gone.
+now = None
+if online:
+    now = deadline.run(
+        "time", lambda timeout: timekeeping.now(pool, requests, timeout), optional=True
+    )
+now = now or timekeeping.local_time()
+if online and wakeprof.upload_due():
+    deadline.run("profile", lambda timeout: wakeprof.upload(requests, timeout), optional=True)
+deadline.report()
+current_time = format_readable(now)  # "Feb 15, 3:30 PM"
+print("Current time:", current_time)
 
-        # Sort by the order in DISPLAY_CATEGORY_NAMES
-        name_order = {name: i for i, name in enumerate(DISPLAY_CATEGORY_NAMES)}
-        display_categories.sort(key=lambda c: name_order.get(c["name"], 999))
-
-        # Convert totals to dollars
-        total_budgeted_dollars = total_budgeted / 1000
-        total_spent_dollars = total_spent / 1000
-
-        print(f"Budget: spent ${total_spent_dollars:.0f} of ${total_budgeted_dollars:.0f}")
-        print(f"Categories to display: {len(display_categories)}")
+if not api_error and stale_as_of is None:
+    rows = [[c["name"], c["budgeted"], c["spent"], c["balance"]] for c in display_categories]
+    changed = snapshot.save([total_budgeted, total_spent, rows], current_time)
 
-except Exception as e:
-    print(f"API error: {e}")
-    api_error = True
+# Date components for pace calculation
+cur_year, cur_month, cur_day = now[0], now[1], now[2]
+total_days = days_in_month(cur_year, cur_month)
+month_pct = cur_day / total_days  # 0.0 to 1.0
 
 # --- Calculate pace ---
 if not api_error and total_budgeted > 0:
@@ -239,12 +250,28 @@ else:
     spent_pct = 0.0
     pace_label_text = ""
 
+# --- Nothing new: leave the panel as it is ---
+# Everything the screen is drawn from except the status bar's time and
+# battery, which panel.unchanged() allows to lag (common/panel.py)
+render_model = None
+if not api_error:
+    render_model = [
+        total_budgeted, total_spent, cur_day, stale_as_of, stale_as_of and stale_reason,
+        [[c["name"], c["budgeted"], c["spent"], c["balance"]] for c in display_categories],
+    ]
+if panel.unchanged(render_model, battery_percent):
+    print("Panel unchanged, skipping refresh")
+    deep_sleep(schedule.next_minutes(sleep_base(now), changed, (battery_voltage, battery_percent)))
+
 # --- Build the display ---
 
 # -- Status bar: time (left), battery (right) --
+status_text = current_time
+if stale_as_of is not None:
+    status_text = f"As of {stale_as_of} ({stale_reason})"
 status_time_label = label.Label(
     terminalio.FONT,
-    text=current_time,
+    text=status_text,
     color=0x000000,
     anchor_point=(0.0, 0.5),
     anchored_position=(2, STATUS_BAR_HEIGHT // 2),
@@ -294,8 +321,9 @@ elif total_budgeted == 0:
 
 else:
     # -- Summary line (y=16): "Spent $X of $Y" left, pace label right --
-    spent_str = format_dollars(total_spent_dollars)
-    budget_str = format_dollars(total_budgeted_dollars)
+    # Milliunits to dollars; the totals may also come from the snapshot
+    spent_str = format_dollars(total_spent / 1000)
+    budget_str = format_dollars(total_budgeted / 1000)
     summary_text = f"Spent {spent_str} of {budget_str}"
 
     summary_label = label.Label(
@@ -436,10 +464,13 @@ else:
 
 
 # --- Refresh the e-ink display ---
+wakeprof.mark("render")
 time.sleep(display.time_to_refresh)
 display.refresh()
 while display.busy:
     pass
+wakeprof.mark("refresh")
+panel.shown(render_model, battery_percent)
 
 # --- Dev mode escape hatch ---
 btn_a = digitalio.DigitalInOut(board.D15)
@@ -450,21 +481,4 @@ if not btn_a.value:  # Button A held (active low) -- dev mode
     print("Dev mode -- skipping deep sleep. USB writable, REPL active.")
 else:
     btn_a.deinit()
-
-    # Disable WiFi before sleep to save power
-    wifi.radio.enabled = False
-
-    # Wake every 4 hours or on any button press for manual refresh
-    SLEEP_MINS = 240  # 4 hours
-    time_alarm = alarm.time.TimeAlarm(
-        monotonic_time=time.monotonic() + (SLEEP_MINS * 60)
-    )
-    button_a_alarm = alarm.pin.PinAlarm(pin=board.D15, value=False, pull=True)
-    button_b_alarm = alarm.pin.PinAlarm(pin=board.D14, value=False, pull=True)
-    button_c_alarm = alarm.pin.PinAlarm(pin=board.D12, value=False, pull=True)
-    button_d_alarm = alarm.pin.PinAlarm(pin=board.D11, value=False, pull=True)
-
-    print("Entering deep sleep...")
-    alarm.exit_and_deep_sleep_until_alarms(
-        time_alarm, button_a_alarm, button_b_alarm, button_c_alarm, button_d_alarm
-    )
+    deep_sleep(schedule.next_minutes(sleep_base(now), changed, (battery_voltage, battery_percent)))
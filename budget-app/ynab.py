@@ -0,0 +1,323 @@
+"""YNAB category sync: delta requests, streamed parsing, a table in sleep_memory.
+
+GET /budgets/{id}/categories returns every category with its current-month
+budgeted/activity/balance, plus a server_knowledge number. Passing that
+number back as last_knowledge_of_server returns only the categories that
+changed since, which on most wakes is none. So we keep, across deep sleep:
+
+    "ynab" slot         server_knowledge, the UTC month and time of the last
+                        full download, and the rows we draw (by category id,
+                        the name as its index in the display names)
+    "ynab_cats" slot    every category that counts toward the totals, packed
+                        as 12-byte (id prefix, budgeted, spent) records
+
+and apply each delta to that table; the totals are re-summed from it. A full
+download happens when there is no table, the UTC month has rolled over (all
+amounts change without the categories themselves changing) or the last one
+is FULL_SYNC_AGE old, or the display names changed. The table slot holds
+122 categories (what is left of the board's 4096 bytes of sleep_memory);
+if a budget outgrows it saving fails and every wake is a full download,
+which is still correct.
+
+With YNAB_SYNC = "targeted" in settings.toml the categories table is not
+kept at all. The pace bar's totals come from YNAB's own month budgeted and
+activity (GET /months, itself a delta request), and each of the display
+categories is fetched by id. The ids are resolved from their names with one
+full /categories download and cached in NVM until the names change, or
+for FULL_SYNC_AGE while any name did not resolve (the category may be
+created or renamed later). That is one small response per display category
+instead of walking all of them.
+The totals then match YNAB's month view exactly: they include every
+category, not just the ones that pass EXCLUDED_GROUPS.
+
+Bodies are walked with adafruit_json_stream as they arrive: only the fields
+we use are parsed out of each category (notes and goal fields are skipped
+byte by byte), so beyond the 12-byte records peak heap is one category's
+worth however big the budget is. tools/ynab_memory.py measures it.
+"""
+import binascii
+import struct
+import time
+
+import adafruit_json_stream as json_stream
+import persist
+import timekeeping
+import wakeprof
+
+CHUNK_SIZE = 512  # bytes per socket read while streaming
+FULL_SYNC_AGE = 24 * 3600
+_RECORD = ">4sii"  # id prefix, budgeted, spent (milliunits)
+_RECORD_SIZE = struct.calcsize(_RECORD)
+
+API_URL = "https://api.ynab.com/v1/budgets"
+
+_FIELDS = ("id", "name", "category_group_name", "hidden", "deleted", "budgeted", "activity", "balance")
+
+
+def _utc_month():
+    t = time.localtime()  # the RTC keeps UTC, which is what YNAB's month uses
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}"
+
+
+def _names_key(display_names):
+    return binascii.crc32("\n".join(display_names).encode())
+
+
+def new_state(display_names):
+    return {
+        "k": None, "m": _utc_month(), "at": int(time.time()), "n": _names_key(display_names),
+        "table": bytearray(), "shown": {},
+    }
+
+
+def load_state(display_names):
+    """The cached table, or None when a full download is due."""
+    header = persist.load_json("ynab")
+    table = persist.load("ynab_cats")
+    if not header or table is None or header.get("m") != _utc_month():
+        return None
+    if header.get("n") != _names_key(display_names):
+        return None  # "shown" refers to the names by index
+    if time.time() - header.get("at", 0) > FULL_SYNC_AGE:
+        return None
+    header["table"] = bytearray(table)
+    return header
+
+
+def save_state(state):
+    if not persist.save("ynab_cats", bytes(state["table"])):
+        persist.clear("ynab")
+        return
+    header = {"k": state["k"], "m": state["m"], "at": state["at"], "n": state["n"], "shown": state["shown"]}
+    if not persist.save_json("ynab", header):
+        persist.clear("ynab")
+
+
+def categories_url(budget_id, state):
+    url = f"{API_URL}/{budget_id}/categories"
+    if state is not None:
+        url += f"?last_knowledge_of_server={state['k']}"
+    return url
+
+
+def _fields(category):
+    """Pull _FIELDS out of a streamed category, skipping everything else."""
+    fields = {}
+    for key in category:
+        if key in _FIELDS:
+            fields[key] = category[key]
+    return fields
+
+
+def _find(table, cid):
+    """Offset of cid's record in table, or -1."""
+    offset = table.find(cid)
+    while offset >= 0 and offset % _RECORD_SIZE:
+        offset = table.find(cid, offset + 1)
+    return offset
+
+
+def _apply(state, cat, excluded_groups, display_names):
+    """Set (or drop) one category's row in the table."""
+    key = cat.get("id", "")
+    cid = binascii.unhexlify(key[:8])
+    table = state["table"]
+    offset = _find(table, cid)
+    if offset >= 0:
+        table = state["table"] = table[:offset] + table[offset + _RECORD_SIZE:]
+    state["shown"].pop(key[:8], None)
+
+    # Skip hidden, deleted, excluded groups
+    if cat.get("hidden", False) or cat.get("deleted", False):
+        return
+    if cat.get("category_group_name", "") in excluded_groups:
+        return
+    budgeted = cat.get("budgeted", 0)
+    # Skip categories with no budget
+    if budgeted == 0:
+        return
+    spent = abs(cat.get("activity", 0))  # activity is negative for spending
+    # Include zero-activity categories too: they count toward the pace
+    table.extend(struct.pack(_RECORD, cid, budgeted, spent))
+    if cat.get("name", "") in display_names:
+        # The index, not the name: emoji names would fill the header slot
+        state["shown"][key[:8]] = [display_names.index(cat["name"]), budgeted, spent, cat.get("balance", 0)]
+
+
+def apply_response(chunks, state, excluded_groups, display_names):
+    """Apply a categories response body to state (None: a full download).
+
+    chunks is an iterable of bytes, e.g. response.iter_content(CHUNK_SIZE).
+    Returns the updated state; applying the same delta twice is harmless.
+    """
+    if state is None:
+        state = new_state(display_names)
+    doc = json_stream.load(chunks)
+    data = doc["data"]
+    knowledge = state["k"]
+    changed = 0
+    for key in data:
+        if key == "server_knowledge":
+            knowledge = data[key]
+        elif key == "category_groups":
+            for group in data[key]:
+                for group_key in group:
+                    if group_key != "categories":
+                        continue
+                    for category in group[group_key]:
+                        _apply(state, _fields(category), excluded_groups, display_names)
+                        changed += 1
+    state["k"] = knowledge
+    print(f"YNAB: {changed} categories in response, knowledge {knowledge}")
+    return state
+
+
+def summarize(state, display_names):
+    """Return (total_budgeted, total_spent, display_categories) in milliunits.
+
+    display_categories has one dict per category named in display_names, in
+    that order.
+    """
+    total_budgeted = 0
+    total_spent = 0
+    table = state["table"]
+    for offset in range(0, len(table), _RECORD_SIZE):
+        _, budgeted, spent = struct.unpack_from(_RECORD, table, offset)
+        total_budgeted += budgeted
+        total_spent += spent
+
+    display_categories = []
+    for i, budgeted, spent, balance in sorted(state["shown"].values()):
+        display_categories.append({
+            "name": display_names[i],
+            "budgeted": budgeted,
+            "spent": spent,
+            "balance": balance,
+            "pct_spent": spent / budgeted if budgeted > 0 else 1.0,
+        })
+    return total_budgeted, total_spent, display_categories
+
+
+# --- Targeted mode ---
+
+
+def load_ids(names):
+    """Cached {name: category id or None} for names, or None if they need resolving.
+
+    Names that did not resolve are tried again once the cache is FULL_SYNC_AGE old.
+    """
+    cached = persist.load_json("ynab_ids")
+    if not cached or "ids" not in cached:
+        return None
+    ids = cached["ids"]
+    if sorted(ids) != sorted(names):
+        return None
+    age = time.time() - cached.get("at", 0)
+    if None in ids.values() and not 0 <= age <= FULL_SYNC_AGE:
+        return None
+    return ids
+
+
+def resolve_ids(chunks, names):
+    """Map names to ids from a full categories body, and cache the result."""
+    ids = {name: None for name in names}
+    doc = json_stream.load(chunks)
+    for group in doc["data"]["category_groups"]:
+        for group_key in group:
+            if group_key != "categories":
+                continue
+            for category in group[group_key]:
+                cat = _fields(category)
+                if cat.get("name") in ids and not cat.get("deleted", False):
+                    ids[cat["name"]] = cat["id"]
+    persist.save_json("ynab_ids", {"ids": ids, "at": int(time.time())})
+    return ids
+
+
+def apply_months(chunks, month):
+    """Update month ({"k", "m", "budgeted", "activity"}) from a /months body."""
+    doc = json_stream.load(chunks)
+    data = doc["data"]
+    for key in data:
+        if key == "server_knowledge":
+            month["k"] = data[key]
+        elif key == "months":
+            for summary in data[key]:
+                fields = {}
+                for field in summary:
+                    if field in ("month", "budgeted", "activity"):
+                        fields[field] = summary[field]
+                if fields.get("month", "")[:7] == month["m"]:
+                    month["budgeted"] = fields.get("budgeted", 0)
+                    month["activity"] = fields.get("activity", 0)
+    return month
+
+
+def _get(requests, url, headers, deadline):
+    if deadline.expired():
+        raise OSError("network budget spent")
+    response = requests.get(url, headers=headers, timeout=deadline.timeout())
+    wakeprof.mark("headers")
+    timekeeping.sync_from_response(response)
+    return response
+
+
+def fetch_targeted(requests, budget_id, headers, names, deadline):
+    """Returns (status_code, summary), summary as from summarize() or None.
+
+    Every request takes its timeout from deadline and raises once it is spent.
+    """
+    ids = load_ids(names)
+    if ids is None:
+        print("YNAB: resolving category ids")
+        response = _get(requests, categories_url(budget_id, None), headers, deadline)
+        try:
+            if response.status_code != 200:
+                return response.status_code, None
+            ids = resolve_ids(response.iter_content(chunk_size=CHUNK_SIZE), names)
+        finally:
+            response.close()
+
+    month = persist.load_json("ynab_month")
+    if not month or month.get("m") != _utc_month():
+        month = {"k": None, "m": _utc_month(), "budgeted": 0, "activity": 0}
+    url = f"{API_URL}/{budget_id}/months"
+    if month["k"] is not None:
+        url += f"?last_knowledge_of_server={month['k']}"
+    response = _get(requests, url, headers, deadline)
+    try:
+        if response.status_code != 200:
+            return response.status_code, None
+        month = apply_months(response.iter_content(chunk_size=CHUNK_SIZE), month)
+    finally:
+        response.close()
+    persist.save_json("ynab_month", month)
+
+    display_categories = []
+    for name in names:
+        if ids.get(name) is None:
+            continue
+        url = f"{API_URL}/{budget_id}/months/current/categories/{ids[name]}"
+        response = _get(requests, url, headers, deadline)
+        try:
+            if response.status_code == 404:
+                persist.clear("ynab_ids")  # deleted or renamed: resolve again next wake
+                continue
+            if response.status_code != 200:
+                return response.status_code, None
+            doc = json_stream.load(response.iter_content(chunk_size=CHUNK_SIZE))
+            cat = _fields(doc["data"]["category"])
+        finally:
+            response.close()
+        if cat.get("hidden", False) or cat.get("deleted", False) or not cat.get("budgeted", 0):
+            continue
+        budgeted = cat["budgeted"]
+        spent = abs(cat.get("activity", 0))
+        display_categories.append({
+            "name": name,
+            "budgeted": budgeted,
+            "spent": spent,
+            "balance": cat.get("balance", 0),
+            "pct_spent": spent / budgeted if budgeted > 0 else 1.0,
+        })
+    return 200, (month["budgeted"], abs(month["activity"]), display_categories)
@@ -0,0 +1,39 @@
+"""LiPo battery level from the MagTag's VOLTAGE_MONITOR divider."""
+
+# 3.7V 420mAh LiPo: 4.2V = 100%, 3.0V = 0%
+# Piecewise linear approximation of the typical LiPo discharge curve.
+LIPO_CURVE = [
+    (4.20, 100), (4.15, 95), (4.10, 90), (4.05, 85),
+    (4.00, 80),  (3.90, 70), (3.80, 60), (3.70, 50),
+    (3.60, 40),  (3.50, 30), (3.40, 20), (3.30, 10),
+    (3.20, 5),   (3.00, 0),
+]
+
+
+def voltage_to_percent(voltage):
+    if voltage >= LIPO_CURVE[0][0]:
+        return 100
+    if voltage <= LIPO_CURVE[-1][0]:
+        return 0
+    for i in range(len(LIPO_CURVE) - 1):
+        v_high, p_high = LIPO_CURVE[i]
+        v_low, p_low = LIPO_CURVE[i + 1]
+        if voltage >= v_low:
+            # Linear interpolation between the two points
+            return p_low + (p_high - p_low) * (voltage - v_low) / (v_high - v_low)
+    return 0
+
+
+def read_battery():
+    """Return (voltage, percent), or (0.0, 0) if the monitor pin is unavailable."""
+    try:
+        import analogio
+        import board
+
+        vbat_voltage_pin = analogio.AnalogIn(board.VOLTAGE_MONITOR)
+        # Voltage divider halves the voltage; reference is 3.3V over 16-bit range
+        voltage = (vbat_voltage_pin.value / 65535.0) * 3.3 * 2
+        vbat_voltage_pin.deinit()
+    except Exception:
+        return 0.0, 0
+    return voltage, voltage_to_percent(voltage)
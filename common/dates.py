@@ -0,0 +1,157 @@
+"""Calendar and time-of-day helpers shared by the apps.
+
+Dates are either "YYYY-MM-DD" strings or (y, m, d, h, mi, s) tuples; none of
+this depends on the board, so it runs unchanged under CPython.
+"""
+import time
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+_DAYS_IN_MONTH = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+def is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def days_in_month(year, month):
+    """Return number of days in the given month."""
+    if month == 2 and is_leap(year):
+        return 29
+    return _DAYS_IN_MONTH[month]
+
+
+def add_days_to_date(date_str, days):
+    """Add days (positive or negative) to a YYYY-MM-DD date string."""
+    year, month, day = map(int, date_str.split("-"))
+    day += days
+    # Roll forward
+    while day > days_in_month(year, month):
+        day -= days_in_month(year, month)
+        month += 1
+        if month > 12:
+            month = 1
+            year += 1
+    # Roll backward
+    while day < 1:
+        month -= 1
+        if month < 1:
+            month = 12
+            year -= 1
+        day += days_in_month(year, month)
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def _ordinal(y, m, d):
+    """Days since a fixed epoch; only differences are meaningful."""
+    days = y * 365 + d
+    for i in range(1, m):
+        days += _DAYS_IN_MONTH[i]
+    # Add leap years
+    days += y // 4 - y // 100 + y // 400
+    if m <= 2 and is_leap(y):
+        days -= 1
+    return days
+
+
+def days_between(date1, date2):
+    """Calculate days between two YYYY-MM-DD date strings (date2 - date1)."""
+    y1, m1, d1 = map(int, date1.split("-"))
+    y2, m2, d2 = map(int, date2.split("-"))
+    return _ordinal(y2, m2, d2) - _ordinal(y1, m1, d1)
+
+
+def day_of_week(y, m, d):
+    """Sakamoto's algorithm. Returns 0=Sunday, 1=Mon, ..., 6=Sat."""
+    t = [0, 3, 2, 5, 0, 3, 5, 1, 4, 6, 2, 4]
+    if m < 3:
+        y -= 1
+    return (y + y // 4 - y // 100 + y // 400 + t[m - 1] + d) % 7
+
+
+def _sunday_on_or_after(year, month, day):
+    return day + (7 - day_of_week(year, month, day)) % 7
+
+
+def _last_sunday(year, month):
+    last = days_in_month(year, month)
+    return last - day_of_week(year, month, last)
+
+
+def dst_active(rule, year, month, day, hour=12):
+    """True if daylight saving time is in effect at this local date and hour.
+
+    rule is "US" (second Sunday of March to the first Sunday of November,
+    switching at 2 AM), "EU" (last Sunday of March to the last Sunday of
+    October, approximated as switching at 2 AM local) or "none".
+    """
+    rule = rule.upper()
+    if rule == "US":
+        start_month, start_day = 3, _sunday_on_or_after(year, 3, 8)
+        end_month, end_day = 11, _sunday_on_or_after(year, 11, 1)
+    elif rule == "EU":
+        start_month, start_day = 3, _last_sunday(year, 3)
+        end_month, end_day = 10, _last_sunday(year, 10)
+    else:
+        return False
+    if month < start_month or month > end_month:
+        return False
+    if start_month < month < end_month:
+        return True
+    if month == start_month:
+        return day > start_day or (day == start_day and hour >= 2)
+    return day < end_day or (day == end_day and hour < 2)
+
+
+def eastern_utc_offset(year, month, day):
+    """Return UTC offset for US Eastern time (-4 for EDT, -5 for EST).
+    DST runs from the second Sunday of March to the first Sunday of November."""
+    return -4 if dst_active("US", year, month, day) else -5
+
+
+def utc_to_eastern(y, m, d, h):
+    """Shift a UTC hour to US Eastern, rolling the date if needed."""
+    offset = eastern_utc_offset(y, m, d)
+    h += offset
+    if h < 0:
+        h += 24
+        d -= 1
+        if d < 1:
+            m -= 1
+            if m < 1:
+                m = 12
+                y -= 1
+            d = days_in_month(y, m)
+    return y, m, d, h
+
+
+def parse_iso(s):
+    """Parse 'YYYY-MM-DDTHH:MM:SS[.fff][Z]' or 'YYYY-MM-DD HH:MM:SS' → tuple."""
+    s = s.replace("T", " ").replace("Z", "")
+    if "." in s:
+        s = s.split(".")[0]
+    date_part, time_part = s.split(" ")
+    y, mo, d = [int(x) for x in date_part.split("-")]
+    h, mi, sec = [int(x) for x in time_part.split(":")]
+    return (y, mo, d, h, mi, sec)
+
+
+def parse_http_date(s):
+    """Parse an RFC 7231 Date header 'Sun, 15 Feb 2026 20:30:05 GMT' → tuple."""
+    _, d, mon, y, hms = s.split()[:5]
+    h, mi, sec = [int(x) for x in hms.split(":")]
+    return (int(y), MONTHS.index(mon) + 1, int(d), h, mi, sec)
+
+
+def to_epoch(t):
+    """time.mktime treats input as local; we use it consistently to compute deltas."""
+    return time.mktime((t[0], t[1], t[2], t[3], t[4], t[5], 0, 0, -1))
+
+
+def format_readable(t):
+    """(y,m,d,h,m,s) → 'May 23, 3:25 PM' (matches adafruit IO %b %e, %l:%M %p style)."""
+    h = t[3]
+    ampm = "AM" if h < 12 else "PM"
+    h12 = h % 12 or 12
+    return f"{MONTHS[t[1]-1]} {t[2]}, {h12}:{t[4]:02d} {ampm}"
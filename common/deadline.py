@@ -0,0 +1,91 @@
+"""Per-wake time budget for network work.
+
+Every request and connect attempt is given a timeout drawn from one wake-wide
+budget, so a slow endpoint or a hung association costs at most
+WAKE_NET_BUDGET seconds of radio time instead of the battery. Each phase is
+retried with capped backoff while budget remains; optional phases get one try
+and are skipped once the budget is spent. report() prints what each phase
+used.
+
+    deadline = Deadline()
+    data = deadline.run("ynab", lambda timeout: fetch(timeout))
+    if data is None:
+        ...  # every attempt failed or the budget ran out
+
+settings.toml:
+    WAKE_NET_BUDGET = 45   # seconds of network time per wake
+"""
+import os
+import time
+
+import wakeprof
+
+DEFAULT_BUDGET = 45
+REQUEST_TIMEOUT = 15  # cap for any single attempt
+MIN_ATTEMPT = 2  # not worth starting an attempt with less than this left
+FIRST_BACKOFF = 0.5
+MAX_BACKOFF = 4
+
+
+def _budget():
+    try:
+        return float(os.getenv("WAKE_NET_BUDGET") or DEFAULT_BUDGET)
+    except ValueError:
+        return DEFAULT_BUDGET
+
+
+class Deadline:
+    def __init__(self, seconds=None):
+        self.total = _budget() if seconds is None else seconds
+        self.start = time.monotonic()
+        self.phases = []  # (name, seconds, outcome)
+
+    def remaining(self):
+        return max(0.0, self.start + self.total - time.monotonic())
+
+    def expired(self):
+        return self.remaining() < MIN_ATTEMPT
+
+    def timeout(self, cap=REQUEST_TIMEOUT):
+        """Timeout for the next attempt: cap, or whatever budget is left."""
+        return min(cap, self.remaining())
+
+    def run(self, name, fn, attempts=3, cap=REQUEST_TIMEOUT, optional=False):
+        """Call fn(timeout) until it returns, within the budget.
+
+        Returns fn's result, or None if every attempt raised or the budget ran
+        out first. optional phases get a single attempt.
+        """
+        if optional:
+            attempts = 1
+        start = time.monotonic()
+        backoff = FIRST_BACKOFF
+        outcome = "skipped"
+        result = None
+        for attempt in range(attempts):
+            if self.expired():
+                break
+            try:
+                result = fn(self.timeout(cap))
+                outcome = "ok"
+                break
+            except Exception as e:
+                outcome = "failed"
+                print(f"{name} attempt {attempt + 1} failed: {e}")
+            if attempt + 1 < attempts:
+                wait = min(backoff, MAX_BACKOFF, self.remaining())
+                time.sleep(wait)
+                backoff *= 2
+        self.phases.append((name, time.monotonic() - start, outcome))
+        wakeprof.mark(name)
+        return result
+
+    def report(self):
+        used = time.monotonic() - self.start
+        parts = []
+        for name, seconds, outcome in self.phases:
+            text = f"{name} {seconds:.1f}s"
+            if outcome != "ok":
+                text += f" ({outcome})"
+            parts.append(text)
+        print(f"Network {used:.1f}/{self.total:.0f}s: " + ", ".join(parts))
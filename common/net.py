@@ -0,0 +1,113 @@
+"""WiFi association with a fast path for deep-sleep wakes.
+
+A cold wifi.radio.connect() scans every channel before it associates. After
+each successful connect we keep the AP's BSSID and channel (and optionally
+the DHCP lease) in sleep_memory; on timer and button wakes connect_wifi()
+hands them straight to connect(), which skips the scan. If that fails the
+cache is dropped and we fall back to a normal scan.
+
+settings.toml:
+    WIFI_STATIC_IP_WAKES = 0   # wakes that reuse the cached DHCP lease before
+                               # asking DHCP again; 0 (default) always uses DHCP.
+                               # Keep wakes * sleep interval under the lease time.
+"""
+import binascii
+import os
+import time
+
+import persist
+
+FAST_CONNECT_TIMEOUT = 5  # seconds before giving up on the cached AP
+
+
+def _static_ip_wakes():
+    try:
+        return int(os.getenv("WIFI_STATIC_IP_WAKES") or 0)
+    except ValueError:
+        return 0
+
+
+def _remember(radio, ssid, ip_uses):
+    ap = radio.ap_info
+    if ap is None:
+        return
+    cache = {
+        "ssid": ssid,
+        "bssid": binascii.hexlify(bytes(ap.bssid)).decode(),
+        "channel": ap.channel,
+        "ip_uses": ip_uses,
+    }
+    if radio.ipv4_address:
+        cache["ip"] = str(radio.ipv4_address)
+        cache["mask"] = str(radio.ipv4_subnet)
+        cache["gw"] = str(radio.ipv4_gateway)
+        cache["dns"] = str(radio.ipv4_dns)
+    persist.save_json("wifi", cache)
+
+
+def _apply_cached_ip(radio, cache):
+    import ipaddress
+
+    radio.set_ipv4_address(
+        ipv4=ipaddress.IPv4Address(cache["ip"]),
+        netmask=ipaddress.IPv4Address(cache["mask"]),
+        gateway=ipaddress.IPv4Address(cache["gw"]),
+        ipv4_dns=ipaddress.IPv4Address(cache["dns"]),
+    )
+
+
+def connect_wifi(ssid, password, timeout=None):
+    """Connect to ssid, reusing the cached AP on wakes. Returns seconds taken.
+
+    timeout bounds the whole call; ConnectionError is raised when it runs out.
+    """
+    import alarm
+    import wifi
+
+    radio = wifi.radio
+    start = time.monotonic()
+    cache = None
+    if alarm.wake_alarm is not None:
+        cache = persist.load_json("wifi")
+        if cache and cache.get("ssid") != ssid:
+            cache = None
+
+    print("Connecting to", ssid)
+    mode = "scan"
+    ip_uses = 0
+    if cache:
+        static_wakes = _static_ip_wakes()
+        reuse_ip = "ip" in cache and cache.get("ip_uses", 0) < static_wakes
+        fast_timeout = FAST_CONNECT_TIMEOUT
+        if timeout is not None:
+            fast_timeout = min(fast_timeout, timeout)
+        try:
+            if reuse_ip:
+                _apply_cached_ip(radio, cache)
+                ip_uses = cache.get("ip_uses", 0) + 1
+            radio.connect(
+                ssid,
+                password,
+                channel=cache["channel"],
+                bssid=binascii.unhexlify(cache["bssid"]),
+                timeout=fast_timeout,
+            )
+            mode = "cached AP, cached IP" if reuse_ip else "cached AP"
+        except Exception as e:
+            print(f"WiFi fast path failed ({e}), scanning")
+            persist.clear("wifi")
+            ip_uses = 0
+            if reuse_ip:
+                radio.start_dhcp()
+
+    if mode == "scan":
+        if timeout is not None:
+            timeout -= time.monotonic() - start
+            if timeout <= 0:
+                raise ConnectionError("no time left to scan")
+        radio.connect(ssid, password, timeout=timeout)
+
+    _remember(radio, ssid, ip_uses)
+    elapsed = time.monotonic() - start
+    print(f"Connected to {ssid} in {elapsed:.2f}s ({mode})")
+    return elapsed
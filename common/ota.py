@@ -0,0 +1,340 @@
+"""Over-the-air updates from a published release, run by each app's boot.py.
+
+update() brings the files on the device in line with OTA_MANIFEST_URL (or
+the single-file OTA_URL); boot.py calls it on a hard boot, outside dev mode,
+and calls forget_installed_state() in dev mode. The settings are listed in
+each app's boot.py.
+
+The manifest (built by tools/build.py) lists every deployable file
+with its size and SHA-256; paths are relative to the manifest URL and to
+the device root. The hashes of what is installed are cached in
+/ota_hashes.json, so only entries whose hash differs are downloaded and
+no installed file is ever read back. The manifest's ETag is cached in
+NVM, so an unchanged release costs one tiny request answered with 304.
+This module is in the manifest too, as lib/ota.mpy, and updates itself
+like any other file.
+
+Each download streams to "<path>.new" and is verified before anything
+is replaced. Once every changed file checks out, the swap list goes to
+/ota_pending.json and is applied; if power is lost mid-swap, the next
+boot finishes it. Dev mode marks the installed files as untrusted, so
+the first normal boot afterwards re-downloads everything.
+
+The filesystem is only remounted writable here when there is actually a
+new file to write (a no-op for apps whose boot.py already remounted it).
+"""
+import json
+import os
+
+import microcontroller
+import storage
+
+
+# OTA state kept in microcontroller.nvm so it survives power loss
+# (sleep_memory does not):
+#   nvm[0]       validator kind: 0 = none, 1 = ETag, 2 = Last-Modified
+#   nvm[1]       validator length in bytes
+#   nvm[2]       flags (OTA_FLAG_DIRTY)
+#   nvm[3:3+n]   validator value (ASCII)
+OTA_NVM_OFFSET = 0
+OTA_NVM_SIZE = 128
+OTA_VALIDATOR_MAX = OTA_NVM_SIZE - 3
+VALIDATOR_ETAG = 1
+VALIDATOR_LAST_MODIFIED = 2
+OTA_FLAG_DIRTY = 0x01  # files may have been edited by hand in dev mode
+
+HASHES_PATH = "/ota_hashes.json"
+PENDING_PATH = "/ota_pending.json"
+CODE_PATH = "code.py"
+OTA_CHUNK_SIZE = 1024
+
+
+def load_validator():
+    """Return (request_header, value) for the cached validator, or None."""
+    nvm = microcontroller.nvm
+    kind = nvm[OTA_NVM_OFFSET]
+    length = nvm[OTA_NVM_OFFSET + 1]
+    if kind not in (VALIDATOR_ETAG, VALIDATOR_LAST_MODIFIED):
+        return None
+    if length == 0 or length > OTA_VALIDATOR_MAX:
+        return None
+    start = OTA_NVM_OFFSET + 3
+    try:
+        value = bytes(nvm[start:start + length]).decode()
+    except UnicodeError:
+        return None
+    if kind == VALIDATOR_ETAG:
+        return ("If-None-Match", value)
+    return ("If-Modified-Since", value)
+
+
+def save_validator(response):
+    """Store the ETag (preferred) or Last-Modified of a 200 response.
+
+    Also clears OTA_FLAG_DIRTY, since this is only called once the files
+    the response describes are installed.
+    """
+    for kind, name in ((VALIDATOR_ETAG, "etag"), (VALIDATOR_LAST_MODIFIED, "last-modified")):
+        value = response.headers.get(name)
+        if value and len(value) <= OTA_VALIDATOR_MAX:
+            encoded = value.encode()
+            record = bytes([kind, len(encoded), 0]) + encoded
+            end = OTA_NVM_OFFSET + len(record)
+            if bytes(microcontroller.nvm[OTA_NVM_OFFSET:end]) != record:
+                microcontroller.nvm[OTA_NVM_OFFSET:end] = record
+            return
+    microcontroller.nvm[OTA_NVM_OFFSET:OTA_NVM_OFFSET + 3] = bytes(3)
+
+
+def forget_installed_state():
+    """Drop the validator and distrust the hash table (dev mode)."""
+    record = bytes([0, 0, OTA_FLAG_DIRTY])
+    if bytes(microcontroller.nvm[OTA_NVM_OFFSET:OTA_NVM_OFFSET + 3]) != record:
+        microcontroller.nvm[OTA_NVM_OFFSET:OTA_NVM_OFFSET + 3] = record
+
+
+def files_dirty():
+    return bool(microcontroller.nvm[OTA_NVM_OFFSET + 2] & OTA_FLAG_DIRTY)
+
+
+def read_json(path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def make_parent_dirs(path):
+    """Create the directories leading up to a root-relative file path."""
+    parts = path.split("/")[:-1]
+    current = ""
+    for part in parts:
+        current += "/" + part
+        try:
+            os.mkdir(current)
+        except OSError:
+            pass  # already exists
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def apply_pending():
+    """Swap verified "<path>.new" files into place as listed in PENDING_PATH."""
+    pending = read_json(PENDING_PATH, None)
+    if pending is None:
+        return
+    for path in pending.get("install", []):
+        target = "/" + path
+        try:
+            os.stat(target + ".new")
+        except OSError:
+            continue  # already swapped before a power loss
+        # FAT cannot rename over an existing file
+        remove_quietly(target)
+        os.rename(target + ".new", target)
+    for path in pending.get("remove", []):
+        remove_quietly("/" + path)
+    os.remove(PENDING_PATH)
+
+
+def recover_interrupted_install():
+    """Finish a swap that a power loss interrupted."""
+    try:
+        os.stat(PENDING_PATH)
+    except OSError:
+        return
+    storage.remount("/", readonly=False)
+    apply_pending()
+    print("OTA: Finished interrupted install")
+
+
+def stream_to_file(response, path, expected_size, expected_sha256):
+    """Write the response body to path one chunk at a time.
+
+    Returns True only if the byte count (and SHA-256, when expected_sha256 is
+    given) match. On mismatch the partial file is deleted.
+    """
+    import binascii
+    import hashlib
+
+    digest = hashlib.new("sha256")
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in response.iter_content(chunk_size=OTA_CHUNK_SIZE):
+            digest.update(chunk)
+            f.write(chunk)
+            written += len(chunk)
+    sha256 = binascii.hexlify(digest.digest()).decode()
+
+    if expected_size is not None and written != expected_size:
+        print(f"OTA: Size mismatch ({written} != {expected_size}), discarding")
+    elif expected_sha256 and sha256 != expected_sha256:
+        print(f"OTA: SHA-256 mismatch ({sha256}), discarding")
+    elif expected_sha256 is None and written <= 10:
+        print("OTA: Response too small, discarding")
+    else:
+        print(f"OTA: Downloaded {written} bytes, sha256 {sha256}")
+        return True
+
+    os.remove(path)
+    return False
+
+
+def with_validator(headers):
+    """Copy of headers plus the cached If-None-Match / If-Modified-Since."""
+    conditional = dict(headers)
+    validator = load_validator()
+    if validator and not files_dirty():
+        conditional[validator[0]] = validator[1]
+    return conditional
+
+
+def update_from_manifest(session, manifest_url, headers):
+    """Download and install every manifest entry that differs from HASHES_PATH."""
+    print(f"OTA: Fetching {manifest_url}")
+    response = session.get(manifest_url, headers=with_validator(headers))
+    if response.status_code == 304:
+        print("OTA: Manifest not modified (304)")
+        response.close()
+        return
+    if response.status_code != 200:
+        print(f"OTA: Manifest HTTP {response.status_code}, skipping")
+        response.close()
+        return
+    files = response.json().get("files", {})
+    response.close()
+    manifest_response = response
+
+    installed = {} if files_dirty() else read_json(HASHES_PATH, {})
+    changed = [path for path, entry in files.items() if installed.get(path) != entry["sha256"]]
+    stale = [path for path in installed if path not in files]
+    if not changed and not stale:
+        print("OTA: All files up to date")
+        save_validator(manifest_response)
+        return
+
+    # Only remount writable when we actually need to write
+    storage.remount("/", readonly=False)
+    base_url = manifest_url.rsplit("/", 1)[0]
+    downloaded = []
+    for path in changed:
+        entry = files[path]
+        print(f"OTA: Fetching {path}")
+        response = session.get(f"{base_url}/{path}", headers=headers, stream=True)
+        if response.status_code != 200:
+            print(f"OTA: HTTP {response.status_code} for {path}, aborting")
+            response.close()
+            verified = False
+        else:
+            make_parent_dirs(path)
+            try:
+                verified = stream_to_file(response, f"/{path}.new", int(entry["size"]), entry["sha256"])
+            finally:
+                response.close()
+        if not verified:
+            # Leave every installed file alone unless the whole set checks out
+            for done in downloaded:
+                remove_quietly(f"/{done}.new")
+            return
+        downloaded.append(path)
+
+    write_json(PENDING_PATH, {"install": changed, "remove": stale})
+    apply_pending()
+
+    for path in changed:
+        installed[path] = files[path]["sha256"]
+    for path in stale:
+        installed.pop(path, None)
+    write_json(HASHES_PATH, installed)
+    save_validator(manifest_response)
+    print(f"OTA: Done, {len(changed)} updated, {len(stale)} removed")
+
+
+def update_single_file(session, ota_url, headers):
+    """Legacy mode: fetch code.py alone, verified against Content-Length."""
+    print(f"OTA: Fetching {ota_url}")
+    response = session.get(ota_url, headers=with_validator(headers), stream=True)
+
+    if response.status_code == 304:
+        print("OTA: Not modified (304)")
+        response.close()
+        return
+
+    if response.status_code != 200:
+        print(f"OTA: HTTP {response.status_code}, skipping")
+        response.close()
+        return
+
+    content_length = response.headers.get("content-length")
+    if not content_length:
+        # Nothing to tell a truncated download from the whole file
+        print("OTA: No Content-Length to verify code.py against, skipping")
+        response.close()
+        return
+    expected_size = int(content_length)
+
+    # Only remount writable when we actually need to write
+    storage.remount("/", readonly=False)
+    try:
+        verified = stream_to_file(response, f"/{CODE_PATH}.new", expected_size, None)
+    finally:
+        response.close()
+    if not verified:
+        return
+
+    write_json(PENDING_PATH, {"install": [CODE_PATH]})
+    apply_pending()
+    save_validator(response)
+    print("OTA: Done, code.py updated")
+
+
+def update():
+    """Bring the files on the device in line with the published release.
+
+    Uses OTA_MANIFEST_URL when set, otherwise the single-file OTA_URL.
+    """
+    import ssl
+    import wifi
+    import socketpool
+    import adafruit_requests
+
+    recover_interrupted_install()
+
+    manifest_url = os.getenv("OTA_MANIFEST_URL")
+    ota_url = os.getenv("OTA_URL")
+    if not manifest_url and not ota_url:
+        print("OTA: No OTA_MANIFEST_URL or OTA_URL set, skipping")
+        return
+
+    ssid = os.getenv("CIRCUITPY_WIFI_SSID")
+    password = os.getenv("CIRCUITPY_WIFI_PASSWORD")
+    if not ssid:
+        print("OTA: No WiFi credentials, skipping")
+        return
+
+    print("OTA: Connecting to WiFi...")
+    wifi.radio.connect(ssid, password)
+
+    pool = socketpool.SocketPool(wifi.radio)
+    session = adafruit_requests.Session(pool, ssl.create_default_context())
+
+    headers = {}
+    ota_token = os.getenv("OTA_TOKEN")
+    if ota_token:
+        headers["Authorization"] = f"token {ota_token}"
+
+    if manifest_url:
+        update_from_manifest(session, manifest_url, headers)
+    else:
+        update_single_file(session, ota_url, headers)
@@ -0,0 +1,64 @@
+"""Leave the e-ink panel alone when a wake would draw the same thing again.
+
+A refresh is a couple of seconds awake with the panel busy, and wears the
+panel. Each app describes what its screen means as a render model: the
+message ts and body, RSVP counts, category balances, item due dates, and
+any stale marker, but not the "Refreshed:" time or the battery percentage.
+Lists and scalars only: dict order is not stable on the board, and the
+model is hashed as JSON.
+
+After every refresh the app calls shown(), which keeps the model's CRC-32,
+the time and the battery percentage in sleep_memory. On a timer wake
+unchanged() is True when the model hashes the same and the status bar is
+still close enough: drawn less than PANEL_STALE_MINUTES ago (by the RTC)
+and within PANEL_BATTERY_STEP percent of the battery now. The app then
+sleeps without building the display tree. Button wakes always redraw, as
+do wakes after a reset, when sleep_memory is empty and the panel may show
+anything.
+
+settings.toml:
+    PANEL_STALE_MINUTES = 720   # redraw for the status bar at least this often; 0: always
+    PANEL_BATTERY_STEP = 5      # redraw when the battery moved this many percent
+"""
+import binascii
+import json
+import os
+import time
+
+import persist
+
+DEFAULT_STALE_MINUTES = 720  # the longest sleep schedule.py picks by default
+DEFAULT_BATTERY_STEP = 5
+
+
+def _setting(name, default):
+    value = os.getenv(name)
+    try:
+        # Not `or default`: 0 is a meaningful value here
+        return float(default if value in (None, "") else value)
+    except ValueError:
+        return default
+
+
+def fingerprint(model):
+    return binascii.crc32(json.dumps(model).encode())
+
+
+def unchanged(model, battery_percent):
+    """True if this is a timer wake and the panel already shows model."""
+    import alarm
+
+    if not isinstance(alarm.wake_alarm, alarm.time.TimeAlarm):
+        return False
+    state = persist.load_json("panel")
+    if not state or state.get("h") != fingerprint(model):
+        return False
+    age = time.time() - state.get("at", 0)
+    if age < 0 or age > _setting("PANEL_STALE_MINUTES", DEFAULT_STALE_MINUTES) * 60:
+        return False
+    return abs(battery_percent - state.get("b", 0)) < _setting("PANEL_BATTERY_STEP", DEFAULT_BATTERY_STEP)
+
+
+def shown(model, battery_percent):
+    """Note that the panel now shows model, drawn at this battery level."""
+    persist.save_json("panel", {"h": fingerprint(model), "at": int(time.time()), "b": int(battery_percent)})
@@ -0,0 +1,142 @@
+"""Small checksummed records in alarm.sleep_memory and microcontroller.nvm.
+
+sleep_memory survives deep sleep but not a power loss; nvm survives both
+but is flash, so it is only rewritten when a record actually changes. Every
+slot has a fixed home so apps and boot.py never step on each other. Slots
+of different apps may share bytes, since a board runs one app at a time.
+
+Record layout inside a slot:
+    [0:2]   payload length (big endian)
+    [2:6]   CRC-32 of the slot name and the payload
+    [6:]    payload
+A slot that was never written, was torn by a reset mid-write, or holds
+another slot's record (another app ran before) fails the length/CRC check
+and reads back as None.
+"""
+import binascii
+import json
+
+SLEEP = "sleep"
+NVM = "nvm"
+HEADER_SIZE = 6
+
+# name: (memory, offset, size). NVM bytes 0-127 belong to boot.py's OTA state.
+# sleep_memory is 4096 bytes on the ESP32-S2: bytes 0-2175 are for every app,
+# the rest for the one app on the board (budget-app and message-board share it).
+SLOTS = {
+    "wifi": (SLEEP, 0, 160),
+    "clock": (SLEEP, 160, 96),
+    "snapshot": (SLEEP, 256, 1536),
+    "snapshot_nvm": (NVM, 128, 1536),
+    # common/schedule.py's unchanged-wake streak
+    "schedule": (SLEEP, 1792, 32),
+    # common/panel.py's fingerprint of what the panel shows
+    "panel": (SLEEP, 1824, 64),
+    # common/wakeprof.py's ring of per-phase timings
+    "wakeprof": (SLEEP, 1888, 272),
+    # budget-app's YNAB sync state (budget-app/ynab.py)
+    "ynab": (SLEEP, 2176, 320),
+    "ynab_month": (SLEEP, 2496, 128),
+    "ynab_cats": (SLEEP, 2624, 1472),  # 122 records of 12 bytes
+    "ynab_ids": (NVM, 1664, 512),
+    # rsvp-counter's guest index and running totals (rsvp-counter/rsvps.py)
+    "rsvp_index": (NVM, 2176, 4096),
+    "rsvp_totals": (NVM, 6272, 256),
+    # message-board's window of unacked messages and queued acks (message-board/inbox.py),
+    # on budget-app's bytes
+    "msg_window": (SLEEP, 2176, 1024),
+    "msg_acks": (SLEEP, 3200, 64),
+    "msg_acks_nvm": (NVM, 6528, 64),
+}
+
+
+def _memory(kind):
+    if kind == SLEEP:
+        import alarm
+
+        return alarm.sleep_memory
+    import microcontroller
+
+    return microcontroller.nvm
+
+
+def _check_layout():
+    """Raise if a slot runs past the end of this board's memory."""
+    for name, (kind, offset, size) in SLOTS.items():
+        try:
+            mem = _memory(kind)
+        except (ImportError, AttributeError):
+            continue  # a host tool, not the board
+        if offset + size > len(mem):
+            raise ValueError(f"persist: {name} slot ends at {offset + size}, past the {len(mem)} bytes of {kind} memory")
+
+
+_check_layout()
+
+
+def _crc(name, payload):
+    return binascii.crc32(payload, binascii.crc32(name.encode()))
+
+
+def load(name):
+    """Return the payload bytes stored in slot name, or None."""
+    kind, offset, size = SLOTS[name]
+    try:
+        mem = _memory(kind)
+        header = bytes(mem[offset:offset + HEADER_SIZE])
+    except (ImportError, AttributeError):
+        return None
+    length = int.from_bytes(header[0:2], "big")
+    if length == 0 or length > size - HEADER_SIZE:
+        return None
+    start = offset + HEADER_SIZE
+    payload = bytes(mem[start:start + length])
+    if _crc(name, payload) != int.from_bytes(header[2:6], "big"):
+        return None
+    return payload
+
+
+def save(name, payload):
+    """Store payload in slot name. Returns False if it does not fit."""
+    kind, offset, size = SLOTS[name]
+    if len(payload) > size - HEADER_SIZE:
+        print(f"persist: {name} record too large ({len(payload)} bytes)")
+        return False
+    record = (
+        len(payload).to_bytes(2, "big")
+        + _crc(name, payload).to_bytes(4, "big")
+        + payload
+    )
+    try:
+        mem = _memory(kind)
+    except (ImportError, AttributeError):
+        return False
+    end = offset + len(record)
+    if bytes(mem[offset:end]) != record:
+        mem[offset:end] = record
+    return True
+
+
+def clear(name):
+    kind, offset, _ = SLOTS[name]
+    try:
+        mem = _memory(kind)
+    except (ImportError, AttributeError):
+        return
+    if bytes(mem[offset:offset + 2]) != b"\x00\x00":
+        mem[offset:offset + 2] = b"\x00\x00"
+
+
+def load_json(name, default=None):
+    payload = load(name)
+    if payload is None:
+        return default
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return default
+
+
+def save_json(name, value):
+    # Compact separators: every byte counts in sleep_memory
+    return save(name, json.dumps(value, separators=(",", ":")).encode())
@@ -0,0 +1,29 @@
+"""Deep sleep with the timer and all four MagTag buttons as wake sources."""
+import gc
+import time
+
+import wakeprof
+
+BUTTON_PIN_NAMES = ("D15", "D14", "D12", "D11")  # A, B, C, D
+
+
+def deep_sleep(minutes):
+    """Turn the radio off and sleep until the timer or any button. Never returns.
+
+    The e-ink display keeps its image without power.
+    """
+    import alarm
+    import board
+    import wifi
+
+    # Disable the WiFi radio first; left on it draws hundreds of mA
+    wifi.radio.enabled = False
+
+    alarms = [alarm.time.TimeAlarm(monotonic_time=time.monotonic() + minutes * 60)]
+    for name in BUTTON_PIN_NAMES:
+        alarms.append(alarm.pin.PinAlarm(pin=getattr(board, name), value=False, pull=True))
+
+    wakeprof.finish()
+    print(f"Awake {time.monotonic():.2f}s, mem_free {gc.mem_free()}")
+    print(f"Entering deep sleep for {minutes} min...")
+    alarm.exit_and_deep_sleep_until_alarms(*alarms)
@@ -0,0 +1,208 @@
+"""How long to sleep: recent change history, battery level and server hints.
+
+Each app has a base interval (its SLEEP_MINS) and reports after every wake
+whether the data on screen changed. next_minutes() then
+    - doubles the interval after every BACKOFF_AFTER unchanged wakes in a row,
+      up to MAX_FACTOR times the base, and drops back to the base as soon as
+      something changes,
+    - stretches it as the battery drains (BATTERY_STRETCH),
+    - and lets a next_poll_after hint from the server, recorded with hint(),
+      replace all of the above.
+The result is kept within MIN_MINUTES and SLEEP_MAX_HOURS. The unchanged
+streak lives in sleep_memory; after a power loss it starts over at the base.
+
+With ACTIVE_HOURS set, a wake that would land outside every active window
+is moved to the start of the next one (WINDOW_SLACK_MINUTES after it, so
+an RTC running fast cannot wake it early). Nobody-is-looking hours then
+cost no WiFi, TLS or panel refresh. The button PinAlarms still wake the
+board at any time. Windows are local wall-clock times. The offset for a
+future wake is timekeeping's current one, moved by an hour if DST_RULE says
+daylight saving starts or ends before then. That is exact with the AIO
+time source and as good as UTC_OFFSET_HOURS without it.
+
+settings.toml:
+    SLEEP_ADAPTIVE = 1      # 0: always sleep the app's base interval
+    SLEEP_MAX_HOURS = 12    # longest sleep, hints included (not quiet hours)
+    ACTIVE_HOURS = "Mon-Fri 6:30-8:30,17-23; Sat,Sun 8-23:30"
+                            # unset: always active; days not listed: asleep
+    DST_RULE = "US"         # "US", "EU" or "none"
+"""
+import math
+import os
+import time
+
+import persist
+import timekeeping
+from dates import dst_active, parse_iso, to_epoch
+
+BACKOFF_AFTER = 3  # unchanged wakes before each doubling
+MAX_FACTOR = 4
+MIN_MINUTES = 5
+DEFAULT_MAX_HOURS = 12
+WINDOW_SLACK_MINUTES = 1  # CLOCK_DRIFT_BUDGET's default
+# (battery percent below, interval multiplier), lowest first
+BATTERY_STRETCH = ((10, 3), (20, 2), (40, 1.5))
+_DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")  # tm_wday order
+
+_hint = None  # minutes, from the last hint() this wake
+
+
+def _setting(name, default):
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def hint(value):
+    """Record a server's next_poll_after: seconds from now, or an ISO 8601 UTC time.
+
+    None and unparseable values are ignored; the last valid hint of a wake wins.
+    """
+    global _hint
+    if value is None or value == "":
+        return
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        try:
+            seconds = to_epoch(parse_iso(value)) - time.time()
+        except (ValueError, AttributeError, IndexError):
+            print(f"Bad next_poll_after: {value}")
+            return
+    _hint = seconds / 60
+
+
+def _battery_factor(battery):
+    voltage, percent = battery
+    if not voltage:
+        return 1  # no monitor reading: assume powered
+    for below, factor in BATTERY_STRETCH:
+        if percent < below:
+            return factor
+    return 1
+
+
+def next_minutes(base, changed, battery=None):
+    """Minutes to sleep after this wake. battery is read_battery()'s (voltage, percent)."""
+    state = persist.load_json("schedule") or {}
+    streak = 0 if changed else state.get("n", 0) + 1
+    persist.save_json("schedule", {"n": streak})
+
+    cap = _setting("SLEEP_MAX_HOURS", DEFAULT_MAX_HOURS) * 60
+    if _hint is not None:
+        minutes = _hint
+        reason = "server hint"
+    elif not _setting("SLEEP_ADAPTIVE", 1):
+        minutes = base
+        reason = "fixed"
+    else:
+        minutes = base * min(2 ** (streak // BACKOFF_AFTER), MAX_FACTOR)
+        factor = _battery_factor(battery) if battery else 1
+        minutes *= factor
+        reason = f"{streak} unchanged, battery x{factor}"
+    minutes = max(MIN_MINUTES, min(minutes, cap))
+
+    windows = _active_windows()
+    minutes = int(minutes)
+    if windows:
+        now = int(time.time())
+        wake = _next_active(now + minutes * 60, windows)
+        if wake > now + minutes * 60:
+            t = _local(wake)
+            reason += f", quiet until {_DAYS[t.tm_wday].title()} {t.tm_hour}:{t.tm_min:02d}"
+            # Rounded up, plus slack for an RTC running fast: a wake a
+            # moment early would still be in quiet hours
+            minutes = math.ceil((wake - now) / 60 + WINDOW_SLACK_MINUTES)
+    print(f"Sleep {minutes} min ({reason})")
+    return minutes
+
+
+# --- Active hours ---
+
+
+def _clock_minutes(text):
+    """'6' or '6:30' -> minutes after midnight."""
+    hours, _, mins = text.partition(":")
+    return int(hours) * 60 + int(mins or 0)
+
+
+def _days(spec):
+    if spec in ("*", "daily"):
+        return range(7)
+    days = []
+    for part in spec.lower().split(","):
+        first, _, last = part.partition("-")
+        start = _DAYS.index(first[:3])
+        end = _DAYS.index(last[:3]) if last else start
+        days.extend((start + i) % 7 for i in range((end - start) % 7 + 1))
+    return days
+
+
+def parse_active_hours(spec):
+    """{weekday (0=Monday): [(start, end) minutes]} from an ACTIVE_HOURS string.
+
+    Groups are "<days> <ranges>" separated by ";". A range that ends before
+    it starts runs past midnight into the next day.
+    """
+    windows = {}
+    for group in spec.split(";"):
+        if not group.strip():
+            continue
+        day_spec, ranges = group.split()
+        for day in _days(day_spec):
+            for text in ranges.split(","):
+                start, end = [_clock_minutes(x) for x in text.split("-")]
+                if end > start:
+                    windows.setdefault(day, []).append((start, end))
+                else:
+                    windows.setdefault(day, []).append((start, 24 * 60))
+                    windows.setdefault((day + 1) % 7, []).append((0, end))
+    for day in windows:
+        windows[day].sort()
+    return windows
+
+
+def _active_windows():
+    spec = os.getenv("ACTIVE_HOURS")
+    if not spec:
+        return None
+    try:
+        return parse_active_hours(spec)
+    except (ValueError, IndexError) as e:
+        print(f"Bad ACTIVE_HOURS ({e}): always active")
+        return None
+
+
+def _dst(utc_epoch, offset):
+    t = time.localtime(utc_epoch + offset)
+    return dst_active(os.getenv("DST_RULE") or "US", t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour)
+
+
+def _offset_at(utc_epoch):
+    """Local UTC offset at utc_epoch: today's, plus any DST change in between."""
+    offset = timekeeping.utc_offset()
+    now = int(time.time())
+    return offset + 3600 * (_dst(utc_epoch, offset) - _dst(now, offset))
+
+
+def _local(utc_epoch):
+    return time.localtime(utc_epoch + _offset_at(utc_epoch))
+
+
+def _next_active(utc_epoch, windows):
+    """The first UTC epoch at or after utc_epoch inside an active window."""
+    t = _local(utc_epoch)
+    minute = t.tm_hour * 60 + t.tm_min
+    for start, end in windows.get(t.tm_wday, ()):
+        if start <= minute < end:
+            return utc_epoch
+    midnight = utc_epoch - minute * 60 - t.tm_sec  # local midnight, as UTC
+    for day in range(8):
+        for start, _ in windows.get((t.tm_wday + day) % 7, ()):
+            wake = midnight + day * 86400 + start * 60
+            # Same wall-clock time if the offset changes (DST) before then
+            wake -= _offset_at(wake) - _offset_at(utc_epoch)
+            if wake > utc_epoch:
+                return wake
+    return utc_epoch  # no active window at all
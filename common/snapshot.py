@@ -0,0 +1,55 @@
+"""Last good data, for rendering when the network or the API lets us down.
+
+Each app saves the handful of values its screen is drawn from after every
+successful fetch, together with the time they were fetched. The copy in
+sleep_memory is rewritten freely; the NVM copy survives a power loss but is
+flash, so it is only rewritten when the data changes or the copy is a day
+old.
+
+On a failed wake the app draws load()'s data with an "as of" marker and
+calls mark_shown(). Later failing wakes see shown=True and go back to sleep
+without touching the panel, since it already shows all we know.
+"""
+import time
+
+import persist
+
+NVM_REFRESH = 24 * 3600
+
+
+def save(data, as_of):
+    """Remember data (JSON-able, lists not tuples) fetched at as_of (display string).
+
+    Returns True if data differs from the last saved copy.
+    """
+    previous = _record()
+    record = {"d": data, "as_of": as_of, "at": int(time.time())}
+    persist.save_json("snapshot", record)
+    backup = persist.load_json("snapshot_nvm")
+    if (
+        backup is None
+        or backup.get("d") != data
+        or record["at"] - backup.get("at", 0) > NVM_REFRESH
+    ):
+        persist.save_json("snapshot_nvm", record)
+    return previous is None or previous.get("d") != data
+
+
+def _record():
+    return persist.load_json("snapshot") or persist.load_json("snapshot_nvm")
+
+
+def load():
+    """Return (data, as_of, shown) for the last good fetch, or (None, None, False)."""
+    record = _record()
+    if not record:
+        return None, None, False
+    return record["d"], record["as_of"], record.get("shown", False)
+
+
+def mark_shown():
+    """Note that the panel now shows the snapshot with its stale marker."""
+    record = _record()
+    if record:
+        record["shown"] = True
+        persist.save_json("snapshot", record)
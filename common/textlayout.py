@@ -0,0 +1,47 @@
+"""Word wrap and font-scale selection for terminalio.FONT (6x12 px glyphs)."""
+
+
+def wrap_text(text, max_chars):
+    if max_chars < 1:
+        return [text]
+    lines = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split(" ")
+        current = ""
+        for word in words:
+            # Word longer than max_chars on its own — hard-break
+            while len(word) > max_chars:
+                if current:
+                    lines.append(current)
+                    current = ""
+                lines.append(word[:max_chars])
+                word = word[max_chars:]
+            if not current:
+                current = word
+            elif len(current) + 1 + len(word) <= max_chars:
+                current = current + " " + word
+            else:
+                lines.append(current)
+                current = word
+        lines.append(current)
+    return lines
+
+
+def choose_scale(body, max_width, max_height):
+    """Return (scale, lines) for the largest scale at which body fits the box."""
+    for scale in (4, 3, 2, 1):
+        chars_per_line = max_width // (6 * scale)
+        if chars_per_line < 1:
+            continue
+        lines = wrap_text(body, chars_per_line)
+        total_h = len(lines) * 12 * scale
+        if total_h <= max_height:
+            return scale, lines
+    # Fallback: scale 1, truncate to fit
+    chars_per_line = max(1, max_width // 6)
+    max_lines = max(1, max_height // 12)
+    lines = wrap_text(body, chars_per_line)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1][: max(0, chars_per_line - 1)] + "..."
+    return 1, lines
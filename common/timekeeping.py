@@ -0,0 +1,243 @@
+"""Wall clock that survives deep sleep, resynced over NTP on a drift budget.
+
+The ESP32-S2 RTC keeps counting through deep sleep, so once it is set to UTC
+every later wake can read the time from time.time() without touching the
+network. What the RTC cannot tell us is how far it has drifted, so
+sleep_memory keeps the epoch of the last sync, the UTC offset and a drift
+rate measured at each resync. needs_sync() turns True once the estimated
+error passes CLOCK_DRIFT_BUDGET seconds (or the sync is older than
+CLOCK_MAX_SYNC_HOURS).
+
+Apps that make an HTTPS request anyway call sync_from_response() with it:
+the Date header is UTC to the second, which is well inside the budget, so
+the resync costs nothing. now() falls back to sync(), which fetches UTC from
+NTP over UDP, only if that did not happen.
+
+The UTC offset is not something NTP or a Date header knows. It is refreshed
+from the Adafruit IO strftime integration (%z) every OFFSET_REFRESH seconds,
+and as soon as DST_RULE says daylight saving started or ended since the last
+refresh; that same request stands in for NTP if UDP is blocked. After
+sync_from_response() the refresh waits for now(): a second request on the
+session would close the response the app is still reading. AIO is
+optional: without ADAFRUIT_AIO_* settings UTC_OFFSET_HOURS is used (it does
+not follow DST).
+
+settings.toml:
+    CLOCK_DRIFT_BUDGET = 60      # seconds of error tolerated before a resync
+    CLOCK_MAX_SYNC_HOURS = 24    # resync at least this often regardless
+    NTP_SERVER = "pool.ntp.org"
+    UTC_OFFSET_HOURS = -5        # only used without ADAFRUIT_AIO_* settings
+    DST_RULE = "US"              # "US", "EU" or "none": when to refresh the offset early
+"""
+import os
+import time
+
+import persist
+from dates import dst_active, parse_http_date, parse_iso, to_epoch
+
+DEFAULT_DRIFT_RATE = 10.0  # s/hour assumed until a resync measures it
+MIN_DRIFT_RATE = 0.5  # keeps the budget from stretching forever
+OFFSET_REFRESH = 24 * 3600
+NTP_TIMEOUT = 5
+AIO_TIMEOUT = 10
+
+
+def _setting(name, default):
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _state():
+    return persist.load_json("clock")
+
+
+def is_set():
+    """True if the RTC was set to UTC since sleep_memory was last wiped."""
+    state = _state()
+    return bool(state) and time.time() >= state["synced"]
+
+
+def needs_sync():
+    """True if the clock was never set or its drift budget is spent."""
+    state = _state()
+    if not state:
+        return True
+    age = time.time() - state["synced"]
+    if age < 0:
+        return True  # RTC went backwards: it was reset
+    rate = max(state.get("rate", DEFAULT_DRIFT_RATE), MIN_DRIFT_RATE)
+    budget_age = _setting("CLOCK_DRIFT_BUDGET", 60) / rate * 3600
+    max_age = _setting("CLOCK_MAX_SYNC_HOURS", 24) * 3600
+    return age > min(budget_age, max_age)
+
+
+def _ntp_utc(pool, timeout):
+    import adafruit_ntp
+
+    ntp = adafruit_ntp.NTP(
+        pool,
+        server=os.getenv("NTP_SERVER") or "pool.ntp.org",
+        tz_offset=0,
+        socket_timeout=min(NTP_TIMEOUT, timeout),
+    )
+    return ntp.datetime
+
+
+def _aio_local_and_offset(requests, timeout):
+    """Return (local_tuple, offset_seconds) from one AIO strftime request."""
+    aio_username = os.getenv("ADAFRUIT_AIO_USERNAME")
+    aio_key = os.getenv("ADAFRUIT_AIO_KEY")
+    if not aio_username or not aio_key:
+        return None
+    url = (
+        f"https://io.adafruit.com/api/v2/{aio_username}/integrations/time/strftime"
+        f"?x-aio-key={aio_key}&tz={os.getenv('TIMEZONE')}"
+        "&fmt=%25Y-%25m-%25d+%25H%3A%25M%3A%25S+%25z"
+    )
+    response = requests.get(url, timeout=timeout)
+    text = response.text.strip()  # "2026-02-15 15:30:05 -0500"
+    response.close()
+    stamp, zone = text.rsplit(" ", 1)
+    sign = -1 if zone[0] == "-" else 1
+    offset = sign * (int(zone[1:3]) * 3600 + int(zone[3:5]) * 60)
+    return parse_iso(stamp), offset
+
+
+def _dst(utc_epoch, offset):
+    t = time.localtime(utc_epoch + offset)
+    return dst_active(os.getenv("DST_RULE") or "US", t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour)
+
+
+def _offset_due(state, utc_epoch):
+    if "offset" not in state:
+        return True
+    if utc_epoch is None:
+        return True
+    offset_at = state.get("offset_at", 0)
+    if utc_epoch - offset_at > OFFSET_REFRESH:
+        return True
+    # The cached offset is from the other side of a DST change
+    return _dst(offset_at, state["offset"]) != _dst(utc_epoch, state["offset"])
+
+
+def _refresh_offset(state, requests, utc_epoch, timeout=AIO_TIMEOUT):
+    """Update state["offset"] from AIO, or from UTC_OFFSET_HOURS without it.
+
+    Returns utc_epoch, filled in from the AIO answer if it was None.
+    """
+    try:
+        aio = _aio_local_and_offset(requests, timeout)
+    except Exception as e:
+        print(f"AIO time failed: {e}")
+        return utc_epoch
+    if aio:
+        local_t, state["offset"] = aio
+        if utc_epoch is None:
+            utc_epoch = int(to_epoch(local_t)) - state["offset"]
+    elif utc_epoch is not None:
+        state["offset"] = int(_setting("UTC_OFFSET_HOURS", 0) * 3600)
+    else:
+        return None
+    state["offset_at"] = utc_epoch
+    return utc_epoch
+
+
+def _set_clock(state, utc_epoch):
+    import rtc
+
+    rtc_epoch = int(time.time())
+    if "synced" in state and utc_epoch > state["synced"]:
+        hours = (utc_epoch - state["synced"]) / 3600
+        error = rtc_epoch - utc_epoch
+        print(f"Clock drift {error:+d}s over {hours:.1f}h")
+        if hours >= 0.25:
+            rate = abs(error) / hours
+            state["rate"] = (state.get("rate", rate) + rate) / 2
+
+    rtc.RTC().datetime = time.localtime(utc_epoch)
+    state["synced"] = utc_epoch
+    if "offset" not in state:
+        state["offset"] = int(_setting("UTC_OFFSET_HOURS", 0) * 3600)
+    persist.save_json("clock", state)
+
+
+def sync(pool, requests=None, timeout=AIO_TIMEOUT):
+    """Set the RTC to UTC and refresh the offset if due. Returns True on success.
+
+    timeout caps each of the NTP and AIO requests.
+    """
+    state = _state() or {}
+    utc_epoch = None
+    try:
+        utc_epoch = int(time.mktime(_ntp_utc(pool, timeout)))
+    except Exception as e:
+        print(f"NTP sync failed: {e}")
+
+    if requests is not None and _offset_due(state, utc_epoch):
+        utc_epoch = _refresh_offset(state, requests, utc_epoch, timeout)
+    if utc_epoch is None:
+        return False
+    _set_clock(state, utc_epoch)
+    return True
+
+
+def sync_from_utc(utc_t, requests=None):
+    """Use a UTC (y, m, d, h, mi, s) the server handed us instead of NTP.
+
+    The clock is only reset when needs_sync() says so, which keeps the drift
+    measurement meaningful. Returns True if the clock is good afterwards.
+    """
+    utc_epoch = int(to_epoch(utc_t))
+    state = _state() or {}
+    offset_due = _offset_due(state, utc_epoch)
+    if offset_due and requests is not None:
+        _refresh_offset(state, requests, utc_epoch)
+    if needs_sync():
+        _set_clock(state, utc_epoch)
+    elif offset_due:
+        persist.save_json("clock", state)
+    return True
+
+
+def sync_from_response(response):
+    """sync_from_utc() from a response's Date header. False if it has none.
+
+    The body may still be unread, so no request is made here; now() refreshes
+    the UTC offset if it is due.
+    """
+    date = response.headers.get("date")
+    if not date:
+        return False
+    try:
+        utc_t = parse_http_date(date)
+    except (ValueError, IndexError):
+        print(f"Bad Date header: {date}")
+        return False
+    return sync_from_utc(utc_t)
+
+
+def utc_offset():
+    """Seconds to add to UTC for local time (0 if never synced)."""
+    state = _state()
+    return state.get("offset", 0) if state else 0
+
+
+def local_time():
+    """Local time as (y, m, d, h, mi, s) from the RTC and cached offset."""
+    t = time.localtime(time.time() + utc_offset())
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
+
+
+def now(pool=None, requests=None, timeout=AIO_TIMEOUT):
+    """local_time(), after a sync or offset refresh if one is due and the network is up."""
+    if pool is not None and needs_sync():
+        sync(pool, requests, timeout)
+    elif requests is not None:
+        state = _state()
+        utc_epoch = int(time.time())
+        if state and _offset_due(state, utc_epoch):
+            _refresh_offset(state, requests, utc_epoch, timeout)
+            persist.save_json("clock", state)
+    return local_time()
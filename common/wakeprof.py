@@ -0,0 +1,156 @@
+"""Per-phase wake timings, kept for the last WAKES wakes in sleep_memory.
+
+mark(name) notes the milliseconds since the wake began and gc.mem_free() at
+a phase boundary: a struct.pack_into into a preallocated buffer, a few tens
+of microseconds. Deadline.run() marks every network phase under its own
+name, the apps mark "import", "render" (displayio tree built) and "refresh"
+(panel done), requests mark "headers" (connect + TLS + server time) and
+"body" (read and parsed), and power.deep_sleep() marks "sleep" and calls
+finish(), which files the wake into the ring. A wake costs well under 1 ms
+of profiling.
+
+Ring layout (the "wakeprof" persist slot):
+    [0:2]   wakes recorded so far (wraps at 65536)
+    [2:4]   that count at the last upload
+    then WAKES records of
+        >HBB  wake number, cause (0 reset, 1 timer, 2 button), mark count
+        MARKS x >BHH  phase id (PHASES index), TICK_MS ticks since boot,
+                      mem_free // 64
+Ticks saturate at 0xFFFF, MAX_MS (655 s) after boot; wakes() reports a
+saturated mark as MAX_MS and dump() flags it with ">". The ring is 260
+bytes, small enough for the board's 4096 bytes of sleep_memory.
+
+The ring is printed with dump(), from the REPL or after every wake with
+PROFILE_DUMP set. With PROFILE_UPLOAD_URL set, upload() POSTs the raw ring
+once WAKES new wakes are in it. tools/wakeprof.py decodes either form.
+
+settings.toml:
+    PROFILE_DUMP = 1                     # print the ring before every sleep
+    PROFILE_UPLOAD_URL = "https://..."   # receives the ring, octet-stream
+"""
+import gc
+import os
+import struct
+import time
+
+import persist
+
+PHASES = (
+    "import", "wifi", "headers", "body", "poll", "ack", "refetch", "ynab",
+    "graphql", "time", "render", "refresh", "sleep", "profile", "other",
+)
+WAKES = 4
+MARKS = 12  # per wake; later marks overwrite the last one
+TICK_MS = 10  # a timed-out WiFi or OTA phase still fits in 16 bits
+MAX_MS = 0xFFFF * TICK_MS
+_IDS = {name: i for i, name in enumerate(PHASES)}
+_OTHER = _IDS["other"]
+_MARK = ">BHH"
+_MARK_SIZE = struct.calcsize(_MARK)
+_HEAD = ">HBB"
+_HEAD_SIZE = struct.calcsize(_HEAD)
+_WAKE_SIZE = _HEAD_SIZE + MARKS * _MARK_SIZE
+_RING_SIZE = 4 + WAKES * _WAKE_SIZE
+CAUSES = ("reset", "timer", "button")
+
+_marks = bytearray(MARKS * _MARK_SIZE)
+_count = 0
+# CircuitPython only; host tools that import the app modules read 0
+_mem_free = getattr(gc, "mem_free", lambda: 0)
+
+
+def mark(name):
+    """Record the phase that just ended."""
+    global _count
+    i = min(_count, MARKS - 1)
+    struct.pack_into(
+        _MARK, _marks, i * _MARK_SIZE,
+        _IDS.get(name, _OTHER),
+        min(time.monotonic_ns() // (TICK_MS * 1000000), 0xFFFF),
+        min(_mem_free() // 64, 0xFFFF),
+    )
+    _count = i + 1
+
+
+def _cause():
+    try:
+        import alarm
+    except ImportError:
+        return 0
+    wake = alarm.wake_alarm
+    if wake is None:
+        return 0
+    return 1 if isinstance(wake, alarm.time.TimeAlarm) else 2
+
+
+def _ring():
+    ring = persist.load("wakeprof")
+    if ring is None or len(ring) != _RING_SIZE:
+        return bytearray(_RING_SIZE)
+    return bytearray(ring)
+
+
+def finish():
+    """Mark "sleep" and file this wake into the ring. Called by power.deep_sleep()."""
+    mark("sleep")
+    ring = _ring()
+    number = struct.unpack_from(">H", ring, 0)[0]
+    offset = 4 + (number % WAKES) * _WAKE_SIZE
+    struct.pack_into(_HEAD, ring, offset, number, _cause(), _count)
+    ring[offset + _HEAD_SIZE:offset + _WAKE_SIZE] = _marks
+    struct.pack_into(">H", ring, 0, (number + 1) & 0xFFFF)
+    persist.save("wakeprof", ring)
+    if os.getenv("PROFILE_DUMP"):
+        dump(ring)
+
+
+def wakes(ring):
+    """Decode a ring: [(number, cause, [(phase, ms, mem_free), ...])], oldest first."""
+    total = struct.unpack_from(">H", ring, 0)[0]
+    result = []
+    for n in range(max(0, total - WAKES), total):
+        offset = 4 + (n % WAKES) * _WAKE_SIZE
+        number, cause, count = struct.unpack_from(_HEAD, ring, offset)
+        marks = []
+        for i in range(count):
+            phase, ticks, mem = struct.unpack_from(_MARK, ring, offset + _HEAD_SIZE + i * _MARK_SIZE)
+            marks.append((PHASES[phase] if phase < len(PHASES) else "?", ticks * TICK_MS, mem * 64))
+        result.append((number, CAUSES[cause] if cause < len(CAUSES) else "?", marks))
+    return result
+
+
+def dump(ring=None):
+    """Print the ring: one line per wake, each phase as name@ms(mem_free KB)."""
+    for number, cause, marks in wakes(ring or _ring()):
+        phases = " ".join(
+            f"{phase}@{'>' if ms >= MAX_MS else ''}{ms}({mem // 1024}K)" for phase, ms, mem in marks
+        )
+        print(f"wake {number} {cause}: {phases}")
+
+
+def upload_due():
+    if not os.getenv("PROFILE_UPLOAD_URL"):
+        return False
+    ring = persist.load("wakeprof")
+    if ring is None:
+        return False
+    total, uploaded = struct.unpack_from(">HH", ring, 0)
+    return (total - uploaded) & 0xFFFF >= WAKES
+
+
+def upload(requests, timeout):
+    """POST the ring to PROFILE_UPLOAD_URL. Returns True once it is accepted."""
+    ring = _ring()
+    response = requests.post(
+        os.getenv("PROFILE_UPLOAD_URL"),
+        data=bytes(ring),
+        headers={"Content-Type": "application/octet-stream"},
+        timeout=timeout,
+    )
+    ok = 200 <= response.status_code < 300
+    response.close()
+    if not ok:
+        raise OSError(f"HTTP {response.status_code}")
+    ring[2:4] = ring[0:2]
+    persist.save("wakeprof", ring)
+    return True
@@ -1,3 +1,4 @@
+import gc
 import json
 import os
 import ssl
@@ -6,7 +7,6 @@ import alarm
 import wifi
 import socketpool
 import adafruit_requests
-import analogio
 import board
 import digitalio
 import displayio
@@ -14,6 +14,22 @@ import neopixel
 import terminalio
 from adafruit_display_text import label
 from adafruit_display_shapes.line import Line
+from battery import read_battery
+from dates import format_readable, parse_iso, to_epoch
+from textlayout import choose_scale
+from deadline import Deadline
+from net import connect_wifi
+from power import deep_sleep
+import inbox
+import panel
+import schedule
+import snapshot
+import timekeeping
+import wakeprof
+
+# time.monotonic() restarts at every wake, so this is the boot + import cost
+print(f"Startup: {time.monotonic():.2f}s, mem_free {gc.mem_free()}")
+wakeprof.mark("import")
 
 # --- Button-to-pin mapping ---
 BUTTON_PINS = {
@@ -67,16 +83,20 @@ BODY_LEFT = 2
 BODY_RIGHT = display.width - 2
 BODY_WIDTH = BODY_RIGHT - BODY_LEFT
 
-# --- No persistent state ---
-# We deliberately keep zero device-side state between wakes. The server is the
-# source of truth for which messages are seen vs unseen. On every wake we just
-# fetch the unacked queue (oldest first) and render messages[0]. On Button B
-# we ack messages[0].ts and render messages[1] if present.
+# --- Minimal persistent state ---
+# The server is the source of truth for which messages are seen vs unseen. On
+# every wake we fetch a window of the unacked queue (oldest first) and render
+# messages[0]. On Button B we ack messages[0].ts and render messages[1] from
+# the window kept in sleep_memory (message-board/inbox.py).
 #
 # This avoids ESP32-S2's quirk where storage.remount("/", readonly=False) only
 # takes effect on the first boot after a true power-on/reset — every
 # subsequent deep-sleep wake leaves the filesystem read-only, so any FS write
 # silently fails. Without FS writes that whole class of bug disappears.
+#
+# Besides that window, the device keeps a display cache (common/snapshot.py,
+# in sleep_memory and NVM, not the filesystem): the last message we showed,
+# redrawn with a stale marker when the server can't be reached.
 
 
 def get_wake_button():
@@ -89,109 +109,8 @@ def get_wake_button():
     return None
 
 
-# --- Time helpers ---
-MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-
-
-def parse_iso(s):
-    """Parse 'YYYY-MM-DDTHH:MM:SS[.fff][Z]' or 'YYYY-MM-DD HH:MM:SS' → tuple."""
-    s = s.replace("T", " ").replace("Z", "")
-    if "." in s:
-        s = s.split(".")[0]
-    date_part, time_part = s.split(" ")
-    y, mo, d = [int(x) for x in date_part.split("-")]
-    h, mi, sec = [int(x) for x in time_part.split(":")]
-    return (y, mo, d, h, mi, sec)
-
-
-def to_epoch(t):
-    """time.mktime treats input as local; we use it consistently to compute deltas."""
-    return time.mktime((t[0], t[1], t[2], t[3], t[4], t[5], 0, 0, -1))
-
-
-def format_readable(t):
-    """(y,m,d,h,m,s) → 'May 23, 3:25 PM' (matches adafruit IO %b %e, %l:%M %p style)."""
-    h = t[3]
-    ampm = "AM" if h < 12 else "PM"
-    h12 = h % 12 or 12
-    return f"{MONTHS[t[1]-1]} {t[2]}, {h12}:{t[4]:02d} {ampm}"
-
-
 # --- Battery ---
-LIPO_CURVE = [
-    (4.20, 100), (4.15, 95), (4.10, 90), (4.05, 85),
-    (4.00, 80),  (3.90, 70), (3.80, 60), (3.70, 50),
-    (3.60, 40),  (3.50, 30), (3.40, 20), (3.30, 10),
-    (3.20, 5),   (3.00, 0),
-]
-
-def voltage_to_percent(v):
-    if v >= LIPO_CURVE[0][0]:
-        return 100
-    if v <= LIPO_CURVE[-1][0]:
-        return 0
-    for i in range(len(LIPO_CURVE) - 1):
-        v_hi, p_hi = LIPO_CURVE[i]
-        v_lo, p_lo = LIPO_CURVE[i + 1]
-        if v >= v_lo:
-            return p_lo + (p_hi - p_lo) * (v - v_lo) / (v_hi - v_lo)
-    return 0
-
-try:
-    vbat = analogio.AnalogIn(board.VOLTAGE_MONITOR)
-    battery_voltage = (vbat.value / 65535.0) * 3.3 * 2
-    vbat.deinit()
-    battery_percent = voltage_to_percent(battery_voltage)
-except Exception:
-    battery_voltage = 0.0
-    battery_percent = 0
-
-
-# --- Word wrap and dynamic scale ---
-def wrap_text(text, max_chars):
-    if max_chars < 1:
-        return [text]
-    lines = []
-    for paragraph in text.split("\n"):
-        words = paragraph.split(" ")
-        current = ""
-        for word in words:
-            # Word longer than max_chars on its own — hard-break
-            while len(word) > max_chars:
-                if current:
-                    lines.append(current)
-                    current = ""
-                lines.append(word[:max_chars])
-                word = word[max_chars:]
-            if not current:
-                current = word
-            elif len(current) + 1 + len(word) <= max_chars:
-                current = current + " " + word
-            else:
-                lines.append(current)
-                current = word
-        lines.append(current)
-    return lines
-
-
-def choose_scale(body, max_width, max_height):
-    for scale in (4, 3, 2, 1):
-        chars_per_line = max_width // (6 * scale)
-        if chars_per_line < 1:
-            continue
-        lines = wrap_text(body, chars_per_line)
-        total_h = len(lines) * 12 * scale
-        if total_h <= max_height:
-            return scale, lines
-    # Fallback: scale 1, truncate to fit
-    chars_per_line = max(1, max_width // 6)
-    max_lines = max(1, max_height // 12)
-    lines = wrap_text(body, chars_per_line)
-    if len(lines) > max_lines:
-        lines = lines[:max_lines]
-        lines[-1] = lines[-1][: max(0, chars_per_line - 1)] + "..."
-    return 1, lines
+battery_voltage, battery_percent = read_battery()
 
 
 # --- Wake handling: identify button early for fast feedback ---
@@ -203,122 +122,188 @@ if wake_button:
 # --- WiFi ---
 ssid = os.getenv("CIRCUITPY_WIFI_SSID")
 password = os.getenv("CIRCUITPY_WIFI_PASSWORD")
-aio_username = os.getenv("ADAFRUIT_AIO_USERNAME")
-aio_key = os.getenv("ADAFRUIT_AIO_KEY")
-timezone = os.getenv("TIMEZONE")
 
 MSG_API_URL = os.getenv("MSG_API_URL")
 MSG_ACK_URL = os.getenv("MSG_ACK_URL")
 MSG_API_TOKEN = os.getenv("MSG_API_TOKEN")
 
-TIME_URL = (
-    f"https://io.adafruit.com/api/v2/{aio_username}/integrations/time/strftime"
-    f"?x-aio-key={aio_key}&tz={timezone}"
-    "&fmt=%25Y-%25m-%25d+%25H%3A%25M%3A%25S"
-)
-TIME_URL_READABLE = (
-    f"https://io.adafruit.com/api/v2/{aio_username}/integrations/time/strftime"
-    f"?x-aio-key={aio_key}&tz={timezone}"
-    "&fmt=%25b+%25e,+%25l:%25M+%25p"
-)
+SLEEP_MINS = 30  # base interval; common/schedule.py stretches it
+
+# Every network phase below draws its timeouts from one per-wake budget
+deadline = Deadline()
+
+
+def give_up():
+    """Nothing reached the server: keep the last render and try again later."""
+    deadline.report()
+    pixels.deinit()
+    deep_sleep(schedule.next_minutes(SLEEP_MINS, False, (battery_voltage, battery_percent)))
 
-print("Connecting to", ssid)
-wifi.radio.connect(ssid, password)
-pool = socketpool.SocketPool(wifi.radio)
-requests = adafruit_requests.Session(pool, ssl.create_default_context())
 
-current_date_time = requests.get(TIME_URL).text.strip()
-current_readable_time = requests.get(TIME_URL_READABLE).text.strip()
-print("Local now:", current_date_time)
+online = deadline.run("wifi", lambda timeout: connect_wifi(ssid, password, timeout)) is not None
+if online:
+    pool = socketpool.SocketPool(wifi.radio)
+    requests = adafruit_requests.Session(pool, ssl.create_default_context())
 
 
 # --- API helpers ---
 auth_headers = {"Authorization": f"Bearer {MSG_API_TOKEN}"} if MSG_API_TOKEN else {}
 
 
-def fetch_messages():
-    """Returns (messages, server_now, fallback). messages is [] or [single message]."""
-    if not MSG_API_URL:
-        return None, None, False
-    url = MSG_API_URL
-    sep = "&" if "?" in url else "?"
-    url = f"{url}{sep}fallback=acked&limit=1"
-    try:
-        r = requests.get(url, headers=auth_headers)
-        if r.status_code != 200:
-            print(f"GET /messages: HTTP {r.status_code}")
-            r.close()
-            return None, None, False
-        data = r.json()
-        r.close()
-        return data.get("messages", []), data.get("now"), bool(data.get("fallback", False))
-    except Exception as e:
-        print(f"GET /messages failed: {e}")
-        return None, None, False
-
-
-def ack_messages(up_to_ts):
-    """Returns (status_str, acked_count). status: 'ok'|'noop'|'http<NNN>'|'noconfig'|'err'."""
-    if not MSG_ACK_URL:
-        return ("noconfig", 0)
-    if not up_to_ts:
-        return ("noconfig", 0)
-    try:
-        r = requests.post(
-            MSG_ACK_URL,
-            json={"up_to_ts": up_to_ts},
-            headers=auth_headers,
-        )
-        code = r.status_code
-        acked = 0
-        try:
-            body = r.json()
-            acked = int(body.get("acked", 0))
-            print(f"Ack response: {body}")
-        except Exception:
-            pass
-        r.close()
-        if code != 200:
-            return (f"http{code}", acked)
-        if acked == 0:
-            return ("noop", 0)
-        return ("ok", acked)
-    except Exception as e:
-        print(f"POST ack failed: {e}")
-        return ("err", 0)
-
-
-# --- Stateless poll + optional ack ---
-ack_status = None  # None | (code, n)
-
-messages, server_now, is_fallback = fetch_messages()
+def fetch_messages(timeout, etag=None):
+    return inbox.fetch(requests, MSG_API_URL, auth_headers, timeout, etag)
+
+
+def ack_messages(up_to_ts, timeout):
+    return inbox.ack(requests, MSG_ACK_URL, auth_headers, up_to_ts, timeout)
+
+
+def flush_acks():
+    """Send the queued ack; the queue is cleared once the server settled it."""
+    up_to_ts = inbox.pending_ack()
+    print(f"Acking up to {up_to_ts}")
+    status = deadline.run("ack", lambda timeout: ack_messages(up_to_ts, timeout)) or ("err", 0, None)
+    if inbox.ack_settled(status[0]):
+        inbox.clear_acks()
+    return status
+
+
+# --- Button B: queue the ack, advance the window ---
+# Button B acks what is on screen: the window's first message. The ack is
+# queued (sleep_memory + NVM) before any network, coalesced with presses that
+# have not reached the server yet, and the next message is drawn from the
+# window at once, online or not. Never ack a fallback (already seen) message.
+ack_status = None  # None | (code, n, polled)
+window = inbox.load_window()
+if not window:
+    # After a power loss only the snapshot (what the panel shows) is left
+    cached = snapshot.load()[0]
+    if cached and cached[0]:
+        window = {"m": [cached[0]], "fb": cached[1], "more": True}
+
+messages = None  # None until the window or a poll says what to draw
+server_now = None
+is_fallback = False
+more = False
+etag = None
+from_server = False
+if wake_button == "B" and window and window["m"] and not window["fb"]:
+    pending = inbox.queue_ack(window["m"][0].get("ts"))
+    messages = inbox.after_ack(window["m"], pending)
+    more = window.get("more", False)
+    ack_status = ("queued", 0, None)
+
+# --- Flush queued acks, then poll ---
+if online and inbox.pending_ack():
+    status = flush_acks()
+    if ack_status is not None:
+        ack_status = status  # this wake's press: its outcome drives the LEDs
+    if status[2] is not None:
+        # Ack-and-advance: the reply carries the queue after the ack
+        messages, server_now, is_fallback = status[2]
+        more = len(messages) >= inbox.WINDOW
+        from_server = True
+
+polled = None
+if online and not from_server:
+    if messages is None:
+        # Conditional on the window's ETag: 304 when nothing changed
+        last_etag = window.get("e") if window else None
+        polled = deadline.run("poll", lambda timeout: fetch_messages(timeout, last_etag))
+    elif ack_status[0] == "noop" or (ack_status[0] == "ok" and inbox.needs_refill(messages, more)):
+        # noop: the window was out of date (acked elsewhere), so refetch too.
+        # Optional: skipped once the budget is spent, like a failed re-fetch
+        polled = deadline.run("refetch", fetch_messages, optional=True)
+    if polled is not None and polled[0] is inbox.UNCHANGED:
+        print("Queue unchanged")
+        messages, is_fallback, more = window["m"], window["fb"], window.get("more", False)
+        server_now, etag = polled[1], polled[3]
+        from_server = True
+    elif polled is not None and polled[0] is not None:
+        messages, server_now, is_fallback, etag = polled
+        more = len(messages) >= inbox.WINDOW
+        pending = inbox.pending_ack()
+        if pending:
+            # The flush failed: keep hiding what the user already acked
+            messages = inbox.after_ack(messages, pending)
+            etag = None
+        from_server = True
+
+# --- Offline fallback ---
+# If the poll failed, show the last message we had (marked stale) instead of
+# "No messages". Once that is on the panel, later failing wakes just sleep.
+stale_as_of = None
+if messages is None:
+    cached, as_of, shown = snapshot.load()
+    if (cached is None and polled is None) or (cached is not None and shown):
+        give_up()
+    if cached is not None:
+        current_msg, is_fallback = cached
+        messages = [current_msg] if current_msg else []
+        stale_as_of = as_of
+        stale_reason = "offline" if polled is None else "API error"
+        snapshot.mark_shown()
+elif not from_server and ack_status[0] not in ("ok", "noop"):
+    # Advanced from the window with the ack still queued
+    stale_as_of = snapshot.load()[1] or "last poll"
+    stale_reason = "offline" if not online else "ack queued"
 if messages is None:
     messages = []
 
 current_msg = messages[0] if messages else None
+changed = ack_status is not None  # a press is activity: poll at the base rate
+if stale_as_of is not None and ack_status is not None:
+    # The panel is about to show the advanced window: later failing wakes
+    # must keep it rather than redraw the message that was just acked
+    snapshot.save([current_msg, is_fallback], stale_as_of)
+    snapshot.mark_shown()
+
+if from_server or ack_status is not None:
+    inbox.save_window(messages, is_fallback, more, etag)
+
+
+# --- Local time ---
+# The RTC was resynced from the poll's Date header if its drift budget was
+# spent. The body's "now" covers a proxy that strips the header, and NTP is
+# the last resort.
+now = None
+if online:
+    if server_now and timekeeping.needs_sync():
+        try:
+            timekeeping.sync_from_utc(parse_iso(server_now), requests)
+        except (ValueError, AttributeError):
+            print(f"Bad server time: {server_now}")
+    now = deadline.run(
+        "time", lambda timeout: timekeeping.now(pool, requests, timeout), optional=True
+    )
+now = now or timekeeping.local_time()
+if online and wakeprof.upload_due():
+    deadline.run("profile", lambda timeout: wakeprof.upload(requests, timeout), optional=True)
+deadline.report()
+current_readable_time = format_readable(now)
+print("Local now:", now)
+
+if from_server or (ack_status is not None and stale_as_of is None):
+    changed = snapshot.save([current_msg, is_fallback], current_readable_time) or changed
+
+# --- Nothing new: leave the panel as it is ---
+# A timer wake that would redraw the same message with only the refresh time
+# moved skips the ~2 s panel refresh, whether the poll came back 304 or the
+# same window, until the status bar is too old (common/panel.py). Presses
+# always redraw.
+render_model = [
+    current_msg and [current_msg.get("ts"), current_msg.get("from"), current_msg.get("body")],
+    is_fallback, stale_as_of, stale_as_of and stale_reason, timekeeping.utc_offset(),
+]
+if panel.unchanged(render_model, battery_percent):
+    print("Panel unchanged, skipping refresh")
+    if current_msg and not is_fallback:
+        flash_blue()
+    pixels.deinit()
+    deep_sleep(schedule.next_minutes(SLEEP_MINS, False, (battery_voltage, battery_percent)))
 
-# Button B = ack the message currently on screen, then re-fetch to advance.
-# Only ack if the shown message is actually unseen (don't re-ack a fallback).
-if wake_button == "B" and current_msg and not is_fallback:
-    ack_ts = current_msg.get("ts")
-    print(f"Acking up to {ack_ts}")
-    ack_status = ack_messages(ack_ts)
-    if ack_status[0] == "ok":
-        messages, server_now, is_fallback = fetch_messages()
-        if messages is None:
-            messages = []
-        current_msg = messages[0] if messages else None
-
-
-# --- Compute local-time offset for formatting message ts ---
-offset_sec = 0
-try:
-    local_t = parse_iso(current_date_time)
-    if server_now:
-        utc_t = parse_iso(server_now)
-        offset_sec = to_epoch(local_t) - to_epoch(utc_t)
-except Exception as e:
-    print(f"Time offset calc failed: {e}")
+# Local-time offset for formatting message ts
+offset_sec = timekeeping.utc_offset()
 
 
 def format_msg_when(iso_ts):
@@ -343,9 +328,12 @@ content_group = displayio.Group(y=DISPLAY_Y_OFFSET)
 main_group.append(content_group)
 
 # Status bar: refresh time (left), battery (right), separator below
+status_text = f"Refreshed: {current_readable_time}"
+if stale_as_of is not None:
+    status_text = f"As of {stale_as_of} ({stale_reason})"
 content_group.append(label.Label(
     terminalio.FONT,
-    text=f"Refreshed: {current_readable_time}",
+    text=status_text,
     color=0x000000,
     anchor_point=(0.0, 0.5),
     anchored_position=(2, STATUS_BAR_HEIGHT // 2),
@@ -427,6 +415,7 @@ for i, name in enumerate(btn_order):
 
 # Refresh
 display.root_group = main_group
+wakeprof.mark("render")
 time.sleep(display.time_to_refresh)
 display.refresh()
 
@@ -440,8 +429,13 @@ if ack_status is not None:
         pixels.show()
         time.sleep(0.4)
         pixels.fill(0); pixels.show()
+    elif not inbox.ack_settled(code):
+        pixels.fill((0, 80, 80))    # cyan: offline / network / server error, ack queued for later
+        pixels.show()
+        time.sleep(0.4)
+        pixels.fill(0); pixels.show()
     else:
-        pixels.fill((150, 0, 0))    # red: HTTP error / network / no config
+        pixels.fill((150, 0, 0))    # red: rejected by the server / no config
         pixels.show()
         time.sleep(0.4)
         pixels.fill(0); pixels.show()
@@ -450,6 +444,8 @@ elif current_msg:
 
 while display.busy:
     pass
+wakeprof.mark("refresh")
+panel.shown(render_model, battery_percent)
 
 
 # --- Dev mode escape hatch ---
@@ -463,17 +459,5 @@ btn_a.deinit()
 if dev_skip_sleep:
     print("Dev mode — skipping deep sleep. REPL active.")
 else:
-    wifi.radio.enabled = False
     pixels.deinit()
-
-    SLEEP_MINS = 30
-    time_alarm = alarm.time.TimeAlarm(monotonic_time=time.monotonic() + (SLEEP_MINS * 60))
-    button_a_alarm = alarm.pin.PinAlarm(pin=board.D15, value=False, pull=True)
-    button_b_alarm = alarm.pin.PinAlarm(pin=board.D14, value=False, pull=True)
-    button_c_alarm = alarm.pin.PinAlarm(pin=board.D12, value=False, pull=True)
-    button_d_alarm = alarm.pin.PinAlarm(pin=board.D11, value=False, pull=True)
-
-    print("Entering deep sleep...")
-    alarm.exit_and_deep_sleep_until_alarms(
-        time_alarm, button_a_alarm, button_b_alarm, button_c_alarm, button_d_alarm
-    )
+    deep_sleep(schedule.next_minutes(SLEEP_MINS, changed, (battery_voltage, battery_percent)))
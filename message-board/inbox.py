@@ -0,0 +1,198 @@
+"""Message queue client: the server calls and a window of unacked messages.
+
+The server is the source of truth for which messages are seen. The board
+keeps a copy of the oldest WINDOW unacked messages in sleep_memory, replaced
+on every poll. On Button B the message on screen (window[0]) is acked and
+the next one is drawn straight from the window, so a press costs one POST
+instead of a GET, a POST and a second GET. The window is refilled only when
+it runs low and the server had more than fitted in it, or when it is empty
+and the fallback (last acked) message has to be fetched.
+
+Servers that support ack-and-advance send the refreshed window back in the
+ack reply itself (parse_ack()), which makes the refill free. Against older
+servers the client falls back to a separate GET. tools/message_server.py is
+a local reference server for both.
+
+Acks are queued before they are sent: queue_ack() keeps the newest up_to_ts
+pressed in sleep_memory and NVM (acking up to a ts covers every older
+message, so the queue is one timestamp however many presses it holds). Each
+online wake flushes it before polling and clears it once the server has
+settled it, so a press made offline or during a server error is not lost,
+and the window can advance past it right away.
+
+Polls and ack-and-advance replies may carry a next_poll_after hint (body
+field, or X-Next-Poll-After header on a 304) for common/schedule.py.
+
+Timer wakes poll with the window's ETag in If-None-Match. When the queue
+has not changed the server answers 304, no JSON is parsed and code.py
+leaves the panel as it is.
+
+The window lives in sleep_memory only: after a power loss the first wake
+polls as usual.
+"""
+import persist
+import schedule
+import timekeeping
+import wakeprof
+
+WINDOW = 5  # messages fetched per poll
+REFILL_AT = 2  # refetch once fewer than this are left (if the server had more)
+_RETRY_HTTP = ("http408", "http429")  # 4xx worth sending again
+UNCHANGED = "unchanged"  # fetch(): the queue is as the window has it
+_KEEP = ("ts", "from", "body")
+
+
+def _trim(message):
+    return {key: message[key] for key in _KEEP if key in message}
+
+
+def load_window():
+    """{"m": messages, "fb": fallback, "more": server had more, "e": etag}, or None."""
+    window = persist.load_json("msg_window")
+    if not window or "m" not in window:
+        return None
+    return window
+
+
+def save_window(messages, fallback, more, etag=None):
+    """Store the window, dropping messages from the end until it fits.
+
+    etag is the poll's ETag when the window is exactly what the server sent;
+    after a local change (an ack) pass None so the next poll is unconditional.
+    """
+    messages = [_trim(m) for m in messages[:WINDOW]]
+    while not persist.save_json("msg_window", {"m": messages, "fb": fallback, "more": more, "e": etag}):
+        if not messages:
+            persist.clear("msg_window")
+            return
+        messages.pop()
+        more = True
+        etag = None
+
+
+def clear_window():
+    persist.clear("msg_window")
+
+
+def pending_ack():
+    """The queued up_to_ts not yet settled by the server, or None."""
+    record = persist.load_json("msg_acks") or persist.load_json("msg_acks_nvm")
+    return record.get("ts") if record else None
+
+
+def queue_ack(up_to_ts):
+    """Add a press to the queue; returns the coalesced up_to_ts."""
+    pending = max(pending_ack() or "", up_to_ts or "")
+    if pending:
+        record = {"ts": pending}
+        persist.save_json("msg_acks", record)
+        persist.save_json("msg_acks_nvm", record)
+    return pending or None
+
+
+def clear_acks():
+    persist.clear("msg_acks")
+    persist.clear("msg_acks_nvm")
+
+
+def ack_settled(status):
+    """True once an ack status needs no retry: done, or rejected for good."""
+    if status in ("ok", "noop", "noconfig"):
+        return True
+    return status.startswith("http4") and status not in _RETRY_HTTP
+
+
+def fetch(requests, url, headers, timeout, etag=None):
+    """Returns (messages, server_now, fallback, etag), messages oldest first.
+
+    With the window's etag the poll is conditional: a 304 (or a 200 with
+    {"unchanged": true}) returns messages UNCHANGED, the window still stands
+    and no body was parsed. Network errors raise (the deadline retries
+    them); HTTP errors return None messages.
+    """
+    if not url:
+        return None, None, False, None
+    if etag:
+        headers = dict(headers)
+        headers["If-None-Match"] = etag
+    sep = "&" if "?" in url else "?"
+    r = requests.get(f"{url}{sep}fallback=acked&limit={WINDOW}", headers=headers, timeout=timeout)
+    wakeprof.mark("headers")
+    try:
+        timekeeping.sync_from_response(r)
+        schedule.hint(r.headers.get("x-next-poll-after"))
+        if r.status_code == 304:
+            return UNCHANGED, None, False, etag
+        if r.status_code != 200:
+            print(f"GET /messages: HTTP {r.status_code}")
+            return None, None, False, None
+        data = r.json()
+        wakeprof.mark("body")
+        schedule.hint(data.get("next_poll_after"))
+        if etag and data.get("unchanged"):
+            return UNCHANGED, data.get("now"), False, etag
+        messages = data.get("messages", [])
+        return messages, data.get("now"), bool(data.get("fallback", False)), r.headers.get("etag")
+    finally:
+        r.close()
+
+
+def ack(requests, url, headers, up_to_ts, timeout):
+    """Returns (status_str, acked_count, polled); see parse_ack().
+
+    Network errors raise; the caller maps them to 'err'.
+    """
+    if not url:
+        return ("noconfig", 0, None)
+    if not up_to_ts:
+        return ("noconfig", 0, None)
+    r = requests.post(
+        url,
+        json={"up_to_ts": up_to_ts, "next": WINDOW},
+        headers=headers,
+        timeout=timeout,
+    )
+    body = None
+    try:
+        timekeeping.sync_from_response(r)
+        body = r.json()
+        print(f"Ack response: {body}")
+    except Exception:
+        pass
+    r.close()
+    return parse_ack(r.status_code, body)
+
+
+def parse_ack(code, body):
+    """Interpret an ack reply: (status_str, acked_count, polled).
+
+    status: 'ok'|'noop'|'http<NNN>'. A server that supports ack-and-advance
+    answers with the queue as it stands after the ack, the same fields as a
+    poll: {"acked", "messages", "fallback", "now"}. polled is then
+    (messages, server_now, fallback) and no refetch is needed. Older servers
+    answer {"acked"} only and polled is None.
+    """
+    acked = 0
+    polled = None
+    if isinstance(body, dict):
+        try:
+            acked = int(body.get("acked", 0))
+        except (TypeError, ValueError):
+            pass
+        if isinstance(body.get("messages"), list):
+            polled = (body["messages"], body.get("now"), bool(body.get("fallback", False)))
+            schedule.hint(body.get("next_poll_after"))
+    if code != 200:
+        return (f"http{code}", acked, None)
+    if acked == 0:
+        return ("noop", 0, polled)
+    return ("ok", acked, polled)
+
+
+def after_ack(messages, up_to_ts):
+    """The messages still unacked once everything up to up_to_ts is."""
+    return [m for m in messages if m.get("ts", "") > up_to_ts]
+
+
+def needs_refill(messages, more):
+    return not messages or (more and len(messages) < REFILL_AT)
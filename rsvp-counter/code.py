@@ -1,18 +1,31 @@
-import json
+import gc
 import os
 import ssl
 import time
-import alarm
 import wifi
 import socketpool
 import adafruit_requests
-import analogio
 import board
 import digitalio
 import displayio
 import terminalio
 from adafruit_display_text import label
 from adafruit_display_shapes.line import Line
+from battery import read_battery
+from dates import format_readable, utc_to_eastern
+from deadline import Deadline
+from net import connect_wifi
+from power import deep_sleep
+import panel
+import rsvps
+import schedule
+import snapshot
+import timekeeping
+import wakeprof
+
+# time.monotonic() restarts at every wake, so this is the boot + import cost
+print(f"Startup: {time.monotonic():.2f}s, mem_free {gc.mem_free()}")
+wakeprof.mark("import")
 
 # --- Display setup ---
 # Take over the display immediately to prevent terminal output on screen
@@ -40,156 +53,49 @@ STATUS_BAR_HEIGHT = 14
 CONTENT_TOP = STATUS_BAR_HEIGHT + 2
 
 # --- Battery monitoring ---
-LIPO_CURVE = [
-    (4.20, 100), (4.15, 95), (4.10, 90), (4.05, 85),
-    (4.00, 80),  (3.90, 70), (3.80, 60), (3.70, 50),
-    (3.60, 40),  (3.50, 30), (3.40, 20), (3.30, 10),
-    (3.20, 5),   (3.00, 0),
-]
-
-
-def voltage_to_percent(voltage):
-    if voltage >= LIPO_CURVE[0][0]:
-        return 100
-    if voltage <= LIPO_CURVE[-1][0]:
-        return 0
-    for i in range(len(LIPO_CURVE) - 1):
-        v_high, p_high = LIPO_CURVE[i]
-        v_low, p_low = LIPO_CURVE[i + 1]
-        if voltage >= v_low:
-            return p_low + (p_high - p_low) * (voltage - v_low) / (v_high - v_low)
-    return 0
+battery_voltage, battery_percent = read_battery()
 
+# Wake every hour or on any button press for manual refresh
+SLEEP_MINS = 60  # base interval; common/schedule.py stretches it
 
-try:
-    vbat_voltage_pin = analogio.AnalogIn(board.VOLTAGE_MONITOR)
-    battery_voltage = (vbat_voltage_pin.value / 65535.0) * 3.3 * 2
-    vbat_voltage_pin.deinit()
-    battery_percent = voltage_to_percent(battery_voltage)
-except Exception:
-    battery_voltage = 0.0
-    battery_percent = 0
-
-# --- Connect to WiFi & fetch time ---
+# --- Connect to WiFi ---
 ssid = os.getenv("CIRCUITPY_WIFI_SSID")
 password = os.getenv("CIRCUITPY_WIFI_PASSWORD")
-aio_username = os.getenv("ADAFRUIT_AIO_USERNAME")
-aio_key = os.getenv("ADAFRUIT_AIO_KEY")
-timezone = os.getenv("TIMEZONE")
-TIME_URL = (
-    f"https://io.adafruit.com/api/v2/{aio_username}/integrations/time/strftime"
-    f"?x-aio-key={aio_key}&tz={timezone}"
-    "&fmt=%25b+%25e,+%25l:%25M+%25p"
-)
-
-print("Connecting to", ssid)
-wifi.radio.connect(ssid, password)
-print(f"Connected to {ssid}!")
-
-pool = socketpool.SocketPool(wifi.radio)
-requests = adafruit_requests.Session(pool, ssl.create_default_context())
-
-response = requests.get(TIME_URL)
-current_time = response.text.strip()
-response.close()
-print("Current time:", current_time)
-
-# --- US Eastern timezone helpers ---
-
-
-def day_of_week(y, m, d):
-    """Sakamoto's algorithm. Returns 0=Sunday, 1=Mon, ..., 6=Sat."""
-    t = [0, 3, 2, 5, 0, 3, 5, 1, 4, 6, 2, 4]
-    if m < 3:
-        y -= 1
-    return (y + y // 4 - y // 100 + y // 400 + t[m - 1] + d) % 7
-
-
-def eastern_utc_offset(year, month, day):
-    """Return UTC offset for US Eastern time (-4 for EDT, -5 for EST).
-    DST runs from the second Sunday of March to the first Sunday of November."""
-    if month < 3 or month > 11:
-        return -5
-    if 3 < month < 11:
-        return -4
-    if month == 3:
-        # Second Sunday of March: first Sunday on or after the 8th
-        dow_8 = day_of_week(year, 3, 8)
-        second_sun = 8 + (7 - dow_8) % 7
-        return -4 if day >= second_sun else -5
-    # November: first Sunday on or after the 1st
-    dow_1 = day_of_week(year, 11, 1)
-    first_sun = 1 + (7 - dow_1) % 7
-    return -5 if day >= first_sun else -4
-
-
-def utc_to_eastern(y, m, d, h):
-    """Shift a UTC hour to US Eastern, rolling the date if needed."""
-    offset = eastern_utc_offset(y, m, d)
-    h += offset
-    if h < 0:
-        h += 24
-        d -= 1
-        if d < 1:
-            m -= 1
-            if m < 1:
-                m = 12
-                y -= 1
-            dim = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-            if y % 4 == 0 and (y % 100 != 0 or y % 400 == 0):
-                dim[2] = 29
-            d = dim[m]
-    return y, m, d, h
 
+# Every network phase below draws its timeouts from one per-wake budget
+deadline = Deadline()
+online = deadline.run("wifi", lambda timeout: connect_wifi(ssid, password, timeout)) is not None
+if online:
+    pool = socketpool.SocketPool(wifi.radio)
+    requests = adafruit_requests.Session(pool, ssl.create_default_context())
 
 # --- Fetch RSVP data from wedding website GraphQL API ---
 RSVP_API_URL = os.getenv("RSVP_API_URL")
 RSVP_API_KEY = os.getenv("RSVP_API_KEY")
 
-GRAPHQL_QUERY = (
-    "{ "
-    "listGuests(limit: 1000) { items { code guestCount isVendor } } "
-    "listRSVPS(limit: 1000) { items { accessCode guestName numberOfGuests attending createdAt } } "
-    "}"
-)
-
 total_invited = 0
 rsvped_count = 0
 last_rsvp_name = "N/A"
 last_rsvp_date = ""
 api_error = False
 
+
+def fetch_counts(timeout):
+    # Paginated; every page request takes its own timeout from the deadline
+    return rsvps.count(requests, RSVP_API_URL, RSVP_API_KEY, deadline)
+
+
+data = None
+if online:
+    data = deadline.run("graphql", fetch_counts)
+
 try:
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": RSVP_API_KEY,
-    }
-    payload = json.dumps({"query": GRAPHQL_QUERY})
-    response = requests.post(RSVP_API_URL, data=payload, headers=headers)
-    data = response.json()
-    response.close()
-
-    # Parse guests for total invited count (exclude vendors)
-    guest_to_total_count = {}
-    guests = data.get("data", {}).get("listGuests", {}).get("items", [])
-    for guest in guests:
-        if not guest.get("isVendor", False):
-            total_invited += guest.get("guestCount", 0)
-            guest_to_total_count[guest.get("code")] = guest.get("guestCount", 0)
-
-    # Parse RSVPs for total guest count and most recent RSVP
-    rsvps = data.get("data", {}).get("listRSVPS", {}).get("items", [])
-    latest_rsvp = None
-    for rsvp in rsvps:
-        rsvped_count += guest_to_total_count.get(rsvp.get("accessCode"), 0)
-        # Track most recent RSVP by createdAt (ISO 8601 sorts lexically)
-        created = rsvp.get("createdAt", "")
-        if latest_rsvp is None or created > latest_rsvp.get("createdAt", ""):
-            latest_rsvp = rsvp
+    if data is None:
+        raise ConnectionError("GraphQL API unreachable")
 
+    total_invited, rsvped_count, latest_rsvp = data
     if latest_rsvp:
-        last_rsvp_name = latest_rsvp.get("guestName", "Unknown")
-        raw_date = latest_rsvp.get("createdAt", "")
+        last_rsvp_name, raw_date = latest_rsvp
         # Format ISO 8601 "2026-01-15T15:45:30.123Z" -> "1/15 3:45 PM ET"
         if raw_date and "T" in raw_date:
             date_part = raw_date.split("T")[0]
@@ -213,12 +119,68 @@ except Exception as e:
     print(f"API error: {e}")
     api_error = True
 
+# --- Offline fallback ---
+# Draw the last good counts, marked stale, rather than an error. Once that
+# is on the panel there is nothing new to show until a fetch works again.
+stale_as_of = None
+changed = False
+if api_error:
+    cached, as_of, shown = snapshot.load()
+    if cached is None and data is None:
+        # Never fetched anything and the network is down: leave the panel be
+        deadline.report()
+        deep_sleep(schedule.next_minutes(SLEEP_MINS, False, (battery_voltage, battery_percent)))
+    if cached is not None:
+        if shown:
+            deadline.report()
+            deep_sleep(schedule.next_minutes(SLEEP_MINS, False, (battery_voltage, battery_percent)))
+        total_invited, rsvped_count, last_rsvp_name, last_rsvp_date = cached
+        stale_as_of = as_of
+        stale_reason = "offline" if data is None else "API error"
+        api_error = False
+        snapshot.mark_shown()
+
+# --- Local time ---
+# The RTC was resynced from the GraphQL response's Date header if its drift
+# budget was spent; now() only goes to NTP if that request failed, and not
+# at all once the network budget is gone.
+now = None
+if online:
+    now = deadline.run(
+        "time", lambda timeout: timekeeping.now(pool, requests, timeout), optional=True
+    )
+now = now or timekeeping.local_time()
+if online and wakeprof.upload_due():
+    deadline.run("profile", lambda timeout: wakeprof.upload(requests, timeout), optional=True)
+deadline.report()
+current_time = format_readable(now)
+print("Current time:", current_time)
+
+if not api_error and stale_as_of is None:
+    changed = snapshot.save([total_invited, rsvped_count, last_rsvp_name, last_rsvp_date], current_time)
+
+# --- Nothing new: leave the panel as it is ---
+# Everything the screen is drawn from except the status bar's time and
+# battery, which panel.unchanged() allows to lag (common/panel.py)
+render_model = None
+if not api_error:
+    render_model = [
+        total_invited, rsvped_count, last_rsvp_name, last_rsvp_date,
+        stale_as_of, stale_as_of and stale_reason,
+    ]
+if panel.unchanged(render_model, battery_percent):
+    print("Panel unchanged, skipping refresh")
+    deep_sleep(schedule.next_minutes(SLEEP_MINS, changed, (battery_voltage, battery_percent)))
+
 # --- Build the display ---
 
 # ── Status bar: refresh time on left, battery on right ──
+status_text = f"Refreshed: {current_time}"
+if stale_as_of is not None:
+    status_text = f"As of {stale_as_of} ({stale_reason})"
 status_time_label = label.Label(
     terminalio.FONT,
-    text=f"Refreshed: {current_time}",
+    text=status_text,
     color=0x000000,
     anchor_point=(0.0, 0.5),
     anchored_position=(2, STATUS_BAR_HEIGHT // 2),
@@ -308,10 +270,13 @@ else:
         content_group.append(date_label)
 
 # ── Refresh the e-ink display ──
+wakeprof.mark("render")
 time.sleep(display.time_to_refresh)
 display.refresh()
 while display.busy:
     pass
+wakeprof.mark("refresh")
+panel.shown(render_model, battery_percent)
 
 # --- Dev mode escape hatch ---
 btn_a = digitalio.DigitalInOut(board.D15)
@@ -322,21 +287,4 @@ if not btn_a.value:  # Button A held (active low) — dev mode
     print("Dev mode — skipping deep sleep. USB writable, REPL active.")
 else:
     btn_a.deinit()
-
-    # Disable WiFi before sleep to save power
-    wifi.radio.enabled = False
-
-    # Wake every hour or on any button press for manual refresh
-    SLEEP_MINS = 60
-    time_alarm = alarm.time.TimeAlarm(
-        monotonic_time=time.monotonic() + (SLEEP_MINS * 60)
-    )
-    button_a_alarm = alarm.pin.PinAlarm(pin=board.D15, value=False, pull=True)
-    button_b_alarm = alarm.pin.PinAlarm(pin=board.D14, value=False, pull=True)
-    button_c_alarm = alarm.pin.PinAlarm(pin=board.D12, value=False, pull=True)
-    button_d_alarm = alarm.pin.PinAlarm(pin=board.D11, value=False, pull=True)
-
-    print("Entering deep sleep...")
-    alarm.exit_and_deep_sleep_until_alarms(
-        time_alarm, button_a_alarm, button_b_alarm, button_c_alarm, button_d_alarm
-    )
+    deep_sleep(schedule.next_minutes(SLEEP_MINS, changed, (battery_voltage, battery_percent)))
@@ -0,0 +1,211 @@
+"""Guest and RSVP totals from the wedding site's GraphQL (AppSync) API.
+
+AppSync list queries return at most `limit` items plus a nextToken for the
+rest. Each list is read a page at a time and folded into running totals, and
+a page is released before the next one is requested. Memory is bounded by
+the page size plus the guest code -> count index that counting RSVPs needs.
+
+That index and the totals are kept in NVM, so most wakes download neither
+list. A wake only asks for
+    - guests with updatedAt after the last full sync (normally none), and
+    - RSVPs with createdAt after the newest one already counted,
+and adds the new RSVPs to the totals. A full sync happens when there is no
+saved state, when any guest changed, or when the last one is FULL_SYNC_AGE
+old (which also catches deletions, since those leave no updatedAt behind).
+The index is tagged with a hash of the guest list and only rewritten when
+that changes, sparing the flash.
+
+Filtered list queries use SCAN_LIMIT. On a DynamoDB-backed AppSync list,
+limit counts the items examined, not the items returned. A large limit still
+returns only the few matches, and it takes one request instead of one per
+page.
+
+A next_poll_after in a response's GraphQL "extensions" is passed on to
+common/schedule.py.
+
+settings.toml:
+    RSVP_PAGE_SIZE = 100   # items per request when reading whole lists
+"""
+import binascii
+import gc
+import json
+import os
+import time
+
+import persist
+import schedule
+import timekeeping
+import wakeprof
+
+DEFAULT_PAGE_SIZE = 100
+SCAN_LIMIT = 1000
+FULL_SYNC_AGE = 24 * 3600
+
+GUESTS_QUERY = (
+    "query($limit: Int, $next: String) { "
+    "listGuests(limit: $limit, nextToken: $next) "
+    "{ items { code guestCount isVendor updatedAt } nextToken } "
+    "}"
+)
+GUESTS_SINCE_QUERY = (
+    "query($limit: Int, $next: String, $since: String) { "
+    "listGuests(limit: $limit, nextToken: $next, filter: {updatedAt: {gt: $since}}) "
+    "{ items { code } nextToken } "
+    "}"
+)
+RSVPS_QUERY = (
+    "query($limit: Int, $next: String) { "
+    "listRSVPS(limit: $limit, nextToken: $next) { items { accessCode guestName createdAt } nextToken } "
+    "}"
+)
+RSVPS_SINCE_QUERY = (
+    "query($limit: Int, $next: String, $since: String) { "
+    "listRSVPS(limit: $limit, nextToken: $next, filter: {createdAt: {gt: $since}}) "
+    "{ items { accessCode guestName createdAt } nextToken } "
+    "}"
+)
+
+
+def _page_size():
+    try:
+        return int(os.getenv("RSVP_PAGE_SIZE") or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+
+
+def pages(requests, url, api_key, query, field, deadline, since=None):
+    """Yield the items of each page of a paginated list query.
+
+    since fills the $since variable of the *_SINCE_QUERY filters, which are
+    read with SCAN_LIMIT instead of the page size.
+
+    Each request takes its timeout from deadline; OSError once it is spent.
+    HTTP and GraphQL errors raise too, so the caller never counts a partial
+    list.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": api_key,
+    }
+    variables = {"limit": _page_size(), "next": None}
+    if since is not None:
+        variables["limit"] = SCAN_LIMIT
+        variables["since"] = since
+    page = 0
+    while True:
+        if deadline.expired():
+            raise OSError(f"network budget spent on {field} page {page}")
+        payload = json.dumps({"query": query, "variables": variables})
+        response = requests.post(url, data=payload, headers=headers, timeout=deadline.timeout())
+        wakeprof.mark("headers")
+        try:
+            timekeeping.sync_from_response(response)
+            if response.status_code != 200:
+                raise OSError(f"HTTP {response.status_code}")
+            body = response.json()
+        finally:
+            response.close()
+        wakeprof.mark("body")
+        if body.get("errors"):
+            raise ValueError(body["errors"][0].get("message", "GraphQL error"))
+        schedule.hint((body.get("extensions") or {}).get("next_poll_after"))
+
+        result = body["data"][field]
+        variables["next"] = result.get("nextToken")
+        items = result.get("items") or []
+        del body, result
+        page += 1
+        yield items
+
+        # Drop this page before fetching the next
+        del items
+        gc.collect()
+        if not variables["next"]:
+            return
+
+
+def _full_sync(requests, url, api_key, deadline):
+    """Read both lists; save and return the totals record."""
+    # Guests: total invited (excluding vendors) and the code -> count index
+    guest_counts = {}
+    total_invited = 0
+    guest_hash = 0
+    guest_wm = ""
+    for items in pages(requests, url, api_key, GUESTS_QUERY, "listGuests", deadline):
+        for guest in items:
+            guest_wm = max(guest_wm, guest.get("updatedAt") or "")
+            if not guest.get("isVendor", False):
+                total_invited += guest.get("guestCount", 0)
+                guest_counts[guest.get("code")] = guest.get("guestCount", 0)
+                # Order-independent, so a reshuffled scan is not a new version
+                entry = f"{guest.get('code')}:{guest.get('guestCount', 0)}"
+                guest_hash = (guest_hash + binascii.crc32(entry.encode())) & 0xFFFFFFFF
+
+    index = persist.load_json("rsvp_index")
+    if not index or index.get("h") != guest_hash:
+        persist.save_json("rsvp_index", {"h": guest_hash, "g": guest_counts})
+
+    totals = {
+        "h": guest_hash,
+        "invited": total_invited,
+        "rsvped": 0,
+        "latest": None,
+        "rsvp_wm": "",
+        "guest_wm": guest_wm,
+        "at": int(time.time()),
+    }
+    for items in pages(requests, url, api_key, RSVPS_QUERY, "listRSVPS", deadline):
+        _add_rsvps(totals, items, guest_counts)
+    persist.save_json("rsvp_totals", totals)
+    return totals
+
+
+def _add_rsvps(totals, items, guest_counts):
+    for rsvp in items:
+        totals["rsvped"] += guest_counts.get(rsvp.get("accessCode"), 0)
+        # Track most recent RSVP by createdAt (ISO 8601 sorts lexically)
+        created = rsvp.get("createdAt", "")
+        totals["rsvp_wm"] = max(totals["rsvp_wm"], created)
+        if totals["latest"] is None or created > totals["latest"][1]:
+            totals["latest"] = [rsvp.get("guestName", "Unknown"), created]
+
+
+def _guests_changed(requests, url, api_key, deadline, since):
+    for items in pages(requests, url, api_key, GUESTS_SINCE_QUERY, "listGuests", deadline, since):
+        if items:
+            return True
+    return False
+
+
+def count(requests, url, api_key, deadline):
+    """Return (total_invited, rsvped_count, latest).
+
+    latest is (guestName, createdAt) of the newest RSVP, or None.
+    """
+    totals = persist.load_json("rsvp_totals")
+    index = persist.load_json("rsvp_index")
+    full = (
+        not totals
+        or not index
+        or index.get("h") != totals.get("h")
+        or time.time() - totals.get("at", 0) > FULL_SYNC_AGE
+    )
+    if not full and _guests_changed(requests, url, api_key, deadline, totals["guest_wm"]):
+        print("RSVP: guest list changed")
+        full = True
+
+    if full:
+        print("RSVP: full sync")
+        index = None  # the full sync builds its own; free this one first
+        totals = _full_sync(requests, url, api_key, deadline)
+    else:
+        before = totals["rsvped"], totals["rsvp_wm"]
+        for items in pages(requests, url, api_key, RSVPS_SINCE_QUERY, "listRSVPS", deadline,
+                           totals["rsvp_wm"]):
+            _add_rsvps(totals, items, index["g"])
+        if (totals["rsvped"], totals["rsvp_wm"]) != before:
+            print(f"RSVP: new since {before[1]}")
+            persist.save_json("rsvp_totals", totals)
+
+    latest = tuple(totals["latest"]) if totals["latest"] else None
+    return totals["invited"], totals["rsvped"], latest
@@ -1,3 +1,4 @@
+import gc
 import json
 import os
 import random
@@ -7,7 +8,6 @@ import alarm
 import wifi
 import socketpool
 import adafruit_requests
-import analogio
 import board
 import digitalio
 import displayio
@@ -16,6 +16,19 @@ import terminalio
 from adafruit_display_text import label
 from adafruit_display_shapes.line import Line
 from adafruit_display_shapes.rect import Rect
+from battery import read_battery
+from dates import add_days_to_date, days_between, format_readable
+from deadline import Deadline
+from net import connect_wifi
+from power import deep_sleep
+import panel
+import schedule
+import timekeeping
+import wakeprof
+
+# time.monotonic() restarts at every wake, so this is the boot + import cost
+print(f"Startup: {time.monotonic():.2f}s, mem_free {gc.mem_free()}")
+wakeprof.mark("import")
 
 # --- Button-to-pin mapping ---
 # MagTag has 4 buttons (A-D) mapped to these GPIO pins
@@ -27,6 +40,8 @@ BUTTON_PINS = {
 }
 # Map buttons to item indices (button A -> item 0, etc.)
 BUTTON_TO_INDEX = {"A": 0, "B": 1, "C": 2, "D": 3}
+SLEEP_MINS = 240  # 4 Hours
+NO_CLOCK_RETRY_MINS = 30  # after a failed first sync
 
 # --- NeoPixel setup ---
 NUM_PIXELS = 4
@@ -151,37 +166,6 @@ def get_wake_button():
     return None
 
 
-def _is_leap(year):
-    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
-
-
-def _days_in_month(year, month):
-    if month == 2 and _is_leap(year):
-        return 29
-    return [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month]
-
-
-def add_days_to_date(date_str, days):
-    """Add days (positive or negative) to a YYYY-MM-DD date string."""
-    year, month, day = map(int, date_str.split("-"))
-    day += days
-    # Roll forward
-    while day > _days_in_month(year, month):
-        day -= _days_in_month(year, month)
-        month += 1
-        if month > 12:
-            month = 1
-            year += 1
-    # Roll backward
-    while day < 1:
-        month -= 1
-        if month < 1:
-            month = 12
-            year -= 1
-        day += _days_in_month(year, month)
-    return f"{year:04d}-{month:02d}-{day:02d}"
-
-
 def format_due_date(due_date, today_str):
     """Format due date as 'past due', 'today', 'tomorrow', or the date."""
     if due_date < today_str:
@@ -196,24 +180,6 @@ def format_due_date(due_date, today_str):
     return f"{int(parts[1])}/{int(parts[2])}"
 
 
-def days_between(date1, date2):
-    """Calculate days between two YYYY-MM-DD date strings (date2 - date1)."""
-    y1, m1, d1 = map(int, date1.split("-"))
-    y2, m2, d2 = map(int, date2.split("-"))
-    # Simple day count using a reference point
-    def to_days(y, m, d):
-        # Approximate days since year 0
-        days = y * 365 + d
-        for i in range(1, m):
-            days += [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31][i]
-        # Add leap years
-        days += y // 4 - y // 100 + y // 400
-        if m <= 2 and (y % 4 == 0 and (y % 100 != 0 or y % 400 == 0)):
-            days -= 1
-        return days
-    return to_days(y2, m2, d2) - to_days(y1, m1, d1)
-
-
 def calculate_progress(item, today_str):
     """Calculate progress 0.0-1.0 based on days elapsed since last completion."""
     last_completed = item.get("last_completed", "")
@@ -265,38 +231,7 @@ def mark_item_completed(item_index, current_date, yesterday=False):
     db_write(data)
 
 # --- Read battery voltage & compute percentage ---
-# MagTag battery voltage divider is on board.VOLTAGE_MONITOR
-# 3.7V 420mAh LiPo: 4.2V = 100%, 3.0V = 0%
-# Piecewise linear approximation of the typical LiPo discharge curve.
-LIPO_CURVE = [
-    (4.20, 100), (4.15, 95), (4.10, 90), (4.05, 85),
-    (4.00, 80),  (3.90, 70), (3.80, 60), (3.70, 50),
-    (3.60, 40),  (3.50, 30), (3.40, 20), (3.30, 10),
-    (3.20, 5),   (3.00, 0),
-]
-
-def voltage_to_percent(voltage):
-    if voltage >= LIPO_CURVE[0][0]:
-        return 100
-    if voltage <= LIPO_CURVE[-1][0]:
-        return 0
-    for i in range(len(LIPO_CURVE) - 1):
-        v_high, p_high = LIPO_CURVE[i]
-        v_low, p_low = LIPO_CURVE[i + 1]
-        if voltage >= v_low:
-            # Linear interpolation between the two points
-            return p_low + (p_high - p_low) * (voltage - v_low) / (v_high - v_low)
-    return 0
-
-try:
-    vbat_voltage_pin = analogio.AnalogIn(board.VOLTAGE_MONITOR)
-    # Voltage divider halves the voltage; reference is 3.3V over 16-bit range
-    battery_voltage = (vbat_voltage_pin.value / 65535.0) * 3.3 * 2
-    vbat_voltage_pin.deinit()
-    battery_percent = voltage_to_percent(battery_voltage)
-except Exception:
-    battery_voltage = 0.0
-    battery_percent = 0
+battery_voltage, battery_percent = read_battery()
 
 # --- Check for button wake early so we can give instant LED feedback ---
 # If the user keeps holding the button past HOLD_THRESHOLD_S, the completion
@@ -308,36 +243,52 @@ if wake_button:
     mark_yesterday = detect_hold(wake_button)
     if mark_yesterday:
         print("Hold detected — marking as YESTERDAY")
-# --- Connect to WiFi & fetch time ---
-ssid = os.getenv("CIRCUITPY_WIFI_SSID")
-password = os.getenv("CIRCUITPY_WIFI_PASSWORD")
-aio_username = os.getenv("ADAFRUIT_AIO_USERNAME")
-aio_key = os.getenv("ADAFRUIT_AIO_KEY")
-timezone = os.getenv("TIMEZONE")
-TIME_URL = (
-    f"https://io.adafruit.com/api/v2/{aio_username}/integrations/time/strftime"
-    f"?x-aio-key={aio_key}&tz={timezone}"
-    "&fmt=%25Y-%25m-%25d+%25H%3A%25M%3A%25S"
-)
-TIME_URL_READABLE = (
-    f"https://io.adafruit.com/api/v2/{aio_username}/integrations/time/strftime"
-    f"?x-aio-key={aio_key}&tz={timezone}"
-    "&fmt=%25b+%25e,+%25l:%25M+%25p"
-)
-
-print("Connecting to", ssid)
-wifi.radio.connect(ssid, password)
-print(f"Connected to {ssid}!")
-
-pool = socketpool.SocketPool(wifi.radio)
-requests = adafruit_requests.Session(pool, ssl.create_default_context())
+# --- Time: from the RTC, WiFi only when the clock needs a resync ---
+# This app has no other network traffic, so on most wakes (button or timer)
+# the radio never turns on. See common/timekeeping.py for the drift budget.
+# If WiFi or the sync fails within the network budget we carry on with the
+# RTC as it is, as long as it was set once; nothing else here needs the network.
+if timekeeping.needs_sync():
+    ssid = os.getenv("CIRCUITPY_WIFI_SSID")
+    password = os.getenv("CIRCUITPY_WIFI_PASSWORD")
+    deadline = Deadline()
+    if deadline.run("wifi", lambda timeout: connect_wifi(ssid, password, timeout)) is not None:
+        pool = socketpool.SocketPool(wifi.radio)
+        requests = adafruit_requests.Session(pool, ssl.create_default_context())
+        deadline.run("time", lambda timeout: timekeeping.sync(pool, requests, timeout))
+    deadline.report()
+
+# --- No clock: never synced since power-on ---
+# The RTC still reads 2000-01-01. Marking an item would write year-2000
+# dates into data.json, so leave the data alone and try again soon (not via
+# common/schedule.py, whose active hours need the local time).
+if not timekeeping.is_set():
+    print("Clock not set, skipping items")
+    error_group = displayio.Group()
+    bg_bitmap = displayio.Bitmap(display.width, display.height, 1)
+    bg_palette = displayio.Palette(1)
+    bg_palette[0] = 0xFFFFFF
+    error_group.append(displayio.TileGrid(bg_bitmap, pixel_shader=bg_palette, x=0, y=0))
+    error_group.append(label.Label(
+        terminalio.FONT,
+        text="(No clock - check WiFi)",
+        color=0x000000,
+        anchor_point=(0.5, 0.5),
+        anchored_position=(display.width // 2, display.height // 2),
+        scale=1,
+    ))
+    display.root_group = error_group
+    time.sleep(display.time_to_refresh)
+    display.refresh()
+    while display.busy:
+        pass
+    pixels.deinit()
+    deep_sleep(NO_CLOCK_RETRY_MINS)
 
-response = requests.get(TIME_URL)
-current_date_time = response.text.strip()
+now = timekeeping.local_time()
+current_date_time = f"{now[0]:04d}-{now[1]:02d}-{now[2]:02d} {now[3]:02d}:{now[4]:02d}:{now[5]:02d}"
 print("Current time:", current_date_time)
-
-response = requests.get(TIME_URL_READABLE)
-current_readable_time = response.text.strip()
+current_readable_time = format_readable(now)
 
 # --- Handle button wake: mark corresponding item as completed ---
 if wake_button:
@@ -348,6 +299,25 @@ if wake_button:
         print(f"Button {wake_button} — marking item {item_index} completed ({when})")
         mark_item_completed(item_index, today, yesterday=mark_yesterday)
 
+# Earliest due dates first; the first four get a column each
+data = db_read()
+items = data.get("items", [])
+items.sort(key=lambda x: x.get("due_date", ""))
+displayed_items = items[:4]
+today_str = current_date_time.split(" ")[0]  # Extract YYYY-MM-DD
+
+# --- Nothing new: leave the panel as it is ---
+# The columns depend on the items and today's date only; the status bar's
+# time and battery may lag (common/panel.py)
+render_model = [today_str] + [
+    [item.get("title", ""), item.get("due_date", ""), item.get("last_completed", ""), item.get("day_interval", 1)]
+    for item in displayed_items
+]
+if panel.unchanged(render_model, battery_percent):
+    print("Panel unchanged, skipping refresh")
+    pixels.deinit()
+    deep_sleep(schedule.next_minutes(SLEEP_MINS, False, (battery_voltage, battery_percent)))
+
 # --- Build the display ---
 main_group = displayio.Group()
 
@@ -387,15 +357,6 @@ content_group.append(Line(0, STATUS_BAR_HEIGHT, display.width - 1, STATUS_BAR_HE
 
 # ── Four content columns ──
 
-# Get data for each
-data = db_read()
-items = data.get("items", [])
-items.sort(key=lambda x: x.get("due_date", ""))  # Earliest due dates first
-
-# Extract titles and due dates for display, pad to 4 items
-displayed_items = items[:4]
-today_str = current_date_time.split(" ")[0]  # Extract YYYY-MM-DD
-
 # Each column is 74px wide. terminalio.FONT is 6px/char, so at scale=1
 # only ~12 chars fit per column (74 / 6 = 12.3).
 # Progress bar dimensions
@@ -468,6 +429,7 @@ for i in range(4):
 # Assign root_group only after all content is built, so the display updates
 # in a single refresh instead of flashing blank first.
 display.root_group = main_group
+wakeprof.mark("render")
 time.sleep(display.time_to_refresh)
 display.refresh()
 # Run the LED celebration while the e-ink panel refreshes in the background.
@@ -476,6 +438,8 @@ if wake_button:
     celebrate_leds()
 while display.busy:
     pass
+wakeprof.mark("refresh")
+panel.shown(render_model, battery_percent)
 
 # --- Dev mode escape hatch ---
 # In dev mode, Button A is held during reset. boot.py keeps USB writable
@@ -491,20 +455,8 @@ else:
     btn_a.deinit()
 
     # --- Deep sleep ---
-    # The e-ink display retains the image without power.
-    # Disable WiFi radio before sleep to avoid drawing hundreds of mA.
-    wifi.radio.enabled = False
+    # Wake at the time common/schedule.py picks (within ACTIVE_HOURS) or on
+    # any button press. Only a redraw counts as a change: the columns move
+    # with the items and the date, nothing else.
     pixels.deinit()
-
-    # Wake after designated time or on any button press.
-    SLEEP_MINS = 240  # 4 Hours
-    time_alarm = alarm.time.TimeAlarm(monotonic_time=time.monotonic() + (SLEEP_MINS * 60))
-    button_a_alarm = alarm.pin.PinAlarm(pin=board.D15, value=False, pull=True)
-    button_b_alarm = alarm.pin.PinAlarm(pin=board.D14, value=False, pull=True)
-    button_c_alarm = alarm.pin.PinAlarm(pin=board.D12, value=False, pull=True)
-    button_d_alarm = alarm.pin.PinAlarm(pin=board.D11, value=False, pull=True)
-
-    print("Entering deep sleep...")
-    alarm.exit_and_deep_sleep_until_alarms(
-        time_alarm, button_a_alarm, button_b_alarm, button_c_alarm, button_d_alarm
-    )
+    deep_sleep(schedule.next_minutes(SLEEP_MINS, True, (battery_voltage, battery_percent)))
@@ -0,0 +1,154 @@
+"""Build OTA releases: compile app logic to .mpy and write the manifest.
+
+    python tools/build.py                       # every app
+    python tools/build.py budget-app            # one app
+    python tools/build.py budget-app --source   # ship .py instead of .mpy
+
+Each app's boot.py and code.py stay source (CircuitPython only runs them
+as .py), but everything they import from common/ or from their folder is
+precompiled with mpy-cross, so the board skips parsing and compiling it on
+every wake. Output is laid out like the CIRCUITPY drive:
+
+    dist/<app>/boot.py          copied for manual installs, not in manifest
+    dist/<app>/code.py
+    dist/<app>/lib/<module>.mpy
+    dist/<app>/manifest.json    what OTA_MANIFEST_URL should point at
+
+mpy-cross must match the CircuitPython major version on the device; get it
+from https://adafruit-circuit-python.s3.amazonaws.com/index.html?prefix=bin/mpy-cross/
+and put it on PATH, set MPY_CROSS, or pass --mpy-cross.
+"""
+import argparse
+import ast
+import os
+import shutil
+import subprocess
+import sys
+
+import make_manifest
+
+REPO_ROOT = make_manifest.REPO_ROOT
+COMMON_DIR = os.path.join(REPO_ROOT, "common")
+DIST_DIR = os.path.join(REPO_ROOT, "dist")
+ENTRY_POINTS = ("boot.py", "code.py")
+
+
+def list_apps():
+    return sorted(
+        name for name in os.listdir(REPO_ROOT)
+        if os.path.isfile(os.path.join(REPO_ROOT, name, "code.py"))
+    )
+
+
+def local_modules(directory):
+    """Map module name -> source path for the .py modules in directory."""
+    modules = {}
+    if not os.path.isdir(directory):
+        return modules
+    for name in os.listdir(directory):
+        if name.endswith(".py") and name not in ENTRY_POINTS:
+            modules[name[:-3]] = os.path.join(directory, name)
+    return modules
+
+
+def imported_names(path):
+    """Top-level module names imported anywhere in a source file."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return names
+
+
+def resolve_modules(app_dir):
+    """Return {module: source} for every module boot.py and code.py need, transitively.
+
+    App-local modules shadow common/ modules of the same name, the same way
+    they would on the device.
+    """
+    available = local_modules(COMMON_DIR)
+    available.update(local_modules(app_dir))
+    needed = {}
+    pending = [os.path.join(app_dir, entry) for entry in ENTRY_POINTS]
+    while pending:
+        for name in imported_names(pending.pop()):
+            if name in available and name not in needed:
+                needed[name] = available[name]
+                pending.append(available[name])
+    return needed
+
+
+def compile_module(mpy_cross, source, dest):
+    result = subprocess.run(
+        [mpy_cross, "-o", dest, source], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"mpy-cross failed on {source}:\n{result.stderr}")
+
+
+def build_app(app, mpy_cross, source_only):
+    app_dir = os.path.join(REPO_ROOT, app)
+    out_dir = os.path.join(DIST_DIR, app)
+    lib_dir = os.path.join(out_dir, "lib")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(lib_dir)
+
+    for entry in ENTRY_POINTS:
+        shutil.copyfile(os.path.join(app_dir, entry), os.path.join(out_dir, entry))
+
+    app_lib = os.path.join(app_dir, "lib")
+    if os.path.isdir(app_lib):
+        shutil.copytree(app_lib, lib_dir, dirs_exist_ok=True)
+
+    source_bytes = 0
+    built_bytes = 0
+    for name, source in sorted(resolve_modules(app_dir).items()):
+        if source_only:
+            dest = os.path.join(lib_dir, name + ".py")
+            shutil.copyfile(source, dest)
+        else:
+            dest = os.path.join(lib_dir, name + ".mpy")
+            compile_module(mpy_cross, source, dest)
+        source_bytes += os.path.getsize(source)
+        built_bytes += os.path.getsize(dest)
+        print(f"  lib/{os.path.basename(dest)}: {os.path.getsize(source)} -> {os.path.getsize(dest)} bytes")
+
+    manifest = make_manifest.build_manifest(out_dir)
+    make_manifest.write_manifest(out_dir, manifest)
+    code_bytes = os.path.getsize(os.path.join(out_dir, "code.py"))
+    print(
+        f"{app}: code.py {code_bytes} bytes, modules {source_bytes} -> {built_bytes} bytes, "
+        f"{len(manifest['files'])} file(s) in manifest"
+    )
+
+
+def find_mpy_cross(explicit):
+    candidate = explicit or os.environ.get("MPY_CROSS") or "mpy-cross"
+    path = shutil.which(candidate)
+    if not path:
+        raise SystemExit(
+            f"mpy-cross not found ({candidate}). Install it, set MPY_CROSS, "
+            "or build with --source."
+        )
+    return path
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("apps", nargs="*", help="app folders to build (default: all)")
+    parser.add_argument("--source", action="store_true", help="ship .py modules, skip mpy-cross")
+    parser.add_argument("--mpy-cross", help="path to the mpy-cross binary")
+    args = parser.parse_args(argv)
+
+    mpy_cross = None if args.source else find_mpy_cross(args.mpy_cross)
+    for app in args.apps or list_apps():
+        build_app(app, mpy_cross, args.source)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
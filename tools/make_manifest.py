@@ -0,0 +1,79 @@
+"""Write manifest.json for a folder laid out like the CIRCUITPY drive.
+
+The manifest lists every file boot.py should keep in sync on the device,
+keyed by its path relative to the device root (and to the manifest URL),
+with its size and SHA-256. tools/build.py calls this for dist/<app>/; run
+it directly only for a hand-assembled folder:
+
+    python tools/make_manifest.py dist/budget-app
+
+Included: code.py, other top-level .py/.mpy modules and everything under
+lib/. boot.py, docs and device state such as test-app/data.json are not.
+"""
+import hashlib
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST_NAME = "manifest.json"
+EXCLUDED = {"boot.py"}
+MODULE_EXTENSIONS = (".py", ".mpy")
+
+
+def file_entry(path):
+    """Return the manifest entry (size + hex SHA-256) for one file."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return {"size": size, "sha256": digest.hexdigest()}
+
+
+def deployable_files(app_dir):
+    """Yield device-relative paths (with "/" separators) to publish."""
+    for name in sorted(os.listdir(app_dir)):
+        if name in EXCLUDED or not name.endswith(MODULE_EXTENSIONS):
+            continue
+        if os.path.isfile(os.path.join(app_dir, name)):
+            yield name
+    lib_dir = os.path.join(app_dir, "lib")
+    for dirpath, dirnames, filenames in os.walk(lib_dir):
+        dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+        for name in sorted(filenames):
+            full = os.path.join(dirpath, name)
+            yield os.path.relpath(full, app_dir).replace(os.sep, "/")
+
+
+def build_manifest(app_dir):
+    files = {}
+    for rel_path in deployable_files(app_dir):
+        files[rel_path] = file_entry(os.path.join(app_dir, rel_path))
+    if "code.py" not in files:
+        raise SystemExit(f"{app_dir}: no code.py")
+    return {"files": files}
+
+
+def write_manifest(app_dir, manifest):
+    out_path = os.path.join(app_dir, MANIFEST_NAME)
+    with open(out_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return out_path
+
+
+def main(argv):
+    if not argv:
+        print(__doc__.strip())
+        return 2
+    for app_dir in argv:
+        manifest = build_manifest(app_dir)
+        out_path = write_manifest(app_dir, manifest)
+        print(f"{out_path}: {len(manifest['files'])} file(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
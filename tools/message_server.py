@@ -0,0 +1,279 @@
+"""Local reference server for message-board's queue API.
+
+    python tools/message_server.py                    # ack-and-advance, port 8080
+    python tools/message_server.py --legacy           # acks answer {"acked"} only
+    python tools/message_server.py --seed 3 --token s3cret
+    python tools/message_server.py --check            # exercise the client, then exit
+
+Point the board (or anything else) at it with
+    MSG_API_URL = "http://<host>:8080/messages"
+    MSG_ACK_URL = "http://<host>:8080/ack"
+
+Endpoints, all JSON, times as ISO 8601 UTC:
+    GET  /messages?limit=N&fallback=acked
+         {"messages": [oldest unacked first], "now", "fallback"}; with
+         fallback=acked and nothing unacked, the last acked message and
+         fallback: true. Sends an ETag that changes with the queue, and
+         answers 304 to a matching If-None-Match
+    POST /ack {"up_to_ts", "next": N}
+         acks every message with ts <= up_to_ts. Legacy servers answer
+         {"acked"}; ack-and-advance ones add the queue after the ack, the
+         same fields as GET /messages with limit=next
+    POST /messages {"from", "body"}
+         queues a new message (for testing)
+
+State is in memory and lost on exit. --check runs message-board/inbox.py's
+reply parsing against both ack shapes and the conditional poll over real
+HTTP, and exits non-zero on a mismatch.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def iso_now(epoch=None):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+
+class Queue:
+    def __init__(self, clock=time.time):
+        self.clock = clock  # tools/simulate.py runs it on simulated time
+        self.lock = threading.Lock()
+        self.messages = []  # oldest first: {"ts", "from", "body", "acked"}
+        self.last_ms = 0
+        self.version = 0  # bumped on every change; the ETag
+
+    def add(self, sender, body):
+        with self.lock:
+            # Millisecond ts, kept unique and increasing so they sort as strings
+            ms = max(int(self.clock() * 1000), self.last_ms + 1)
+            self.last_ms = ms
+            ts = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ms // 1000)) + f".{ms % 1000:03d}Z"
+            self.messages.append({"ts": ts, "from": sender, "body": body, "acked": False})
+            self.version += 1
+            return ts
+
+    def poll(self, limit, fallback):
+        with self.lock:
+            unacked = [m for m in self.messages if not m["acked"]]
+            if unacked:
+                return {"messages": [_public(m) for m in unacked[:limit]],
+                        "now": iso_now(self.clock()), "fallback": False}
+            acked = [m for m in self.messages if m["acked"]]
+            if fallback and acked:
+                return {"messages": [_public(acked[-1])], "now": iso_now(self.clock()), "fallback": True}
+            return {"messages": [], "now": iso_now(self.clock()), "fallback": False}
+
+    def ack(self, up_to_ts):
+        with self.lock:
+            count = 0
+            for m in self.messages:
+                if not m["acked"] and m["ts"] <= up_to_ts:
+                    m["acked"] = True
+                    count += 1
+            if count:
+                self.version += 1
+            return count
+
+
+def _public(message):
+    return {k: message[k] for k in ("ts", "from", "body")}
+
+
+def make_handler(queue, token, legacy):
+    class Handler(BaseHTTPRequestHandler):
+        def date_time_string(self, timestamp=None):
+            return super().date_time_string(queue.clock() if timestamp is None else timestamp)
+
+        def _send(self, code, body, etag=None):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            if etag:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self):
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                self._send(401, {"error": "unauthorized"})
+                return False
+            return True
+
+        def _json_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return None
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != "/messages":
+                return self._send(404, {"error": "not found"})
+            if not self._authorized():
+                return
+            query = parse_qs(url.query)
+            limit = int(query.get("limit", ["1"])[0])
+            fallback = query.get("fallback", [""])[0] == "acked"
+            etag = f'"{queue.version}-{limit}-{int(fallback)}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self._send(200, queue.poll(limit, fallback), etag)
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            if not self._authorized():
+                return
+            body = self._json_body()
+            if not isinstance(body, dict):
+                return self._send(400, {"error": "bad json"})
+            if path == "/messages":
+                ts = queue.add(body.get("from", "?"), body.get("body", ""))
+                return self._send(200, {"ts": ts})
+            if path != "/ack":
+                return self._send(404, {"error": "not found"})
+            if not body.get("up_to_ts"):
+                return self._send(400, {"error": "up_to_ts required"})
+            reply = {"acked": queue.ack(body["up_to_ts"])}
+            if not legacy:
+                reply.update(queue.poll(int(body.get("next") or 1), True))
+            self._send(200, reply)
+
+        def log_message(self, fmt, *args):
+            sys.stderr.write(f"{self.command} {self.path} -> {args[1] if len(args) > 1 else ''}\n")
+
+    return Handler
+
+
+def serve(port, token, legacy, seed):
+    queue = Queue()
+    for i in range(seed):
+        queue.add("seed", f"Test message {i + 1}")
+    server = ThreadingHTTPServer(("", port), make_handler(queue, token, legacy))
+    return server, queue
+
+
+def _post(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return response.status, json.loads(response.read())
+
+
+def _get(url):
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+
+class _Response:
+    """Just enough of an adafruit_requests response for inbox.fetch()."""
+
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        # Without Date: setting the clock from it needs the board's rtc module
+        self.headers = {k.lower(): v for k, v in headers.items() if k.lower() != "date"}
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    def close(self):
+        pass
+
+
+class _Session:
+    def get(self, url, headers=None, timeout=None):
+        request = urllib.request.Request(url, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return _Response(response.status, response.headers, response.read())
+        except urllib.error.HTTPError as e:
+            return _Response(e.code, e.headers, e.read())
+
+
+def check():
+    """Drive inbox.parse_ack() with real replies from both server shapes."""
+    sys.path.insert(0, os.path.join(REPO_ROOT, "common"))
+    sys.path.insert(0, os.path.join(REPO_ROOT, "message-board"))
+    import inbox
+
+    failures = 0
+    for legacy in (False, True):
+        server, _ = serve(0, None, legacy, seed=inbox.WINDOW + 2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        window = _get(f"{base}/messages?fallback=acked&limit={inbox.WINDOW}")["messages"]
+        first = window[0]["ts"]
+        code, body = _post(f"{base}/ack", {"up_to_ts": first, "next": inbox.WINDOW})
+        status, acked, polled = inbox.parse_ack(code, body)
+        shape = "legacy" if legacy else "ack-and-advance"
+        if legacy:
+            ok = status == "ok" and acked == 1 and polled is None
+            remaining = inbox.after_ack(window, first)
+        else:
+            ok = status == "ok" and acked == 1 and polled is not None
+            remaining = polled[0] if polled else []
+        expected = _get(f"{base}/messages?fallback=acked&limit={inbox.WINDOW}")["messages"]
+        # Legacy clients only hold what was left of the old window
+        ok = ok and remaining == expected[:len(remaining)] and remaining
+        # Acking the same ts again matches nothing
+        status, acked, _ = inbox.parse_ack(*_post(f"{base}/ack", {"up_to_ts": first}))
+        ok = ok and status == "noop"
+        print(f"{shape:16} {'ok' if ok else 'FAILED'}: next is {remaining[0]['body'] if remaining else None}")
+        failures += not ok
+        server.shutdown()
+
+    # Conditional poll: 304 until the queue changes
+    server, queue = serve(0, None, False, seed=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/messages"
+    session = _Session()
+    first = inbox.fetch(session, url, {}, 5)
+    again = inbox.fetch(session, url, {}, 5, first[3])
+    queue.add("check", "new")
+    changed = inbox.fetch(session, url, {}, 5, first[3])
+    ok = (first[3] is not None and again[0] is inbox.UNCHANGED
+          and changed[0] is not inbox.UNCHANGED and len(changed[0]) == 3)
+    print(f"{'conditional':16} {'ok' if ok else 'FAILED'}: etag {first[3]}")
+    failures += not ok
+    server.shutdown()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--token", help="require Authorization: Bearer TOKEN")
+    parser.add_argument("--legacy", action="store_true", help="acks answer {\"acked\"} only")
+    parser.add_argument("--seed", type=int, default=0, help="start with this many messages")
+    parser.add_argument("--check", action="store_true", help="test the client against both shapes")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(1 if check() else 0)
+
+    server, _ = serve(args.port, args.token, args.legacy, args.seed)
+    shape = "legacy acks" if args.legacy else "ack-and-advance"
+    print(f"Message server on port {args.port} ({shape})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""HTTP fixtures for the simulator: record the real APIs, replay them with faults.
+
+A Recorder stands where tools/sim/world.py's server would. Every request a
+simulated wake makes is forwarded to the real host and answered with the
+real response, which is also saved as one JSON file per exchange:
+
+    DIR/<host>/<nnnn>-<method>-<path>.json
+        {"method", "url", "body", "status", "headers": ["Name: value", ...],
+         "data" | "data_b64"}
+
+nnnn keeps the order of the whole recording. Query parameters and request
+headers that carry credentials are not saved (see SECRET_WORDS), nor are
+cookies.
+
+A Replay answers from such a directory with no network. A request gets the
+fixtures recorded for the same method, host, path, query and body, or,
+failing that, for the same GraphQL query with other variables, or at least
+the same path. Repeated requests step through the matches in recorded
+order and then keep getting the last. A 200 whose ETag the request sends
+back in If-None-Match is answered 304, and Date headers are rewritten to
+the simulated time, so the apps' caches and clock sync work as they would.
+
+Replays can be made worse, reproducibly (the random draws come from one
+seeded generator):
+    latency     seconds before each response's first byte
+    bandwidth   bytes/s for the body
+    rules       "[MATCH=]KIND[:RATE]", first match wins, RATE defaults to 1:
+                MATCH is a substring of host + path ("ynab", "graphql",
+                "io.adafruit.com"), KIND an HTTP status ("429") or
+                "truncate" (half the body, then the connection closes),
+                "hang" (no answer until the client gives up) or
+                "disconnect" (closed without an answer)
+Both run in real time, so the simulator counts them as server waits.
+"""
+import base64
+import email.utils
+import http.client
+import json
+import os
+import random
+import re
+import select
+import socket
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from world import HANG_SECONDS, QuietServer
+
+CHUNK = 1024  # bytes written between bandwidth pauses
+SECRET_WORDS = ("key", "token", "authorization", "cookie", "secret", "password")
+# Hop-by-hop, or no longer true once the body is saved whole
+DROP_HEADERS = ("connection", "keep-alive", "transfer-encoding", "content-length", "set-cookie")
+KINDS = ("truncate", "hang", "disconnect")
+FAULT_STATUS = {"http500": 500, "http429": 429}  # simulate.py's server faults
+
+
+def _secret(name):
+    name = name.lower()
+    return any(word in name for word in SECRET_WORDS)
+
+
+def redact_query(query):
+    """The query string without credential parameters, in a stable order."""
+    return urlencode(sorted((k, v) for k, v in parse_qsl(query, keep_blank_values=True) if not _secret(k)))
+
+
+def _graphql_query(body):
+    """The query text of a GraphQL request body, its variables left out."""
+    try:
+        return json.loads(body).get("query") or ""
+    except (ValueError, AttributeError):
+        return ""
+
+
+def match_keys(method, host, url, body):
+    """Lookup keys for a request, most to least specific."""
+    parts = urlsplit(url)
+    query = redact_query(parts.query)
+    names = ",".join(sorted({k for k, _ in parse_qsl(query)}))
+    return (
+        (method, host, parts.path, query, body),
+        (method, host, parts.path, names, _graphql_query(body)),
+        (method, host, parts.path),
+    )
+
+
+def http_date(epoch):
+    return email.utils.formatdate(epoch, usegmt=True)
+
+
+def parse_rule(text):
+    """'ynab=429:0.3' -> ("ynab", 429, 0.3). ValueError if it is not a rule."""
+    match, _, rest = text.rpartition("=")
+    kind, _, rate = rest.partition(":")
+    if kind.isdigit():
+        kind = int(kind)
+    elif kind not in KINDS:
+        raise ValueError(f"unknown fault {kind!r} in {text!r}")
+    rate = float(rate) if rate else 1.0
+    if not 0 <= rate <= 1:
+        raise ValueError(f"rate must be 0..1 in {text!r}")
+    return match, kind, rate
+
+
+class Fixtures:
+    """A directory of recorded exchanges."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.recorded = []
+        if os.path.isdir(directory):
+            for host in sorted(os.listdir(directory)):
+                folder = os.path.join(directory, host)
+                if not os.path.isdir(folder):
+                    continue
+                for name in os.listdir(folder):
+                    if name.endswith(".json"):
+                        with open(os.path.join(folder, name)) as f:
+                            fixture = json.load(f)
+                        fixture["host"] = host
+                        self.recorded.append((name, fixture))
+        self.recorded.sort(key=lambda item: item[0])
+        self._count = len(self.recorded)  # a new recording numbers on from here
+        self._index = [{} for _ in range(3)]
+        for _, fixture in self.recorded:
+            keys = match_keys(fixture["method"], fixture["host"], fixture["url"], fixture["body"])
+            for index, key in zip(self._index, keys):
+                index.setdefault(key, []).append(fixture)
+        self._served = {}
+        self.lock = threading.Lock()
+
+    def save(self, method, host, url, body, status, headers, data):
+        """Write one exchange; the url is saved without its credentials."""
+        parts = urlsplit(url)
+        url = parts.path + ("?" + redact_query(parts.query) if parts.query else "")
+        fixture = {
+            "method": method,
+            "url": url,
+            "body": body,
+            "status": status,
+            "headers": [f"{k}: {v}" for k, v in headers if k.lower() not in DROP_HEADERS],
+        }
+        try:
+            fixture["data"] = data.decode()
+        except UnicodeDecodeError:
+            fixture["data_b64"] = base64.b64encode(data).decode()
+        with self.lock:
+            self._count += 1
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", parts.path).strip("_")[:60] or "root"
+            folder = os.path.join(self.directory, host)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"{self._count:04d}-{method}-{slug}.json")
+        with open(path, "w") as f:
+            json.dump(fixture, f, indent=1, ensure_ascii=False)
+        return path
+
+    def pick(self, method, host, url, body, if_none_match=None):
+        """The fixture to answer a request with, or None."""
+        with self.lock:
+            for index, key in zip(self._index, match_keys(method, host, url, body)):
+                # A 304 only answers a request that has something to revalidate
+                candidates = [f for f in index.get(key, ()) if if_none_match or f["status"] != 304]
+                if candidates:
+                    served = self._served.get(key, 0)
+                    self._served[key] = served + 1
+                    return candidates[min(served, len(candidates) - 1)]
+        return None
+
+
+def fixture_data(fixture):
+    if "data_b64" in fixture:
+        return base64.b64decode(fixture["data_b64"])
+    return fixture["data"].encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    backend = None
+
+    def _exchange(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8", "replace") if length else ""
+        host = (self.headers.get("Host") or "").split(":")[0]
+        self.backend.answer(self, host, body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _exchange
+
+    def send_raw(self, status, headers, data, length=None):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(data) if length is None else length))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(backend):
+    """Start backend's server on a free local port; returns the server."""
+    handler = type("Handler", (_Handler,), {"backend": backend})
+    server = QuietServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Recorder:
+    """Forward every request to the real API and save the exchange.
+
+    Requests arrive in the clear from the simulated socketpool; origins maps
+    a host name to the (scheme, port) it is really served on, taken from the
+    URLs in settings.toml. Anything else is https on 443.
+    """
+
+    def __init__(self, directory, epoch, origins=None, timeout=30):
+        self.fixtures = Fixtures(directory)
+        self.origins = origins or {}
+        self.timeout = timeout
+        self.epoch = epoch
+        self.started = time.monotonic()
+        self.faults = set()
+        self.log = []  # (method, url, status) forwarded this wake
+
+    def now(self):
+        return self.epoch + (time.monotonic() - self.started)
+
+    def start_wake(self, epoch, faults=()):
+        self.epoch = epoch
+        self.started = time.monotonic()
+        self.faults = set(faults)
+        self.log = []
+
+    def answer(self, handler, host, body):
+        scheme, port = self.origins.get(host, ("https", 443))
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout,
+                                               context=ssl.create_default_context())
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        headers = {k: v for k, v in handler.headers.items() if k.lower() not in ("connection", "content-length")}
+        try:
+            conn.request(handler.command, handler.path, body=body.encode() if body else None, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except OSError as e:
+            print(f"record: {handler.command} {host}{handler.path.split('?')[0]} failed: {e}")
+            handler.close_connection = True
+            return
+        finally:
+            conn.close()
+        headers = [(k, v) for k, v in response.getheaders() if k.lower() not in DROP_HEADERS]
+        self.fixtures.save(handler.command, host, handler.path, body, response.status, headers, data)
+        self.log.append((handler.command, host + handler.path.split("?")[0], response.status))
+        handler.send_raw(response.status, headers, data)
+
+
+class Replay:
+    """Answer from recorded fixtures, with latency, bandwidth and fault rules."""
+
+    def __init__(self, directory, epoch, latency=0.0, bandwidth=None, rules=(), seed=0):
+        self.fixtures = Fixtures(directory)
+        if not self.fixtures.recorded:
+            raise ValueError(f"no fixtures in {directory}")
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.rules = [parse_rule(r) if isinstance(r, str) else r for r in rules]
+        self.random = random.Random(seed)
+        self.epoch = epoch
+        self.started = time.monotonic()
+        self.faults = set()
+        self.log = []  # (method, host + path, status or fault) answered this wake
+
+    def now(self):
+        return self.epoch + (time.monotonic() - self.started)
+
+    def start_wake(self, epoch, faults=()):
+        self.epoch = epoch
+        self.started = time.monotonic()
+        self.faults = set(faults)
+        self.log = []
+
+    def _fault(self, where):
+        """The injected fault for this request, or None."""
+        for fault in ("hang",) + tuple(FAULT_STATUS):
+            if fault in self.faults:
+                return FAULT_STATUS.get(fault, fault)
+        for match, kind, rate in self.rules:
+            if match in where and self.random.random() < rate:
+                return kind
+        return None
+
+    def _hang(self, handler):
+        # Until the client closes the connection (its timeout) or HANG_SECONDS
+        handler.close_connection = True
+        sock = handler.connection
+        try:
+            ready, _, _ = select.select([sock], [], [], HANG_SECONDS)
+            if ready:
+                sock.recv(1)
+        except OSError:
+            pass
+
+    def _write(self, handler, data):
+        if not self.bandwidth:
+            handler.wfile.write(data)
+            return
+        for start in range(0, len(data), CHUNK):
+            chunk = data[start:start + CHUNK]
+            time.sleep(len(chunk) / self.bandwidth)
+            handler.wfile.write(chunk)
+
+    def answer(self, handler, host, body):
+        path = handler.path.split("?")[0]
+        fault = self._fault(host + path)
+        self.log.append((handler.command, host + path, fault or "ok"))
+        if fault == "disconnect":
+            handler.close_connection = True
+            handler.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if fault == "hang":
+            return self._hang(handler)
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(fault, int):
+            data = json.dumps({"error": {"id": str(fault), "detail": "injected by the replay"}}).encode()
+            headers = [("Content-Type", "application/json"), ("Date", http_date(self.now()))]
+            if fault in (429, 503):
+                headers.append(("Retry-After", "30"))
+            return handler.send_raw(fault, headers, data)
+
+        fixture = self.fixtures.pick(handler.command, host, handler.path, body,
+                                     handler.headers.get("If-None-Match"))
+        if fixture is None:
+            data = json.dumps({"error": f"no fixture for {handler.command} {host}{path}"}).encode()
+            return handler.send_raw(404, [("Content-Type", "application/json")], data)
+        status = fixture["status"]
+        headers = [tuple(h.split(": ", 1)) for h in fixture["headers"]]
+        headers = [(k, v) for k, v in headers if k.lower() != "date"]
+        headers.append(("Date", http_date(self.now())))
+        data = fixture_data(fixture)
+        etag = next((v for k, v in headers if k.lower() == "etag"), None)
+        if status == 200 and etag and handler.headers.get("If-None-Match") == etag:
+            status, data = 304, b""
+        if status == 304:
+            data = b""
+        if fault == "truncate" and data:
+            handler.close_connection = True
+            handler.send_raw(status, headers, b"", length=len(data))
+            self._write(handler, data[:len(data) // 2])
+            return
+        handler.send_raw(status, headers, b"", length=len(data))
+        self._write(handler, data)
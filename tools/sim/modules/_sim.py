@@ -0,0 +1,143 @@
+"""Shared state of one simulated wake: virtual clock, radio, counters, memory.
+
+The stand-ins next to this module (board, alarm, wifi, socketpool, ssl, ...)
+all work through it. tools/sim/wake.py fills it in from the wake's config
+before boot.py runs and writes it back out once the board is asleep.
+
+Time is virtual. It starts at 0 with the wake, as time.monotonic() does on
+the board, and only moves by what the board would have spent: time.sleep(),
+WiFi association and DHCP, DNS, TCP and TLS handshakes, round trips and
+transfer at LINK's rates, e-ink refreshes, and real time spent waiting on a
+slow server. Host CPU time is not counted, so a run measures the radio and
+the panel rather than this machine, and repeat runs agree to within the
+occasional slow server reply.
+"""
+
+# Costs of the MagTag's ESP32-S2 on a typical home network. A wake's config
+# can override any of them under "link".
+LINK = {
+    "wifi_scan": 2.0,  # s, association after a scan of every channel
+    "wifi_fast": 0.5,  # s, association with a known BSSID and channel
+    "dhcp": 0.6,  # s, skipped with a static IP
+    "dns": 0.05,  # s per host name per wake
+    "rtt": 0.06,  # s per round trip
+    "tls": 0.9,  # s of handshake crypto, on top of two round trips
+    "tls_tx": 600,  # handshake bytes sent
+    "tls_rx": 4200,  # handshake bytes received (certificate chain)
+    "bandwidth": 120000,  # bytes/s each way, after TLS
+    "server_floor": 0.02,  # s; shorter server waits are host overhead
+    "refresh": 2.2,  # s, grayscale e-ink refresh
+    # gc.mem_free() counts down from this. CPython objects are several times
+    # the size of CircuitPython's, so it is far above the board's ~2 MB:
+    # compare allocations between runs, not against the board.
+    "heap": 16000000,
+}
+
+SSID = "simnet"
+BSSID = b"\x02\x51\x4d\x00\x00\x01"
+CHANNEL = 6
+
+config = {}
+link = dict(LINK)
+now = 0.0  # virtual seconds since the wake began
+rtc_error = 0.0  # board RTC minus true time, seconds
+# The ESP32-S2's sizes: a slot past the end fails here as it would on the board
+sleep_memory = bytearray(4096)
+nvm = bytearray(8192)
+stats = {}
+_radio_since = None
+
+
+class DeepSleep(BaseException):
+    """Raised by alarm.exit_and_deep_sleep_until_alarms(); ends the wake.
+
+    A BaseException, so the apps' `except Exception` blocks let it through.
+    """
+
+    def __init__(self, alarms):
+        super().__init__("deep sleep")
+        self.alarms = alarms
+
+
+def setup(wake_config):
+    global config, rtc_error
+    config = wake_config
+    link.update(config.get("link", {}))
+    rtc_error = config.get("rtc_error", 0.0)
+    stats.update({
+        "radio_s": 0.0, "requests": 0, "tx": 0, "rx": 0,
+        "connections": 0, "tls": 0, "refreshes": 0, "led_shows": 0,
+    })
+
+
+def advance(seconds):
+    global now
+    if seconds > 0:
+        now += seconds
+
+
+def advance_to(moment):
+    advance(moment - now)
+
+
+def epoch():
+    """What the board's RTC reads now (UTC seconds)."""
+    return config["epoch"] + now + rtc_error
+
+
+def set_rtc(rtc_epoch):
+    global rtc_error
+    rtc_error = rtc_epoch - (config["epoch"] + now)
+
+
+def fault(name):
+    return name in config.get("faults", ())
+
+
+def setting(name, default=None):
+    return config.get("settings", {}).get(name, default)
+
+
+def route(host):
+    """(address, port) that connections to host actually go to."""
+    routes = config.get("routes", {})
+    return tuple(routes.get(host) or routes["*"])
+
+
+def radio_on():
+    global _radio_since
+    if _radio_since is None:
+        _radio_since = now
+
+
+def radio_off():
+    global _radio_since
+    if _radio_since is not None:
+        stats["radio_s"] += now - _radio_since
+        _radio_since = None
+
+
+def transfer(sent=0, received=0):
+    """Count bytes on the air and the time they take."""
+    stats["tx"] += sent
+    stats["rx"] += received
+    advance((sent + received) / link["bandwidth"])
+
+
+def screen(lines):
+    """Keep what the panel shows after a refresh."""
+    path = config.get("screen")
+    if path:
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def result(sleep_alarms):
+    """The wake's outcome, for the runner: sleep length, counters, clock."""
+    radio_off()
+    minutes = None
+    for alarm in sleep_alarms or ():
+        seconds = getattr(alarm, "monotonic_time", None)
+        if seconds is not None:
+            minutes = (seconds - now) / 60
+    return dict(stats, awake_s=now, sleep_min=minutes, rtc_error=rtc_error)
@@ -0,0 +1,16 @@
+"""Line from (x0, y0) to (x1, y1)."""
+
+
+class Line:
+    def __init__(self, x0, y0, x1, y1, color):
+        self.x = min(x0, x1)
+        self.y = min(y0, y1)
+        self.end = (x1, y1)
+        self.start = (x0, y0)
+        self.color = color
+        self.hidden = False
+
+    def _draw(self, x, y, lines):
+        if not self.hidden:
+            (x0, y0), (x1, y1) = self.start, self.end
+            lines.append(f"line {x + x0},{y + y0} {x + x1},{y + y1} #{self.color:06x}")
@@ -0,0 +1,23 @@
+"""Rect at (x, y), optionally filled and outlined."""
+
+
+class Rect:
+    def __init__(self, x, y, width, height, *, fill=None, outline=None, stroke=1):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.fill = fill
+        self.outline = outline
+        self.stroke = stroke
+        self.hidden = False
+
+    def _draw(self, x, y, lines):
+        if self.hidden:
+            return
+        style = []
+        if self.fill is not None:
+            style.append(f"fill #{self.fill:06x}")
+        if self.outline is not None:
+            style.append(f"outline #{self.outline:06x}")
+        lines.append(f"rect {x + self.x},{y + self.y} {self.width}x{self.height} " + " ".join(style))
@@ -0,0 +1,6 @@
+"""Stand-in for the adafruit_display_text bundle library.
+
+The real library builds glyph bitmaps through displayio internals that the
+simulator does not model, so label.Label here only keeps its text and where
+it would be drawn.
+"""
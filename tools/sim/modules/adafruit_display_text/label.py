@@ -0,0 +1,32 @@
+"""label.Label: text, scale and placement, laid out in the 6x12 font."""
+import displayio
+
+
+class Label(displayio.Group):
+    def __init__(self, font, *, text="", color=0xFFFFFF, scale=1, x=0, y=0,
+                 anchor_point=None, anchored_position=None, **kwargs):
+        super().__init__(scale=scale, x=x, y=y)
+        self.font = font
+        self.text = text
+        self.color = color
+        self.anchor_point = anchor_point
+        self.anchored_position = anchored_position
+
+    @property
+    def bounding_box(self):
+        width, height = self.font.get_bounding_box()
+        lines = self.text.split("\n")
+        return 0, -height // 2, max(len(line) for line in lines) * width, len(lines) * height
+
+    def _draw(self, x, y, lines):
+        if self.hidden:
+            return
+        _, _, width, height = self.bounding_box
+        width *= self.scale
+        height *= self.scale
+        if self.anchor_point is not None and self.anchored_position is not None:
+            left = self.anchored_position[0] - int(self.anchor_point[0] * width)
+            top = self.anchored_position[1] - int(self.anchor_point[1] * height)
+        else:
+            left, top = self.x, self.y - height // 2
+        lines.append(f"text {x + left},{y + top} x{self.scale} {self.text!r}")
@@ -0,0 +1,34 @@
+"""Stand-in for adafruit_ntp: one SNTP exchange over the socketpool stand-in.
+
+The board gets the real library from /lib; this one keeps its interface
+(NTP(pool, server=..., tz_offset=..., socket_timeout=...).datetime) so the
+simulator does not depend on it being installed on the host. The UDP
+socket charges the exchange to the wake, and the "no-ntp" fault makes it
+time out, as the real library would.
+"""
+import struct
+import time
+
+NTP_TO_UNIX_EPOCH = 2208988800  # 1900 to 1970
+
+
+class NTP:
+    def __init__(self, socketpool, *, server="0.adafruit.pool.ntp.org", port=123,
+                 tz_offset=0, socket_timeout=10, cache_seconds=0):
+        self._pool = socketpool
+        self._server = server
+        self._port = port
+        self._tz_offset = tz_offset * 3600
+        self._socket_timeout = socket_timeout
+
+    @property
+    def datetime(self):
+        packet = bytearray(48)
+        packet[0] = 0b00100011  # not leap second, version 4, client
+        address = self._pool.getaddrinfo(self._server, self._port)[0][4]
+        with self._pool.socket(self._pool.AF_INET, self._pool.SOCK_DGRAM) as sock:
+            sock.settimeout(self._socket_timeout)
+            sock.sendto(packet, address)
+            sock.recv_into(packet)
+        seconds = struct.unpack_from("!I", packet, 40)[0] - NTP_TO_UNIX_EPOCH
+        return time.localtime(seconds + self._tz_offset)
@@ -0,0 +1,38 @@
+"""Stand-in for alarm: sleep_memory, the wake alarm and deep sleep.
+
+wake_alarm is what the runner says woke the board: None after a reset, a
+TimeAlarm, or the PinAlarm of the pressed button. Deep sleep ends the wake
+by raising _sim.DeepSleep with the alarms; the runner picks the next wake
+from them.
+"""
+import _sim
+import board
+
+from . import pin, time
+
+sleep_memory = _sim.sleep_memory
+
+
+def _wake_alarm():
+    wake = _sim.config.get("wake")
+    if wake is None:
+        return None
+    if wake == "timer":
+        return time.TimeAlarm(monotonic_time=0)
+    return pin.PinAlarm(pin=getattr(board, wake), value=False, pull=True)
+
+
+wake_alarm = _wake_alarm()
+
+
+def exit_and_deep_sleep_until_alarms(*alarms, preserve_dios=()):
+    raise _sim.DeepSleep(alarms)
+
+
+def light_sleep_until_alarms(*alarms):
+    times = [a for a in alarms if isinstance(a, time.TimeAlarm)]
+    if not times:
+        raise RuntimeError("simulated light sleep needs a TimeAlarm")
+    first = min(times, key=lambda a: a.monotonic_time)
+    _sim.advance_to(first.monotonic_time)
+    return first
@@ -0,0 +1,9 @@
+"""alarm.time.TimeAlarm."""
+import _sim
+
+
+class TimeAlarm:
+    def __init__(self, *, monotonic_time=None, epoch_time=None):
+        if monotonic_time is None:
+            monotonic_time = _sim.now + epoch_time - _sim.epoch()
+        self.monotonic_time = monotonic_time
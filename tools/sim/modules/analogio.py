@@ -0,0 +1,20 @@
+"""Stand-in for analogio. VOLTAGE_MONITOR reads the runner's battery voltage."""
+import _sim
+
+
+class AnalogIn:
+    reference_voltage = 3.3
+
+    def __init__(self, pin):
+        self.pin = pin
+
+    @property
+    def value(self):
+        if self.pin.name != "VOLTAGE_MONITOR":
+            return 0
+        # Behind the MagTag's divider, which halves the battery voltage
+        volts = _sim.config.get("battery", 3.9) / 2
+        return min(65535, int(volts / self.reference_voltage * 65535))
+
+    def deinit(self):
+        pass
@@ -0,0 +1,16 @@
+"""Stand-in for the MagTag's board module: its pins and the e-ink DISPLAY."""
+import displayio
+from microcontroller import Pin
+
+D11 = BUTTON_D = Pin("D11")
+D12 = BUTTON_C = Pin("D12")
+D14 = BUTTON_B = Pin("D14")
+D15 = BUTTON_A = Pin("D15")
+NEOPIXEL = Pin("NEOPIXEL")
+NEOPIXEL_POWER = Pin("NEOPIXEL_POWER")
+VOLTAGE_MONITOR = BATTERY = Pin("VOLTAGE_MONITOR")
+LIGHT = Pin("LIGHT")
+SPEAKER = Pin("SPEAKER")
+ACCELEROMETER_INTERRUPT = Pin("ACCELEROMETER_INTERRUPT")
+
+DISPLAY = displayio.EPaperDisplay(width=296, height=128)
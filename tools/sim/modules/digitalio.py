@@ -0,0 +1,61 @@
+"""Stand-in for digitalio. The buttons read pressed (low) while held.
+
+The runner's "press" config names the held pin and for how many seconds
+of the wake it stays down; every other input reads its pull.
+"""
+import _sim
+
+
+class Direction:
+    INPUT = "input"
+    OUTPUT = "output"
+
+
+class Pull:
+    UP = "up"
+    DOWN = "down"
+
+
+class DriveMode:
+    PUSH_PULL = "push_pull"
+    OPEN_DRAIN = "open_drain"
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self.drive_mode = DriveMode.PUSH_PULL
+        self._value = False
+
+    @property
+    def value(self):
+        if self.direction == Direction.OUTPUT:
+            return self._value
+        press = _sim.config.get("press")
+        if press and press["pin"] == self.pin.name and _sim.now < press["seconds"]:
+            return False
+        return self.pull == Pull.UP
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+        self.direction = Direction.OUTPUT
+        self._value = value
+        self.drive_mode = drive_mode
+
+    def deinit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.deinit()
@@ -0,0 +1,156 @@
+"""Stand-in for displayio: the layer tree, and the MagTag's e-ink panel.
+
+Nothing is rasterised. A refresh writes the tree out as one line per
+label, line and rectangle with its position on the panel (_sim.screen()),
+which is enough to see what a wake drew and whether it changed. Bitmaps do
+allocate their pixel buffer, so heap use stays close to the board's.
+"""
+import _sim
+
+MIN_REFRESH_INTERVAL = 5  # s between refreshes the panel accepts
+
+
+class Group:
+    def __init__(self, *, scale=1, x=0, y=0):
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._layers = []
+
+    def append(self, layer):
+        self._layers.append(layer)
+
+    def insert(self, index, layer):
+        self._layers.insert(index, layer)
+
+    def index(self, layer):
+        return self._layers.index(layer)
+
+    def pop(self, i=-1):
+        return self._layers.pop(i)
+
+    def remove(self, layer):
+        self._layers.remove(layer)
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def __setitem__(self, index, layer):
+        self._layers[index] = layer
+
+    def __delitem__(self, index):
+        del self._layers[index]
+
+    def _draw(self, x, y, lines):
+        if self.hidden:
+            return
+        for layer in self._layers:
+            draw = getattr(layer, "_draw", None)
+            if draw:
+                draw(x + self.x, y + self.y, lines)
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self._bits = max(1, (value_count - 1).bit_length())
+        self._data = bytearray((width * height * self._bits + 7) // 8)
+        self._pixels = {}
+
+    def _key(self, index):
+        if isinstance(index, tuple):
+            return index
+        return index % self.width, index // self.width
+
+    def __getitem__(self, index):
+        return self._pixels.get(self._key(index), 0)
+
+    def __setitem__(self, index, value):
+        self._pixels[self._key(index)] = value
+
+    def fill(self, value):
+        self._pixels = {}
+        if value:
+            for i in range(self.width * self.height):
+                self._pixels[self._key(i)] = value
+
+
+class Palette:
+    def __init__(self, color_count, *, dither=False):
+        self._colors = [0] * color_count
+        self._transparent = set()
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, color):
+        self._colors[index] = color
+
+    def make_transparent(self, index):
+        self._transparent.add(index)
+
+    def make_opaque(self, index):
+        self._transparent.discard(index)
+
+
+class TileGrid:
+    def __init__(self, bitmap, *, pixel_shader, width=1, height=1,
+                 tile_width=None, tile_height=None, default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+    def _draw(self, x, y, lines):
+        if not self.hidden:
+            lines.append(f"bitmap {x + self.x},{y + self.y} {self.bitmap.width}x{self.bitmap.height}")
+
+
+class EPaperDisplay:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.rotation = 270
+        self.root_group = None
+        self._refreshed_at = None
+        self._busy_until = 0.0
+
+    @property
+    def time_to_refresh(self):
+        if self._refreshed_at is None:
+            return 0.0
+        return max(0.0, self._refreshed_at + MIN_REFRESH_INTERVAL - _sim.now)
+
+    @property
+    def busy(self):
+        if _sim.now < self._busy_until:
+            # Polled until the panel is done
+            _sim.advance_to(self._busy_until)
+            return True
+        return False
+
+    def refresh(self):
+        if self.time_to_refresh > 0:
+            raise RuntimeError("Refresh too soon")
+        self._refreshed_at = _sim.now
+        self._busy_until = _sim.now + _sim.link["refresh"]
+        _sim.stats["refreshes"] += 1
+        lines = []
+        if self.root_group is not None:
+            self.root_group._draw(0, 0, lines)
+        _sim.screen(lines)
+
+
+def release_displays():
+    pass
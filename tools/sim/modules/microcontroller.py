@@ -0,0 +1,34 @@
+"""Stand-in for microcontroller: pins, and nvm kept by the simulator."""
+import _sim
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+
+class _Processor:
+    frequency = 240000000
+    temperature = 35.0
+    voltage = 3.3
+
+
+cpu = _Processor()
+nvm = _sim.nvm
+
+
+class RunMode:
+    NORMAL = "normal"
+    SAFE_MODE = "safe_mode"
+    BOOTLOADER = "bootloader"
+
+
+def on_next_reset(run_mode):
+    pass
+
+
+def reset():
+    raise _sim.DeepSleep(())
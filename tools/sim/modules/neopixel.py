@@ -0,0 +1,42 @@
+"""Stand-in for neopixel: the four status LEDs, counted when lit."""
+import _sim
+
+GRB = "GRB"
+RGB = "RGB"
+
+
+class NeoPixel:
+    def __init__(self, pin, n, *, bpp=3, brightness=1.0, auto_write=True, pixel_order=None):
+        self.pin = pin
+        self.n = n
+        self.brightness = brightness
+        self.auto_write = auto_write
+        self._pixels = [(0, 0, 0)] * n
+
+    def _color(self, value):
+        if isinstance(value, int):
+            return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
+        return tuple(value)
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, value):
+        self._pixels[index] = self._color(value)
+        if self.auto_write:
+            self.show()
+
+    def fill(self, value):
+        self._pixels = [self._color(value)] * self.n
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        if any(any(p) for p in self._pixels):
+            _sim.stats["led_shows"] += 1
+
+    def deinit(self):
+        pass
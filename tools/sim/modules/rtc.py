@@ -0,0 +1,14 @@
+"""Stand-in for rtc: setting the time moves the simulated board clock."""
+import time
+
+import _sim
+
+
+class RTC:
+    @property
+    def datetime(self):
+        return time.localtime()
+
+    @datetime.setter
+    def datetime(self, value):
+        _sim.set_rtc(time.mktime(value))
@@ -0,0 +1,191 @@
+"""Stand-in for socketpool, over real sockets to the simulator's servers.
+
+Every host name connects to _sim.route(host): the mock servers, or a
+replay/record server. Each socket charges the link costs in _sim.LINK to
+the virtual clock (DNS once per name per wake, a round trip for the TCP
+handshake, the TLS handshake when ssl wrapped it, a round trip per request
+and the bytes both ways) and counts connections, requests and bytes. Server
+waits longer than LINK["server_floor"] count too, so slow or hanging
+servers cost what they would on the board; shorter ones are this host's
+own overhead and are not counted.
+
+UDP sockets answer NTP requests to port 123 from the simulated true time.
+"""
+import errno
+import socket as _socket
+import struct
+import time
+
+import _sim
+
+AF_INET = 2
+SOCK_STREAM = 1
+SOCK_DGRAM = 2
+IPPROTO_IP = 0
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+SOL_SOCKET = 0xFFF
+SO_REUSEADDR = 0x0004
+TCP_NODELAY = 1
+EAI_NONAME = -2
+
+NTP_EPOCH_OFFSET = 2208988800  # 1900 to 1970
+_resolved = set()  # host names looked up this wake
+
+
+def _wait(start):
+    """Charge real time spent blocked on the server beyond the host's overhead."""
+    waited = time.perf_counter() - start
+    if waited > _sim.link.get("server_floor", 0.02):
+        _sim.advance(waited)
+
+
+class Socket:
+    def __init__(self, family=AF_INET, type=SOCK_STREAM, proto=IPPROTO_IP):
+        self.type = type
+        self._sock = None
+        self._timeout = None
+        self._tls = False
+        self._sending = False  # a request went out and no reply byte came back yet
+        self._reply = None  # UDP
+
+    def settimeout(self, value):
+        self._timeout = value
+        if self._sock:
+            self._sock.settimeout(value)
+
+    def setblocking(self, flag):
+        self.settimeout(None if flag else 0)
+
+    def setsockopt(self, level, optname, value):
+        pass
+
+    def connect(self, address):
+        host, port = address
+        if not _radio_connected():
+            raise OSError(errno.EHOSTUNREACH, "WiFi is not connected")
+        if host not in _resolved:
+            _resolved.add(host)
+            _sim.advance(_sim.link["dns"])
+        start = time.perf_counter()
+        try:
+            self._sock = _socket.create_connection(_sim.route(host), timeout=self._timeout)
+        except _socket.timeout:
+            _wait(start)
+            raise OSError(errno.ETIMEDOUT, "connect timed out")
+        except OSError as e:
+            raise OSError(errno.ECONNREFUSED, f"connect failed: {e}")
+        _wait(start)
+        _sim.advance(_sim.link["rtt"])
+        _sim.stats["connections"] += 1
+        if self._tls:
+            _sim.advance(_sim.link["tls"] + 2 * _sim.link["rtt"])
+            _sim.transfer(_sim.link["tls_tx"], _sim.link["tls_rx"])
+            _sim.stats["tls"] += 1
+
+    def send(self, data):
+        if self._sock is None:
+            raise OSError(errno.ENOTCONN, "not connected")
+        if not self._sending:
+            self._sending = True
+            _sim.stats["requests"] += 1
+        try:
+            self._sock.sendall(data)
+        except OSError as e:
+            raise OSError(errno.EPIPE, str(e))
+        _sim.transfer(sent=len(data))
+        return len(data)
+
+    def recv_into(self, buffer, nbytes=0):
+        if self.type == SOCK_DGRAM:
+            return self.recvfrom_into(buffer, nbytes)[0]
+        if self._sock is None:
+            raise OSError(errno.ENOTCONN, "not connected")
+        if self._sending:
+            self._sending = False
+            _sim.advance(_sim.link["rtt"])
+        start = time.perf_counter()
+        try:
+            n = self._sock.recv_into(buffer, nbytes or len(buffer))
+        except _socket.timeout:
+            _wait(start)
+            raise OSError(errno.ETIMEDOUT, "timed out")
+        except OSError as e:
+            raise OSError(errno.ECONNRESET, str(e))
+        _wait(start)
+        _sim.transfer(received=n)
+        return n
+
+    # --- UDP, for NTP ---
+
+    def sendto(self, data, address):
+        host, port = address
+        if host not in _resolved:
+            _resolved.add(host)
+            _sim.advance(_sim.link["dns"])
+        _sim.transfer(sent=len(data))
+        if port == 123 and not _sim.fault("no-ntp"):
+            seconds = _sim.config["epoch"] + _sim.now + _sim.link["rtt"] / 2
+            reply = bytearray(48)
+            reply[0] = 0x24  # LI 0, version 4, server
+            reply[1] = 2
+            whole = int(seconds)
+            struct.pack_into(">II", reply, 40, whole + NTP_EPOCH_OFFSET, int((seconds - whole) * 2**32))
+            self._reply = bytes(reply)
+        return len(data)
+
+    def _recv_reply(self, buffer):
+        _sim.advance(_sim.link["rtt"])
+        reply, self._reply = self._reply, None
+        buffer[:len(reply)] = reply
+        _sim.transfer(received=len(reply))
+        return len(reply)
+
+    def recvfrom_into(self, buffer, nbytes=0):
+        if self._reply is None:
+            _sim.advance(self._timeout or 0)
+            raise OSError(errno.ETIMEDOUT, "timed out")
+        return self._recv_reply(buffer), ("ntp", 123)
+
+    def close(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _radio_connected():
+    import wifi
+
+    return wifi.radio.connected
+
+
+class SocketPool:
+    AF_INET = AF_INET
+    SOCK_STREAM = SOCK_STREAM
+    SOCK_DGRAM = SOCK_DGRAM
+    IPPROTO_IP = IPPROTO_IP
+    IPPROTO_TCP = IPPROTO_TCP
+    IPPROTO_UDP = IPPROTO_UDP
+    SOL_SOCKET = SOL_SOCKET
+    SO_REUSEADDR = SO_REUSEADDR
+    TCP_NODELAY = TCP_NODELAY
+    EAI_NONAME = EAI_NONAME
+    gaierror = OSError
+
+    def __init__(self, radio):
+        self.radio = radio
+
+    def socket(self, family=AF_INET, type=SOCK_STREAM, proto=IPPROTO_IP):
+        return Socket(family, type, proto)
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        if not self.radio.connected:
+            raise OSError(EAI_NONAME, "WiFi is not connected")
+        # The name itself stands in for its address; connect() routes it
+        return [(AF_INET, type or SOCK_STREAM, proto, "", (host, port))]
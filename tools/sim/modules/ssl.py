@@ -0,0 +1,26 @@
+"""Stand-in for CircuitPython's ssl. Shadows CPython's in a simulated wake.
+
+The simulator's servers speak plain HTTP. Wrapping a socket only marks it,
+and socketpool charges the handshake's time and bytes when it connects.
+"""
+
+
+class SSLContext:
+    check_hostname = True
+
+    def wrap_socket(self, sock, server_side=False, server_hostname=None):
+        sock._tls = True
+        return sock
+
+    def load_verify_locations(self, cadata=None):
+        pass
+
+    def set_default_verify_paths(self):
+        pass
+
+    def load_cert_chain(self, certfile, keyfile):
+        pass
+
+
+def create_default_context():
+    return SSLContext()
@@ -0,0 +1,13 @@
+"""Stand-in for storage. The CIRCUITPY drive is a directory in the state dir."""
+
+
+def remount(mount_path, readonly=False, *, disable_concurrent_write_protection=False):
+    pass
+
+
+def disable_usb_drive():
+    pass
+
+
+def enable_usb_drive():
+    pass
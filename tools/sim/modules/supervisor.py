@@ -0,0 +1,18 @@
+"""Stand-in for supervisor."""
+
+
+class _Runtime:
+    serial_connected = False
+    usb_connected = False
+    serial_bytes_available = 0
+
+
+runtime = _Runtime()
+
+
+def reload():
+    pass
+
+
+def set_next_code_file(filename, **kwargs):
+    pass
@@ -0,0 +1,12 @@
+"""Stand-in for terminalio: the built-in 6x12 font."""
+
+
+class _BuiltinFont:
+    def get_bounding_box(self):
+        return 6, 12
+
+    def get_glyph(self, codepoint):
+        return None
+
+
+FONT = _BuiltinFont()
@@ -0,0 +1,93 @@
+"""Stand-in for wifi: one access point, and the radio's on-time.
+
+The simulated AP has the settings' CIRCUITPY_WIFI_SSID, on _sim.CHANNEL.
+connect() costs a scan, or only the association when the caller passes the
+cached channel and BSSID, plus DHCP unless a static address was set. The
+radio counts as on from the first connect() until enabled is set False, as
+power.deep_sleep() does.
+
+Faults from the runner: "offline" (no AP answers: connect() fails after the
+scan or the fast-path timeout) and "ap-moved" (the AP changed channel, so
+the cached fast path fails and a scan finds it).
+"""
+import ipaddress
+
+import _sim
+
+
+class Network:
+    def __init__(self):
+        self.ssid = _sim.setting("CIRCUITPY_WIFI_SSID") or _sim.SSID
+        self.bssid = _sim.BSSID
+        self.channel = _sim.CHANNEL + (5 if _sim.fault("ap-moved") else 0)
+        self.rssi = -58
+        self.authmode = ("WPA2_PSK",)
+        self.country = "US"
+
+
+class Radio:
+    def __init__(self):
+        self._enabled = True
+        self._connected = False
+        self._static = False
+        self.ipv4_address = None
+        self.ipv4_subnet = None
+        self.ipv4_gateway = None
+        self.ipv4_dns = None
+        self.hostname = "magtag-sim"
+        self.tx_power = 20.0
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = bool(value)
+        if not value:
+            self._connected = False
+            _sim.radio_off()
+
+    @property
+    def connected(self):
+        return self._connected
+
+    @property
+    def ap_info(self):
+        return Network() if self._connected else None
+
+    def connect(self, ssid, password=None, *, channel=0, bssid=None, timeout=None):
+        self._enabled = True
+        _sim.radio_on()
+        ap = Network()
+        fast = bool(channel and bssid)
+        if _sim.fault("offline") or ssid != ap.ssid:
+            _sim.advance(min(timeout or 8, _sim.link["wifi_fast" if fast else "wifi_scan"] * 2))
+            raise ConnectionError("No network with that ssid")
+        if fast and (channel != ap.channel or bytes(bssid) != ap.bssid):
+            _sim.advance(timeout or 8)
+            raise ConnectionError("Unknown failure 205")
+        _sim.advance(_sim.link["wifi_fast" if fast else "wifi_scan"])
+        if not self._static:
+            _sim.advance(_sim.link["dhcp"])
+            self.ipv4_address = ipaddress.IPv4Address("192.168.1.77")
+            self.ipv4_subnet = ipaddress.IPv4Address("255.255.255.0")
+            self.ipv4_gateway = ipaddress.IPv4Address("192.168.1.1")
+            self.ipv4_dns = ipaddress.IPv4Address("192.168.1.1")
+        self._connected = True
+
+    def set_ipv4_address(self, *, ipv4, netmask, gateway, ipv4_dns=None):
+        self._static = True
+        self.ipv4_address = ipv4
+        self.ipv4_subnet = netmask
+        self.ipv4_gateway = gateway
+        self.ipv4_dns = ipv4_dns
+
+    def start_dhcp(self):
+        self._static = False
+
+    def stop_dhcp(self):
+        self._static = True
+
+
+radio = Radio()
@@ -0,0 +1,159 @@
+"""Run one simulated wake: the app's boot.py, then its code.py, until deep sleep.
+
+    python tools/sim/wake.py STATE_DIR/wake.json
+
+tools/simulate.py starts a fresh interpreter for every wake, as the board
+resets into boot.py on every wake, with TZ=UTC since the board's RTC keeps
+UTC. wake.json says which app runs and what the runner decided about this
+wake (cause, faults, clock, settings, where each host name goes). The
+board's memories are files in STATE_DIR, and the CIRCUITPY drive is
+STATE_DIR/CIRCUITPY. The outcome goes to STATE_DIR/result.json.
+
+Before the app runs, this process is made to look like the board: the
+stand-in modules in tools/sim/modules come first on sys.path, time runs on
+the simulated clock, os.getenv() reads only the simulated settings.toml,
+gc.mem_free() reports the simulated heap, and absolute paths open files on
+the simulated drive. Peak allocation is tracemalloc's, over the larger of
+boot.py and code.py.
+"""
+import builtins
+import gc
+import io
+import json
+import os
+import runpy
+import sys
+import time
+import traceback
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(HERE))
+MODULES = os.path.join(HERE, "modules")
+FIRMWARE = (
+    "alarm", "analogio", "board", "digitalio", "displayio", "microcontroller", "neopixel",
+    "rtc", "socketpool", "ssl", "storage", "supervisor", "terminalio", "wifi",
+)
+
+
+def _read_memory(path, size):
+    try:
+        with io.open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return b"\x00" * size
+    return data[:size].ljust(size, b"\x00")
+
+
+def _write_memory(path, memory):
+    with io.open(path, "wb") as f:
+        f.write(bytes(memory))
+
+
+def _map_drive(drive, keep):
+    """Send absolute paths outside keep to the simulated CIRCUITPY drive."""
+
+    def on_drive(path):
+        if isinstance(path, str) and path.startswith("/") and not path.startswith(keep):
+            return drive + path
+        return path
+
+    def wrap(fn):
+        return lambda path, *args, **kwargs: fn(on_drive(path), *args, **kwargs)
+
+    builtins.open = wrap(io.open)
+    for name in ("stat", "remove", "mkdir", "rmdir", "listdir"):
+        setattr(os, name, wrap(getattr(os, name)))
+    rename = os.rename
+    os.rename = lambda src, dst: rename(on_drive(src), on_drive(dst))
+
+
+def install_runtime(config, state_dir):
+    """Make this interpreter look like CircuitPython on the simulated board."""
+    import _sim
+
+    _sim.setup(config)
+    _sim.sleep_memory[:] = _read_memory(os.path.join(state_dir, "sleep_memory.bin"), len(_sim.sleep_memory))
+    _sim.nvm[:] = _read_memory(os.path.join(state_dir, "nvm.bin"), len(_sim.nvm))
+
+    localtime = time.localtime
+    time.monotonic = lambda: _sim.now
+    time.monotonic_ns = lambda: int(_sim.now * 1000000000)
+    time.sleep = _sim.advance
+    time.time = lambda: int(_sim.epoch())
+    time.localtime = lambda secs=None: localtime(int(_sim.epoch()) if secs is None else secs)
+    gc.mem_alloc = lambda: tracemalloc.get_traced_memory()[0]
+    gc.mem_free = lambda: _sim.link["heap"] - gc.mem_alloc()
+
+    settings = config.get("settings", {})
+    os.getenv = lambda key, default=None: settings.get(key, default)
+
+    drive = os.path.join(state_dir, "CIRCUITPY")
+    os.makedirs(drive, exist_ok=True)
+    _map_drive(drive, (REPO_ROOT, state_dir, sys.prefix, sys.base_prefix))
+    return _sim
+
+
+def _run(path, _sim):
+    """Run a script as __main__. Returns (alarms if it went to sleep, error)."""
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except _sim.DeepSleep as e:
+        return e.alarms, None
+    except Exception as e:
+        # The board prints the traceback and stays awake at the REPL prompt
+        traceback.print_exc()
+        return None, f"{type(e).__name__}: {e}"
+    return None, None
+
+
+def _forget_modules(dirs):
+    """Drop modules loaded from dirs: code.py starts with a fresh VM."""
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None) or ""
+        if path.startswith(dirs):
+            del sys.modules[name]
+
+
+def main():
+    config_path = sys.argv[1]
+    state_dir = os.path.dirname(os.path.abspath(config_path))
+    with io.open(config_path) as f:
+        config = json.load(f)
+    app_dir = os.path.join(REPO_ROOT, config["app"])
+    common = os.path.join(REPO_ROOT, "common")
+
+    # The app's own modules at the drive root, then /lib, as on the board
+    sys.path[:] = [MODULES, app_dir, common] + [p for p in sys.path[1:] if p != HERE]
+    _sim = install_runtime(config, state_dir)
+    # Built into the firmware on the board, so not on its heap
+    for name in FIRMWARE:
+        __import__(name)
+
+    tracemalloc.start()
+    peak = 0
+    alarms = error = None
+    for script in ("boot.py", "code.py"):
+        path = os.path.join(app_dir, script)
+        if not os.path.exists(path):
+            continue
+        print(f"--- {script}")
+        alarms, error = _run(path, _sim)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if error:
+            break
+        _forget_modules((app_dir, common))
+        gc.collect()
+        tracemalloc.reset_peak()
+    tracemalloc.stop()
+
+    result = _sim.result(alarms)
+    result.update(peak=peak, error=error, slept=alarms is not None)
+    _write_memory(os.path.join(state_dir, "sleep_memory.bin"), _sim.sleep_memory)
+    _write_memory(os.path.join(state_dir, "nvm.bin"), _sim.nvm)
+    with io.open(os.path.join(state_dir, "result.json"), "w") as f:
+        json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Mock cloud for the simulator: AIO time, YNAB, the RSVP GraphQL API, messages.
+
+A World holds every API's data and the true time, which runs from the
+simulated clock rather than this machine's. serve() puts it behind one
+local HTTP/1.1 server (keep-alive, like the real APIs) that answers by
+path, so every host name the apps use can be routed to it:
+
+    /api/v2/<user>/integrations/time/strftime   Adafruit IO time (text)
+    /v1/budgets/<id>/categories                 YNAB, with last_knowledge_of_server
+    /v1/budgets/<id>/months                     deltas, as the real API does
+    /v1/budgets/<id>/months/current/categories/<id>
+    /graphql                                    listGuests and listRSVPS, with
+                                                limit/nextToken and the gt filters
+    /messages, /ack                             tools/message_server.py's queue
+
+The GraphQL API reads `limit` as the items examined, as a DynamoDB-backed
+AppSync list does. change() gives every API something new: a message, an
+RSVP and some YNAB spending. Faults set for a wake apply to every request:
+"http500", "http429" (with Retry-After) and "hang" (no answer until the
+client gives up, which costs real time).
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zoneinfo
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+TOOLS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TOOLS)
+
+import message_server  # noqa: E402
+
+HANG_SECONDS = 30  # longer than any request timeout the apps use
+
+# budget-app's DISPLAY_CATEGORY_NAMES, so its screen has rows to draw
+YNAB_DISPLAY = (
+    "Home Goods 🏠",
+    "Eating Out 🌯",
+    "Dates 👩‍❤️‍👨, Fun 🎉, and Wants",
+    "Pet Supplies 🦴",
+)
+YNAB_GROUPS = (
+    "Internal Master Category", "Credit Card Payments", "Immediate Obligations",
+    "True Expenses", "Quality of Life", "Just for Fun",
+)
+YNAB_CATEGORIES = 36
+GUESTS = 80
+RSVPED = 30
+
+
+def iso(epoch, ms=False):
+    text = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch))
+    return text + (f".{int(epoch * 1000) % 1000:03d}Z" if ms else "Z")
+
+
+class World:
+    def __init__(self, epoch):
+        self.epoch = epoch  # true time when the current wake began
+        self.started = time.monotonic()
+        self.faults = set()
+        self.lock = threading.Lock()
+        self.requests = []  # (method, path) answered this wake
+        self.queue = message_server.Queue(clock=self.now)
+        self._changes = 0
+        self._seed_ynab()
+        self._seed_rsvps()
+        for i in range(3):
+            self.queue.add("sim", f"Welcome message {i + 1}: dinner is at seven, bring the salad")
+
+    def now(self):
+        return self.epoch + (time.monotonic() - self.started)
+
+    def start_wake(self, epoch, faults=()):
+        self.epoch = epoch
+        self.started = time.monotonic()
+        self.faults = set(faults)
+        self.requests = []
+
+    def change(self):
+        """Something new for every API."""
+        with self.lock:
+            self._changes += 1
+            n = self._changes
+            self.queue.add("sim", f"Update {n}: the plan changed again, see you at the usual place")
+            # The next guest without an RSVP answers
+            code = self.guests[(RSVPED + n - 1) % GUESTS]["code"]
+            self.rsvps.append({"accessCode": code, "guestName": f"Guest {code}",
+                               "createdAt": iso(self.now(), ms=True)})
+            cat = self.ynab_display[(n - 1) % len(self.ynab_display)]
+            cat["activity"] -= 23450
+            cat["balance"] -= 23450
+            self.knowledge += 1
+            cat["k"] = self.knowledge
+
+    # --- YNAB ---
+
+    def _seed_ynab(self):
+        self.knowledge = 1000
+        self.ynab_groups = []
+        self.ynab_display = []
+        for i in range(YNAB_CATEGORIES):
+            if i % 6 == 0:
+                group = {"id": f"{i // 6:08x}-0000-4000-8000-000000000000",
+                         "name": YNAB_GROUPS[i // 6], "hidden": False, "deleted": False, "categories": []}
+                self.ynab_groups.append(group)
+            # Outside the groups budget-app excludes
+            display = i >= 12 and i % 6 == 3 and len(self.ynab_display) < len(YNAB_DISPLAY)
+            budgeted = 300000 + i * 5000
+            activity = -(90000 + i * 3100)
+            cat = {
+                "id": f"{i + 1:08x}-1111-4000-8000-{i:012x}",
+                "category_group_id": group["id"],
+                "category_group_name": group["name"],
+                "name": YNAB_DISPLAY[len(self.ynab_display)] if display else f"Category {i}",
+                "hidden": i % 17 == 13,
+                "original_category_group_id": None,
+                "note": f"Notes for category {i}: " + "lorem ipsum dolor sit amet " * 3,
+                "budgeted": budgeted,
+                "activity": activity,
+                "balance": budgeted + activity,
+                "goal_type": "NEED",
+                "goal_target": budgeted,
+                "goal_percentage_complete": 50,
+                "goal_under_funded": 0,
+                "deleted": False,
+                "k": self.knowledge,
+            }
+            group["categories"].append(cat)
+            if display:
+                self.ynab_display.append(cat)
+
+    def _ynab_categories(self, since):
+        groups = []
+        for group in self.ynab_groups:
+            cats = [_public(c) for c in group["categories"] if since is None or c["k"] > since]
+            if cats:
+                groups.append(dict(group, categories=cats))
+        return {"data": {"category_groups": groups, "server_knowledge": self.knowledge}}
+
+    def _ynab_months(self, since):
+        cats = [c for g in self.ynab_groups for c in g["categories"] if not c["deleted"]]
+        months = []
+        if since is None or max(c["k"] for c in cats) > since:
+            t = time.gmtime(self.now())
+            months.append({
+                "month": f"{t.tm_year:04d}-{t.tm_mon:02d}-01", "note": None, "income": 0,
+                "budgeted": sum(c["budgeted"] for c in cats),
+                "activity": sum(c["activity"] for c in cats),
+                "to_be_budgeted": 0, "age_of_money": 41, "deleted": False,
+            })
+        return {"data": {"months": months, "server_knowledge": self.knowledge}}
+
+    def _ynab_category(self, cid):
+        for group in self.ynab_groups:
+            for cat in group["categories"]:
+                if cat["id"] == cid:
+                    return {"data": {"category": _public(cat)}}
+        return None
+
+    def ynab(self, path, query):
+        """(status, body) for a YNAB GET."""
+        parts = path.strip("/").split("/")  # v1 budgets <id> ...
+        since = query.get("last_knowledge_of_server", [None])[0]
+        since = int(since) if since not in (None, "", "None") else None
+        with self.lock:
+            if parts[3:] == ["categories"]:
+                return 200, self._ynab_categories(since)
+            if parts[3:] == ["months"]:
+                return 200, self._ynab_months(since)
+            if parts[3:6] == ["months", "current", "categories"] and len(parts) == 7:
+                body = self._ynab_category(parts[6])
+                if body:
+                    return 200, body
+        return 404, {"error": {"id": "404.2", "name": "resource_not_found", "detail": "Resource not found"}}
+
+    # --- GraphQL ---
+
+    def _seed_rsvps(self):
+        updated = iso(self.epoch - 30 * 86400, ms=True)
+        self.guests = [
+            {"code": f"G{i:03d}", "guestCount": 1 + i % 3, "isVendor": i % 40 == 39, "updatedAt": updated}
+            for i in range(GUESTS)
+        ]
+        self.rsvps = [
+            {"accessCode": g["code"], "guestName": f"Guest {g['code']}",
+             "createdAt": iso(self.epoch - (RSVPED - i) * 7200, ms=True)}
+            for i, g in enumerate(self.guests[:RSVPED])
+        ]
+
+    def graphql(self, request):
+        """(status, body) for a GraphQL POST."""
+        query = request.get("query") or ""
+        variables = request.get("variables") or {}
+        field = "listGuests" if "listGuests" in query else "listRSVPS" if "listRSVPS" in query else None
+        if field is None:
+            return 200, {"data": None, "errors": [{"message": "Unknown query"}]}
+        fields = re.search(r"items \{ ([^}]*) \}", query)
+        fields = fields.group(1).split() if fields else None
+        filtered = re.search(r"filter: \{(\w+): \{gt: \$since\}\}", query)
+        since = variables.get("since")
+        start = int(variables.get("next") or 0)
+        limit = int(variables.get("limit") or 100)
+        with self.lock:
+            items = self.guests if field == "listGuests" else self.rsvps
+            scanned = items[start:start + limit]
+            if filtered:
+                scanned = [item for item in scanned if item.get(filtered.group(1), "") > (since or "")]
+            page = [{k: v for k, v in item.items() if fields is None or k in fields} for item in scanned]
+            more = start + limit < len(items)
+        return 200, {"data": {field: {"items": page, "nextToken": str(start + limit) if more else None}}}
+
+    # --- Adafruit IO ---
+
+    def aio_time(self, query):
+        try:
+            zone = zoneinfo.ZoneInfo(query.get("tz", ["UTC"])[0])
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            zone = timezone.utc
+        local = datetime.fromtimestamp(int(self.now()), timezone.utc).astimezone(zone)
+        return local.strftime("%Y-%m-%d %H:%M:%S %z")
+
+
+def _public(cat):
+    return {k: v for k, v in cat.items() if k != "k"}
+
+
+def make_handler(world):
+    base = message_server.make_handler(world.queue, None, False)
+
+    class Handler(base):
+        protocol_version = "HTTP/1.1"
+
+        def _fault(self):
+            """Answer with this wake's fault instead. True if one was sent."""
+            world.requests.append((self.command, urlsplit(self.path).path))
+            if "hang" in world.faults:
+                time.sleep(HANG_SECONDS)
+                self.close_connection = True
+                return True
+            for fault, code in (("http500", 500), ("http429", 429)):
+                if fault in world.faults:
+                    self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                    data = json.dumps({"error": fault}).encode()
+                    self.send_response(code)
+                    if code == 429:
+                        self.send_header("Retry-After", "30")
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return True
+            return False
+
+        def _send_text(self, code, text):
+            data = text.encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self._fault():
+                return
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+            if url.path.startswith("/api/v2/") and url.path.endswith("/integrations/time/strftime"):
+                return self._send_text(200, world.aio_time(query))
+            if url.path.startswith("/v1/budgets/"):
+                return self._send(*world.ynab(url.path, query))
+            super().do_GET()
+
+        def do_POST(self):
+            if self._fault():
+                return
+            if urlsplit(self.path).path == "/graphql":
+                body = self._json_body()
+                if not isinstance(body, dict):
+                    return self._send(400, {"errors": [{"message": "bad json"}]})
+                return self._send(*world.graphql(body))
+            super().do_POST()
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients give up mid-request on purpose (timeouts, hang)
+
+
+def serve(world):
+    """Start world's server on a free local port; returns the server."""
+    server = QuietServer(("127.0.0.1", 0), make_handler(world))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,412 @@
+"""Run an app's boot.py and code.py on this machine through simulated wakes.
+
+    python tools/simulate.py message-board reset timer B timer+change --show
+    python tools/simulate.py budget-app reset timer/offline timer --battery 3.5
+    python tools/simulate.py --bench --save before.json
+    python tools/simulate.py --bench --compare before.json
+
+Each step is one wake, `cause[+change][/fault...]`:
+    reset               power-on: sleep_memory is wiped and the RTC reads 2000
+    timer               the sleep timer ran out
+    A, B, C, D          that button woke the board halfway through the sleep
+    hold-A ... hold-D   woken by the button, held for 2 s
+    +change             new data on every API (message, RSVP, YNAB spending)
+    /offline            no access point answers
+    /ap-moved           the AP changed channel since the last wake
+    /no-ntp             NTP gets no answer (AIO time still works)
+    /http500, /http429  every API request fails with that status
+    /hang               the APIs accept the request and never answer
+
+The apps run unmodified against stand-ins for the CircuitPython modules
+(tools/sim/modules) and a local server with every API they use
+(tools/sim/world.py), on a virtual clock that only counts what the board
+would spend: the radio, the network and the panel. The board's
+sleep_memory, NVM and CIRCUITPY drive are kept in --state between wakes.
+Every wake prints its radio-on time, requests, bytes each way, peak
+allocation, time awake and the sleep it chose; its serial output is in
+--state/wake-N.log and what the panel shows in --state/screen.txt.
+
+--bench runs a fixed set of wake sequences for every app and prints the
+totals; --save keeps them and --compare prints the change against a saved
+run. Peak allocations are CPython's, several times the board's; compare
+them between runs only.
+
+--record DIR runs the wakes against the real APIs (give it a settings.toml
+with real credentials) and saves every exchange as a fixture; --replay DIR
+answers from those fixtures with no network, optionally slowed down
+(--latency, --bandwidth) and failing on purpose (--inject, --seed). The
+fixture format, matching and fault rules are in tools/sim/fixtures.py.
+The step faults /http500, /http429 and /hang apply to replays too.
+
+settings.toml: --settings loads one (it replaces the simulated APIs'
+defaults, so keep the URLs pointing at hosts --route or the default route
+can reach), --set K=V overrides single values.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tomllib
+from urllib.parse import urlsplit
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(TOOLS)
+sys.path.insert(0, os.path.join(TOOLS, "sim"))
+
+import fixtures  # noqa: E402
+import world as sim_world  # noqa: E402
+
+APPS = ("budget-app", "message-board", "rsvp-counter", "test-app")
+START = "2026-05-12T13:00:00Z"  # a Tuesday, 9:00 in New York
+RTC_RESET_EPOCH = 946684800  # 2000-01-01, where the board's RTC starts
+PRESS_SECONDS = 0.1
+HOLD_SECONDS = 2.0
+SERVER_FAULTS = ("http500", "http429", "hang")
+CLIENT_FAULTS = ("offline", "ap-moved", "no-ntp")
+IDLE_MINUTES = 1  # between a wake that never slept and the next step
+
+SETTINGS = {
+    "CIRCUITPY_WIFI_SSID": "simnet",
+    "CIRCUITPY_WIFI_PASSWORD": "simpass",
+    "TIMEZONE": "America/New_York",
+    "ADAFRUIT_AIO_USERNAME": "sim",
+    "ADAFRUIT_AIO_KEY": "sim-key",
+    "YNAB_API_TOKEN": "sim-token",
+    "YNAB_BUDGET_ID": "sim-budget",
+    "RSVP_API_URL": "https://graphql.sim/graphql",
+    "RSVP_API_KEY": "sim-key",
+    "MSG_API_URL": "https://messages.sim/messages",
+    "MSG_ACK_URL": "https://messages.sim/ack",
+}
+
+BENCH = (
+    ("steady", "reset timer timer timer"),
+    ("changes", "reset timer+change timer+change"),
+    ("buttons", "reset A B C D"),
+    ("offline", "reset timer/offline timer/offline timer"),
+    ("ap-moved", "reset timer/ap-moved timer"),
+    ("server-error", "reset timer/http500 timer"),
+    ("rate-limited", "reset B/http429 timer"),
+)
+TOTALS = ("radio_s", "requests", "tx", "rx", "awake_s", "refreshes")
+# The apps' network libraries run as they are, from this interpreter's
+# site-packages (module: pip package); the rest have stand-ins in tools/sim/modules
+HOST_LIBRARIES = {
+    "adafruit_requests": "adafruit-circuitpython-requests",
+    "adafruit_json_stream": "adafruit-circuitpython-json-stream",
+}
+
+
+def parse_step(text):
+    """'hold-B+change/offline' -> (cause, changes, faults)."""
+    head, *faults = text.split("/")
+    cause, *changes = head.split("+")
+    if any(c != "change" for c in changes):
+        raise ValueError(f"unknown step modifier in {text!r}")
+    for fault in faults:
+        if fault not in SERVER_FAULTS + CLIENT_FAULTS:
+            raise ValueError(f"unknown fault {fault!r} in {text!r}")
+    button = cause[5:] if cause.startswith("hold-") else cause
+    if cause not in ("reset", "timer") and button not in "ABCD":
+        raise ValueError(f"unknown wake cause {cause!r}")
+    return cause, len(changes), faults
+
+
+def parse_time(text):
+    return int(time.mktime(time.strptime(text.replace("Z", "") + "UTC", "%Y-%m-%dT%H:%M:%S%Z")))
+
+
+class Board:
+    """One simulated MagTag: its state directory and the clocks around it."""
+
+    def __init__(self, app, state_dir, api, settings, battery=3.9, drift=0.0, link=None, routes=None):
+        self.app = app
+        self.state_dir = state_dir
+        self.api = api  # the mock World, or a fixtures Recorder or Replay
+        self.settings = settings
+        self.battery = battery
+        self.drift = drift  # RTC seconds gained per hour asleep
+        self.link = link or {}
+        self.routes = routes or {}  # host -> [addr, port]; the rest go to api
+        self.epoch = api.epoch  # true time of the next wake
+        self.rtc_error = 0.0
+        self.sleep_min = None
+        self.wakes = 0
+        # The app's data files are on the drive next to code.py
+        drive = os.path.join(state_dir, "CIRCUITPY")
+        os.makedirs(drive, exist_ok=True)
+        for name in os.listdir(os.path.join(REPO_ROOT, app)):
+            path = os.path.join(REPO_ROOT, app, name)
+            if os.path.isfile(path) and not name.endswith((".py", ".md")):
+                if not os.path.exists(os.path.join(drive, name)):
+                    shutil.copy(path, drive)
+
+    def wake(self, step):
+        """Run one step; returns the wake's result dict."""
+        cause, changes, faults = parse_step(step)
+        if self.wakes:
+            # The time between the last wake and this one
+            minutes = self.sleep_min if self.sleep_min is not None else IDLE_MINUTES
+            if cause not in ("timer", "reset"):
+                minutes /= 2
+            self.epoch += minutes * 60
+            self.rtc_error += self.drift * minutes / 60
+        if cause == "reset":
+            self.rtc_error = RTC_RESET_EPOCH - self.epoch
+            path = os.path.join(self.state_dir, "sleep_memory.bin")
+            if os.path.exists(path):
+                os.remove(path)
+        for _ in range(changes):
+            self.api.start_wake(self.epoch)
+            self.api.change()
+
+        press = wake = None
+        if cause == "timer":
+            wake = "timer"
+        elif cause != "reset":
+            button = cause[-1]
+            wake = "BUTTON_" + button
+            press = {"pin": "D" + {"A": "15", "B": "14", "C": "12", "D": "11"}[button],
+                     "seconds": HOLD_SECONDS if cause.startswith("hold-") else PRESS_SECONDS}
+        config = {
+            "app": self.app,
+            "epoch": self.epoch,
+            "rtc_error": self.rtc_error,
+            "wake": wake,
+            "press": press,
+            "battery": self.battery,
+            "faults": [f for f in faults if f in CLIENT_FAULTS],
+            "settings": self.settings,
+            "routes": dict(self.routes, **{"*": list(self.api.address)}),
+            "screen": os.path.join(self.state_dir, "screen.txt"),
+            "link": self.link,
+        }
+        config_path = os.path.join(self.state_dir, "wake.json")
+        with open(config_path, "w") as f:
+            json.dump(config, f)
+        result_path = os.path.join(self.state_dir, "result.json")
+        if os.path.exists(result_path):
+            os.remove(result_path)
+
+        self.wakes += 1
+        self.api.start_wake(self.epoch, [f for f in faults if f in SERVER_FAULTS])
+        log_path = os.path.join(self.state_dir, f"wake-{self.wakes}.log")
+        with open(log_path, "w") as log:
+            subprocess.run(
+                [sys.executable, os.path.join(TOOLS, "sim", "wake.py"), config_path],
+                stdout=log, stderr=subprocess.STDOUT, env=dict(os.environ, TZ="UTC", PYTHONDONTWRITEBYTECODE="1"),
+                cwd=self.state_dir,
+            )
+        try:
+            with open(result_path) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            result = {"error": f"wake crashed, see {log_path}"}
+            result.update({k: 0 for k in TOTALS}, peak=0, sleep_min=None, rtc_error=self.rtc_error)
+        self.epoch += result["awake_s"]
+        self.rtc_error = result["rtc_error"]
+        self.sleep_min = result["sleep_min"]
+        result["step"] = step
+        return result
+
+
+def summary(result):
+    sleep = "no sleep" if result["sleep_min"] is None else f"sleep {result['sleep_min']:.0f} min"
+    line = (
+        f"{result['step']:24} radio {result['radio_s']:5.1f}s  {result['requests']:2} req  "
+        f"tx {result['tx'] / 1024:6.1f}K  rx {result['rx'] / 1024:6.1f}K  "
+        f"peak {result['peak'] / 1024:6.0f}K  awake {result['awake_s']:5.1f}s  "
+        f"refresh {result['refreshes']}  {sleep}"
+    )
+    if result.get("error"):
+        line += f"  ERROR {result['error']}"
+    return line
+
+
+def origins(settings):
+    """{host: (scheme, port)} from the URLs in settings, for recording."""
+    found = {}
+    for value in settings.values():
+        if isinstance(value, str) and value.startswith(("http://", "https://")):
+            url = urlsplit(value)
+            found[url.hostname] = (url.scheme, url.port or (443 if url.scheme == "https" else 80))
+    return found
+
+
+def start_api(start, settings, network):
+    """(api, server): the mock World, or a Recorder or Replay if network says so."""
+    network = network or {}
+    if network.get("record"):
+        api = fixtures.Recorder(network["record"], start, origins(settings))
+        server = fixtures.serve(api)
+    elif network.get("replay"):
+        api = fixtures.Replay(network["replay"], start, network.get("latency", 0.0),
+                              network.get("bandwidth"), network.get("rules", ()), network.get("seed", 0))
+        server = fixtures.serve(api)
+    else:
+        api = sim_world.World(start)
+        server = sim_world.serve(api)
+    api.address = server.server_address[:2]
+    return api, server
+
+
+def run(app, steps, state_dir, settings, start, show=False, network=None, **board_options):
+    """Run steps against fresh APIs; returns the list of results."""
+    api, server = start_api(start, settings, network)
+    board = Board(app, state_dir, api, settings, **board_options)
+    results = []
+    try:
+        for step in steps:
+            result = board.wake(step)
+            results.append(result)
+            print(summary(result))
+            if show:
+                for method, where, outcome in getattr(api, "log", ()):
+                    print(f"    {method} {where} -> {outcome}")
+                with open(os.path.join(state_dir, "screen.txt")) as f:
+                    print("    " + f.read().rstrip("\n").replace("\n", "\n    "))
+    finally:
+        server.shutdown()
+    return results
+
+
+def totals(results):
+    total = {k: sum(r[k] for r in results) for k in TOTALS}
+    total["peak"] = max(r["peak"] for r in results)
+    total["errors"] = sum(1 for r in results if r.get("error"))
+    return total
+
+
+def bench(apps, settings, start, options):
+    report = {}
+    for app in apps:
+        print(f"== {app}")
+        for name, steps in BENCH:
+            if options.get("network") and "+change" in steps:
+                print(f"  {name:14} (needs the mock APIs)")
+                continue
+            state_dir = tempfile.mkdtemp(prefix=f"sim-{app}-")
+            try:
+                with open(os.devnull, "w") as quiet:
+                    stdout, sys.stdout = sys.stdout, quiet
+                    try:
+                        results = run(app, steps.split(), state_dir, settings, start, **options)
+                    finally:
+                        sys.stdout = stdout
+            finally:
+                shutil.rmtree(state_dir, ignore_errors=True)
+            total = report[f"{app} {name}"] = totals(results)
+            print(f"  {name:14} " + "  ".join(_format(k, total[k]) for k in TOTALS + ("peak", "errors")))
+    return report
+
+
+def _format(key, value, delta=False):
+    sign = "+" if delta else ""
+    if key in ("radio_s", "awake_s"):
+        return f"{key[:-2]} {value:{sign}6.1f}s"
+    if key in ("tx", "rx", "peak"):
+        return f"{key} {value / 1024:{sign}7.1f}K"
+    return f"{key} {value:{sign}3}"
+
+
+def compare(report, saved):
+    print("== change against the saved run")
+    for name, total in report.items():
+        before = saved.get(name)
+        if before is None:
+            print(f"  {name:28} (not in the saved run)")
+            continue
+        deltas = [_format(k, total[k] - before.get(k, 0), delta=True) for k in TOTALS + ("peak", "errors")]
+        print(f"  {name:28} " + "  ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("app", nargs="?", choices=APPS)
+    parser.add_argument("steps", nargs="*", help="wakes to run, e.g. reset timer B/offline")
+    parser.add_argument("--show", action="store_true", help="print the panel after every wake")
+    parser.add_argument("--state", help="keep the board's state here (default: a new temp dir)")
+    parser.add_argument("--settings", help="settings.toml to use instead of the defaults")
+    parser.add_argument("--set", action="append", default=[], metavar="K=V", help="override one setting")
+    parser.add_argument("--route", action="append", default=[], metavar="HOST=ADDR:PORT",
+                        help="send one host name somewhere other than the mock APIs")
+    parser.add_argument("--battery", type=float, default=3.9, help="battery voltage")
+    parser.add_argument("--drift", type=float, default=0.0, help="RTC drift, s gained per hour asleep")
+    parser.add_argument("--start", default=START, help="true time of the first wake (UTC)")
+    parser.add_argument("--bench", action="store_true", help="run the benchmark sequences")
+    parser.add_argument("--apps", nargs="+", choices=APPS, default=APPS, help="apps for --bench")
+    parser.add_argument("--save", help="write the --bench totals to this JSON file")
+    parser.add_argument("--compare", help="compare --bench against a saved JSON file")
+    parser.add_argument("--record", metavar="DIR", help="use the real APIs and save their answers in DIR")
+    parser.add_argument("--replay", metavar="DIR", help="answer from the fixtures in DIR instead of the mock APIs")
+    parser.add_argument("--latency", type=float, default=0.0, help="replay: s before each response")
+    parser.add_argument("--bandwidth", type=float, help="replay: bytes/s for response bodies")
+    parser.add_argument("--inject", action="append", default=[], metavar="[MATCH=]KIND[:RATE]",
+                        help="replay: fail matching requests, e.g. ynab=429:0.3 graphql=truncate")
+    parser.add_argument("--seed", type=int, default=0, help="replay: seed for --inject rates")
+    args = parser.parse_args()
+    missing = [package for module, package in HOST_LIBRARIES.items() if importlib.util.find_spec(module) is None]
+    if missing:
+        sys.exit(f"simulate.py needs these on the host: pip install {' '.join(missing)}")
+
+    settings = dict(SETTINGS)
+    if args.settings:
+        with open(args.settings, "rb") as f:
+            settings = tomllib.load(f)
+    for item in args.set:
+        key, _, value = item.partition("=")
+        settings[key] = value
+    routes = {}
+    for item in args.route:
+        host, _, address = item.partition("=")
+        addr, _, port = address.rpartition(":")
+        routes[host] = [addr or "127.0.0.1", int(port)]
+    if args.record and args.replay:
+        parser.error("--record and --replay are exclusive")
+    try:
+        rules = [fixtures.parse_rule(rule) for rule in args.inject]
+    except ValueError as e:
+        parser.error(str(e))
+    network = None
+    if args.record:
+        network = {"record": args.record}
+    elif args.replay:
+        network = {"replay": args.replay, "latency": args.latency, "bandwidth": args.bandwidth,
+                   "rules": rules, "seed": args.seed}
+    # The real APIs answer with the real time
+    start = int(time.time()) if args.record and args.start == START else parse_time(args.start)
+    options = {"battery": args.battery, "drift": args.drift, "network": network}
+
+    if args.bench:
+        report = bench(args.apps, settings, start, options)
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(report, f, indent=1)
+        if args.compare:
+            with open(args.compare) as f:
+                compare(report, json.load(f))
+        return
+    if not args.app or not args.steps:
+        parser.error("name an app and at least one step, or use --bench")
+    try:
+        for step in args.steps:
+            if parse_step(step)[1] and network:
+                raise ValueError(f"{step}: +change needs the mock APIs")
+    except ValueError as e:
+        parser.error(str(e))
+
+    state_dir = args.state or tempfile.mkdtemp(prefix=f"sim-{args.app}-")
+    print(f"State in {state_dir}")
+    results = run(args.app, args.steps, state_dir, settings, start, show=args.show,
+                  routes=routes, **options)
+    total = totals(results)
+    print("total " + "  ".join(_format(k, total[k]) for k in TOTALS + ("peak", "errors")))
+
+
+if __name__ == "__main__":
+    main()
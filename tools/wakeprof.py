@@ -0,0 +1,93 @@
+"""Decode and summarise wake profiles from common/wakeprof.py.
+
+    python tools/wakeprof.py ring.bin [more.bin ...]   # uploaded rings
+    python tools/wakeprof.py --serve 8081 --out rings/ # receive uploads
+
+Each ring holds the board's last 4 wakes. Rings uploaded back to back
+overlap, so wakes are de-duplicated by number. The report lists every wake
+with the time spent in each phase (the gap since the previous mark), then
+the median and worst time per phase and cause. A phase that ran past
+wakeprof.MAX_MS after boot is marked "+": its time is a lower bound. The board's
+PROFILE_UPLOAD_URL can point at --serve, which saves every ring it is sent
+under --out.
+"""
+import argparse
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "common"))
+
+import wakeprof  # noqa: E402
+
+
+def phase_times(marks):
+    """[(phase, seconds in it, saturated)], each phase running from the previous mark."""
+    times = []
+    last = 0
+    for phase, ms, _ in marks:
+        times.append((phase, (ms - last) / 1000, ms >= wakeprof.MAX_MS))
+        last = ms
+    return times
+
+
+def report(paths):
+    seen = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            for number, cause, marks in wakeprof.wakes(f.read()):
+                seen[number] = (cause, marks)
+
+    by_phase = {}
+    for number in sorted(seen):
+        cause, marks = seen[number]
+        times = phase_times(marks)
+        total = marks[-1][1] / 1000 if marks else 0
+        low = min((mem for _, _, mem in marks), default=0)
+        print(f"wake {number:5} {cause:6} {total:6.2f}s  min free {low // 1024}K  "
+              + " ".join(f"{phase} {t:.2f}{'+' if saturated else ''}" for phase, t, saturated in times))
+        for phase, t, _ in times:
+            by_phase.setdefault((cause, phase), []).append(t)
+
+    print()
+    print(f"{'cause':6} {'phase':8} {'n':>4} {'median':>7} {'max':>7}")
+    for (cause, phase), values in sorted(by_phase.items()):
+        values.sort()
+        print(f"{cause:6} {phase:8} {len(values):4} {values[len(values) // 2]:7.2f} {values[-1]:7.2f}")
+
+
+def serve(port, out):
+    os.makedirs(out, exist_ok=True)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            path = os.path.join(out, time.strftime("%Y%m%d-%H%M%S") + ".bin")
+            with open(path, "wb") as f:
+                f.write(body)
+            print(f"{path}: {len(wakeprof.wakes(body))} wakes")
+            self.send_response(204)
+            self.end_headers()
+
+    print(f"Receiving rings on port {port} into {out}/")
+    HTTPServer(("", port), Handler).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("rings", nargs="*", help="ring files as uploaded")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="receive uploads instead")
+    parser.add_argument("--out", default="rings", help="where --serve saves rings")
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.out)
+    elif args.rings:
+        report(args.rings)
+    else:
+        parser.error("give ring files or --serve")
+
+
+if __name__ == "__main__":
+    main()
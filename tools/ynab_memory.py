@@ -0,0 +1,140 @@
+"""Compare peak memory of response.json() vs. the streaming YNAB parser.
+
+    python tools/ynab_memory.py                  # 300-category fixture
+    python tools/ynab_memory.py --categories 1000
+    python tools/ynab_memory.py --write fixture.json
+
+Builds a full /categories response shaped like YNAB's (every category with
+a note and the goal fields, some hidden/deleted/excluded) and measures peak
+allocation under tracemalloc for:
+
+    json     the old path: whole body read, json.loads, then the filter loop
+    stream   budget-app/ynab.py fed 512-byte chunks, as iter_content() does
+
+CPython objects are bigger than CircuitPython's, so the absolute numbers
+are not what the board sees, but the ratio and how each grows with the
+category count carry over. Needs adafruit-circuitpython-json-stream
+installed on the host.
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "common"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "budget-app"))
+
+import ynab  # noqa: E402
+
+EXCLUDED_GROUPS = ["Internal Master Category", "Credit Card Payments"]
+DISPLAY_NAMES = ["Category 3", "Category 7", "Category 11", "Category 19"]
+
+
+def make_fixture(count):
+    groups = []
+    for i in range(count):
+        if i % 10 == 0:
+            group_name = EXCLUDED_GROUPS[i % 2] if i % 50 == 0 else f"Group {i // 10}"
+            group = {
+                "id": f"{i // 10:08x}-0000-4000-8000-000000000000",
+                "name": group_name,
+                "hidden": False,
+                "deleted": False,
+                "categories": [],
+            }
+            groups.append(group)
+        group["categories"].append({
+            "id": f"{i:08x}-0000-4000-8000-{i:012x}",
+            "category_group_id": group["id"],
+            "category_group_name": group_name,
+            "name": f"Category {i}",
+            "hidden": i % 17 == 0,
+            "original_category_group_id": None,
+            "note": f"Notes for category {i}: " + "lorem ipsum dolor sit amet " * 4,
+            "budgeted": 100000 + i * 1000,
+            "activity": -(50000 + i * 700),
+            "balance": 50000 + i * 300,
+            "goal_type": "NEED",
+            "goal_needs_whole_amount": None,
+            "goal_day": None,
+            "goal_cadence": 1,
+            "goal_cadence_frequency": 1,
+            "goal_creation_month": "2025-01-01",
+            "goal_target": 100000 + i * 1000,
+            "goal_target_month": None,
+            "goal_percentage_complete": 50,
+            "goal_months_to_budget": 1,
+            "goal_under_funded": 0,
+            "goal_overall_funded": 50000,
+            "goal_overall_left": 50000,
+            "deleted": i % 29 == 0,
+        })
+    return json.dumps({"data": {"category_groups": groups, "server_knowledge": 1234}}).encode()
+
+
+def summarize_json(body):
+    """The pre-streaming budget-app loop, over a fully parsed document."""
+    data = json.loads(bytes(body))  # response.json() buffers the body first
+    total_budgeted = total_spent = 0
+    display = []
+    for group in data["data"]["category_groups"]:
+        for cat in group["categories"]:
+            if cat.get("hidden", False) or cat.get("deleted", False):
+                continue
+            if cat.get("category_group_name", "") in EXCLUDED_GROUPS:
+                continue
+            budgeted = cat.get("budgeted", 0)
+            if budgeted == 0:
+                continue
+            spent = abs(cat.get("activity", 0))
+            total_budgeted += budgeted
+            total_spent += spent
+            if cat.get("name", "") in DISPLAY_NAMES:
+                display.append({"name": cat["name"], "budgeted": budgeted, "spent": spent,
+                                "balance": cat.get("balance", 0)})
+    return total_budgeted, total_spent, display
+
+
+def summarize_stream(body):
+    view = memoryview(body)
+    chunks = (bytes(view[i:i + ynab.CHUNK_SIZE]) for i in range(0, len(body), ynab.CHUNK_SIZE))
+    state = ynab.apply_response(chunks, None, EXCLUDED_GROUPS, DISPLAY_NAMES)
+    return ynab.summarize(state, DISPLAY_NAMES)
+
+
+def peak(fn, body):
+    tracemalloc.start()
+    result = fn(body)
+    _, high = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return high, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--categories", type=int, default=300)
+    parser.add_argument("--write", metavar="PATH", help="also save the fixture")
+    args = parser.parse_args()
+
+    body = make_fixture(args.categories)
+    if args.write:
+        with open(args.write, "wb") as f:
+            f.write(body)
+
+    json_peak, json_result = peak(summarize_json, body)
+    stream_peak, stream_result = peak(summarize_stream, body)
+    json_rows = [c["name"] for c in json_result[2]]
+    stream_rows = [c["name"] for c in stream_result[2]]
+    if json_result[:2] != stream_result[:2] or json_rows != stream_rows:
+        sys.exit(f"Results differ: json {json_result[:2]} {json_rows}, "
+                 f"stream {stream_result[:2]} {stream_rows}")
+
+    print(f"{args.categories} categories, {len(body)} byte body")
+    print(f"  json    peak {json_peak:>9} bytes")
+    print(f"  stream  peak {stream_peak:>9} bytes ({json_peak / stream_peak:.0f}x less)")
+
+
+if __name__ == "__main__":
+    main()